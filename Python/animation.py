@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Compact, seekable animation files of rendered frames, and a player.
+
+A frame is stored as the palette indices of its characters (see
+Environment.draw), run-length encoded. Every keyframe_interval frames is a
+keyframe holding the whole frame; the others are deltas, where cells equal
+to the previous frame's are replaced with SAME before run-length encoding, so
+static parts of a scene take a few bytes per frame. A frame is stored whole
+whenever that's smaller than its delta.
+
+Layout:
+    header | palette | frames | index
+
+The header ends with the index's offset, and the index gives the offset,
+size and kind of every frame, so a reader can seek to any frame by decoding
+from the keyframe before it.
+
+Play a file in the terminal with `python animation.py FILE`.
+"""
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+
+import numpy as np
+
+from scheduler import Scheduler
+from sinks import AnsiTerminalSink, FrameSink, encode_indices
+
+# Magic, width, height, frame count, keyframe interval, seconds per frame, index offset, palette length
+HEADER = struct.Struct("<8sIIIIdQI")
+MAGIC = b"A3DANIM1"
+
+INDEX = np.dtype([("offset", "<u8"), ("size", "<u4"), ("keyframe", "u1")])
+
+# Cell value of delta frames meaning "unchanged since the previous frame"
+SAME = 255
+
+# Longest run stored in one length, longer runs are split
+MAX_RUN = 0xFFFF
+
+
+def run_length_encode(cells: np.ndarray) -> bytes:
+    """
+    Encodes a uint8 array as its number of runs, then the length of every run
+    (uint16) and the value of every run (uint8)
+    """
+    flat = cells.reshape(-1)
+    if len(flat) == 0:
+        return struct.pack("<I", 0)
+
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(flat)))
+    values = flat[starts]
+
+    if lengths.max() > MAX_RUN:
+        pieces = (lengths + MAX_RUN - 1) // MAX_RUN
+        values = np.repeat(values, pieces)
+        split = np.full(pieces.sum(), MAX_RUN)
+        split[np.cumsum(pieces) - 1] = lengths - MAX_RUN*(pieces - 1)
+        lengths = split
+
+    return struct.pack("<I", len(values)) + lengths.astype("<u2").tobytes() + values.astype(np.uint8).tobytes()
+
+
+def run_length_decode(data: bytes) -> np.ndarray:
+    """
+    Decodes run_length_encode's output to a flat uint8 array
+    """
+    (count,) = struct.unpack_from("<I", data)
+    lengths = np.frombuffer(data, dtype="<u2", count=count, offset=4)
+    values = np.frombuffer(data, dtype=np.uint8, count=count, offset=4 + 2*count)
+    return np.repeat(values, lengths)
+
+
+def encode_frame(frame: np.ndarray, previous: np.ndarray = None) -> tuple[bytes, bool]:
+    """
+    Encodes a (height, width) array of palette indices, as a delta from the
+    previous frame when one is given and that is smaller. Returns the encoded
+    frame and whether it is a keyframe
+    """
+    keyframe = run_length_encode(frame)
+    if previous is None:
+        return keyframe, True
+
+    delta = run_length_encode(np.where(frame == previous, SAME, frame).astype(np.uint8))
+    if len(delta) < len(keyframe):
+        return delta, False
+    return keyframe, True
+
+
+def encode_frames(frames, keyframe_interval: int, first_index: int = 0) -> list[tuple[bytes, bool]]:
+    """
+    Encodes consecutive frames, the first of which has the given index in the
+    animation. Frames whose index is a multiple of keyframe_interval are keyframes
+    """
+    encoded = []
+    previous = None
+    for index, frame in enumerate(frames, first_index):
+        encoded.append(encode_frame(frame, None if index % keyframe_interval == 0 else previous))
+        previous = frame
+    return encoded
+
+
+class AnimationWriter:
+    def __init__(self, path: str, width: int, height: int, palette: list[str], keyframe_interval: int = 30, timestep: float = 0.1):
+        """
+        Writes an animation file frame by frame. The index is written by close.
+
+        Arguments:
+        palette: the character of each palette index
+        keyframe_interval: frames between keyframes. Seeking decodes up to this many frames
+        timestep: seconds per frame when played back
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.palette = "".join(palette).encode("ascii")
+        self.keyframe_interval = keyframe_interval
+        self.timestep = timestep
+
+        if len(self.palette) >= SAME:
+            raise ValueError(f"Palettes are limited to {SAME} characters")
+
+        self._file = open(path, "wb")
+        self._file.write(self._header(0, 0))
+        self._file.write(self.palette)
+        self._offset = self._file.tell()
+        self._index: list[tuple[int, int, bool]] = []
+        self._previous: np.ndarray = None
+
+    def _header(self, frame_count: int, index_offset: int) -> bytes:
+        return HEADER.pack(MAGIC, self.width, self.height, frame_count, self.keyframe_interval, self.timestep, index_offset, len(self.palette))
+
+    def write(self, frame: np.ndarray):
+        """
+        Appends a (height, width) array of palette indices
+        """
+        if frame.shape != (self.height, self.width):
+            raise ValueError(f"Expected a {self.height}x{self.width} frame, got {frame.shape}")
+
+        keyframe = len(self._index) % self.keyframe_interval == 0
+        data, keyframe = encode_frame(frame, None if keyframe else self._previous)
+        self.write_encoded(data, keyframe)
+        self._previous = frame.copy()
+
+    def write_encoded(self, data: bytes, keyframe: bool):
+        """
+        Appends a frame already encoded by encode_frame (or encode_frames)
+        """
+        self._file.write(data)
+        self._index.append((self._offset, len(data), keyframe))
+        self._offset += len(data)
+        self._previous = None
+
+    def close(self):
+        if self._file is None:
+            return
+
+        index = np.array(self._index, dtype=INDEX)
+        self._file.write(index.tobytes())
+        self._file.seek(0)
+        self._file.write(self._header(len(self._index), self._offset))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AnimationReader:
+    def __init__(self, path: str):
+        """
+        Reads frames from an animation file, in any order, through a memory map.
+        Reading frames in order decodes each one once
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.width, self.height, frame_count, self.keyframe_interval, self.timestep, index_offset, palette_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an animation file")
+
+        self.palette = [chr(byte) for byte in self._map[HEADER.size:HEADER.size + palette_length]]
+        self.index = np.frombuffer(self._map, dtype=INDEX, count=frame_count, offset=index_offset)
+        self._keyframes = np.flatnonzero(self.index["keyframe"])
+
+        self._current = -1
+        self._frame: np.ndarray = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def _decode(self, i: int, previous: np.ndarray) -> np.ndarray:
+        offset, size, keyframe = self.index[i].tolist()
+        cells = run_length_decode(self._map[offset:offset + size])
+        if not keyframe:
+            cells = np.where(cells == SAME, previous.reshape(-1), cells)
+        return cells.reshape(self.height, self.width)
+
+    def frame(self, i: int) -> np.ndarray:
+        """
+        Returns frame i as a (height, width) array of palette indices
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(f"Frame {i} out of range")
+
+        keyframe = int(self._keyframes[np.searchsorted(self._keyframes, i, side="right") - 1])
+        if not keyframe <= self._current <= i:
+            self._current = keyframe
+            self._frame = self._decode(keyframe, None)
+
+        while self._current < i:
+            self._current += 1
+            self._frame = self._decode(self._current, self._frame)
+        return self._frame
+
+    def frame_bytes(self, i: int) -> bytes:
+        """
+        Returns frame i encoded as text for a sink, see sinks.encode_frame
+        """
+        return encode_indices(self.frame(i), self.palette)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    def close(self):
+        if self._map is not None:
+            self.index = self._keyframes = None
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play(path: str, sink: FrameSink = None, fps: float = None, loop: bool = False):
+    """
+    Plays an animation file to a sink, by default the terminal, at the rate
+    it was recorded at unless fps is given. Frames are skipped if the sink
+    can't keep up, like main_loop does
+    """
+    sink = sink if sink is not None else AnsiTerminalSink()
+
+    with AnimationReader(path) as reader:
+        timestep = 1 / fps if fps else reader.timestep
+        current = 0
+
+        def update(timestamp: int):
+            nonlocal current
+            current = timestamp % len(reader) if loop else min(timestamp, len(reader) - 1)
+
+        def render():
+            sink.write(reader.frame_bytes(current))
+
+        try:
+            Scheduler(update, render, timestep=timestep).run(None if loop else len(reader) * timestep)
+        finally:
+            sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play an animation file in the terminal")
+    parser.add_argument("path")
+    parser.add_argument("--fps", type=float, help="frames per second, by default the recorded rate")
+    parser.add_argument("--loop", action="store_true", help="play forever")
+    args = parser.parse_args()
+    play(args.path, fps=args.fps, loop=args.loop)
+
+
+if __name__ == "__main__":
+    main()
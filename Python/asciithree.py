@@ -3,20 +3,52 @@ from __future__ import annotations
 
 import math
 import os
-from time import sleep
-from abc import abstractmethod
+from functools import cached_property
 
 from math_3d import *
 from config import *
 
+import numpy as np
+
+import culling
+import raster
+from parallel import ParallelRasterizer
+from mesh import Mesh, MeshCache
+from sinks import FrameSink, FileSink, encode_indices
+from scheduler import Scheduler
+from profiling import Profiler
+from transforms import POSITION, ROTATION, SCALING, TransformStore
+
 intensities = ['.', ',', ";", "0", "#", "@"]
 
+# Characters of the palette indices in the frame buffers, 0 being empty space
+PALETTE = [" "] + intensities
+
+RASTER_BACKENDS = ("python", "numpy", "parallel")
+
+# Screen coordinates are clamped to this, so the integer edge functions cannot overflow
+SCREEN_COORDINATE_LIMIT = 1 << 28
+
 class Behavior:
     def start(self, shape: Shape):
         pass
     
     def update(self, timestamp: int, shape: Shape):
         pass
+
+    # Optionally, a class method update_many(cls, timestamp, transforms) updating
+    # every object carrying this type of behavior at once, by changing the arrays
+    # of transforms (see transforms.TransformBatch). It replaces update for the
+    # objects in a TransformStore, see Environment.enable_transform_store;
+    # update is still used for the others
+    update_many = None
+
+    @classmethod
+    def is_batched(cls) -> bool:
+        """
+        Returns whether the behavior implements update_many
+        """
+        return cls.update_many is not None
     
 ############################
 # Some built-in behaviors
@@ -27,115 +59,455 @@ class Behavior:
 
 class Object_3D:
     def __init__(self, position: Vector3, rotation: Quaternion, scaling: Vector3):
+        # The store holding the transform when there is one, see transforms.TransformStore
+        self._transforms: TransformStore = None
+        self._slot = -1
+        # Behaviors updated one object at a time, when in a store
+        self._unbatched: list[Behavior] = None
+
         self.position = position
         self.rotation = rotation
         self.scaling = scaling
         self.behaviors: list[Behavior] = []
+
+    # With a store, the transform is in its rows, see transforms.TransformStore
+
+    @property
+    def position(self) -> Vector3:
+        if self._transforms is not None and self._transforms.stale[self._slot, POSITION]:
+            self._transforms.fetch(self)
+        return self._position
+
+    @position.setter
+    def position(self, position: Vector3):
+        if self._transforms is not None:
+            position = self._transforms.set(self, POSITION, position)
+        self._position = position
+
+    @property
+    def rotation(self) -> Quaternion:
+        if self._transforms is not None and self._transforms.stale[self._slot, ROTATION]:
+            self._transforms.fetch(self)
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation: Quaternion):
+        if self._transforms is not None:
+            rotation = self._transforms.set(self, ROTATION, rotation)
+        self._rotation = rotation
+
+    @property
+    def scaling(self) -> Vector3:
+        if self._transforms is not None and self._transforms.stale[self._slot, SCALING]:
+            self._transforms.fetch(self)
+        return self._scaling
+
+    @scaling.setter
+    def scaling(self, scaling: Vector3):
+        if self._transforms is not None:
+            scaling = self._transforms.set(self, SCALING, scaling)
+        self._scaling = scaling
         
+    def transform_key(self):
+        """
+        Returns a tuple that changes whenever the position, rotation or scaling change
+        """
+        return self.position.as_tuple() + self.rotation.as_tuple() + self.scaling.as_tuple()
+
     def update(self, timestamp: int):
         # self.rotation = Quaternion.from_axis_angle(Vector3.UP, 0.1) * self.rotation
-        for behavior in self.behaviors:
+        for behavior in self.behaviors if self._unbatched is None else self._unbatched:
             behavior.update(timestamp, self)
+
+    def _behavior_names(self) -> str:
+        # The name the profiler gives the time of update, e.g. "oscillating"
+        behaviors = self.behaviors if self._unbatched is None else self._unbatched
+        return "+".join(type(behavior).__name__ for behavior in behaviors) or type(self).__name__
     
     def add_behavior(self, behavior: Behavior):
         self.behaviors.append(behavior)
         behavior.start(self)
+        if self._transforms is not None:
+            self._transforms.add_behavior(self, behavior)
     
 
         
 class Light(Object_3D):
-    pass
+    # Whether the light depends on where the faces are, not only on which way they face
+    USES_POSITION = False
+
+    def __init__(self, position: Vector3, rotation: Quaternion, scaling: Vector3 = UNIT_SCALING, intensity: float = 1.0):
+        """
+        Base class of the lights, which add no light. Subclasses implement illuminate.
+
+        Arguments:
+        intensity: brightness of a face lit head on, 1 being the brightest character
+        """
+        super().__init__(position, rotation, scaling)
+        self.intensity = intensity
+
+    def light_key(self):
+        """
+        Returns a tuple that changes whenever the light's effect may have changed
+        """
+        return (type(self), self.intensity) + self.transform_key()
+
+    def illuminate(self, centers: np.ndarray, normals: np.ndarray) -> np.ndarray:
+        """
+        Returns the brightness the light gives to faces with the given (M, 3)
+        world space centers and unit normals, as an (M,) array. A plain Light gives none
+        """
+        return np.zeros(len(normals))
+
+
+class DirectionalLight(Light):
+    def __init__(self, rotation: Quaternion, intensity: float = 1.0):
+        """
+        A light infinitely far away, like the sun, shining along Vector3.FORWARD rotated by rotation
+        """
+        super().__init__(Vector3(0, 0, 0), rotation, UNIT_SCALING, intensity)
+
+    def illuminate(self, centers: np.ndarray, normals: np.ndarray) -> np.ndarray:
+        direction = np.array(Vector3.FORWARD.rotate_by_quaternion(self.rotation).as_tuple())
+        return self.intensity * np.maximum(-(normals @ direction), 0)
+
+
+class PointLight(Light):
+    USES_POSITION = True
+
+    def __init__(self, position: Vector3, intensity: float = 1.0, range: float = None):
+        """
+        A light shining in every direction from a point.
+
+        Arguments:
+        range: distance at which the brightness has halved. By default the light doesn't fade
+        """
+        super().__init__(position, Quaternion.IDENTITY, UNIT_SCALING, intensity)
+        self.range = range
+
+    def light_key(self):
+        return super().light_key() + (self.range,)
+
+    def illuminate(self, centers: np.ndarray, normals: np.ndarray) -> np.ndarray:
+        to_light = np.array(self.position.as_tuple()) - centers
+        distances = np.sqrt((to_light * to_light).sum(axis=1))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosines = np.nan_to_num((normals * to_light).sum(axis=1) / distances)
+
+        brightness = self.intensity * np.maximum(cosines, 0)
+        if self.range is not None:
+            brightness /= 1 + (distances / self.range)**2
+        return brightness
 
 
 class Shape(Object_3D):
-    def __init__(self, vertices: list[tuple[int, int, int]], triangles: list[tuple[int, int, int]], position: Vector3, rotation: Quaternion, scaling: Vector3):
+    def __init__(self, vertices: list[tuple[int, int, int]], triangles: list[tuple[int, int, int]], position: Vector3, rotation: Quaternion, scaling: Vector3, mesh: Mesh = None):
         """
         Creates a new shape. 
 
         Arguments:
         vertices: a list of the coordinates of the vertices in R^3
         triangles: a list of triangulated faces. The normals are given by the right hand rule
+        mesh: an existing mesh to share instead of building one from vertices and triangles
         """
         super().__init__(position, rotation, scaling)
 
-        self.vertices = vertices
-        self.triangles = triangles
+        self.mesh = mesh if mesh is not None else Mesh(vertices, triangles)
         self.hidden = False
-        
-        self.calculate_normals()
+
+        # World space caches, allocated the first time they are needed
+        self._world_vertices: Vector3Array = None
+        self._world_key = None
+
+        self._world_normals: Vector3Array = None
+        self._normals_key = None
+
+        self._shades: np.ndarray = None
+        self._shades_key = None
+
+        # Shapes drawing the mesh's levels of detail, keyed by level mesh
+        self._lods: dict[Mesh, Shape] = {}
+
+    @classmethod
+    def from_mesh(cls, mesh: Mesh, position: Vector3, rotation: Quaternion, scaling: Vector3):
+        """
+        Creates a shape drawing an existing mesh, sharing it with other shapes
+        """
+        return cls(None, None, position, rotation, scaling, mesh=mesh)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        return self.mesh.vertices
+
+    @property
+    def triangles(self) -> np.ndarray:
+        return self.mesh.triangles
+
+    @property
+    def object_normals(self) -> np.ndarray:
+        return self.mesh.normals
+
+    def world_vertices(self) -> np.ndarray:
+        """
+        Returns the (N, 3) array of vertex positions in world space.
+
+        All the vertices are transformed at once, and only again after the
+        position, rotation or scaling change. The transform is done in place,
+        so the same array is returned (and overwritten) every time.
+        """
+        key = self.transform_key()
+
+        if key != self._world_key:
+            if self._world_vertices is None:
+                self._world_vertices = Vector3Array.zeros(len(self.vertices))
+
+            self._world_vertices.data[:] = self.vertices
+            self._world_vertices \
+                .ihadamard_product(self.scaling) \
+                .rotate_by_quaternion_(self.rotation) \
+                .iadd(self.position)
+            self._world_key = key
+
+        return self._world_vertices.data
     
+    def _normals_transform_key(self):
+        # Position doesn't affect normals, and neither does the size of a uniform scaling
+        sx, sy, sz = self.scaling.as_tuple()
+        if sx == sy == sz:
+            return self.rotation.as_tuple() + (sx > 0, sx == 0)
+        return self.rotation.as_tuple() + (sx, sy, sz)
+
+    @property
+    def normals(self) -> np.ndarray:
+        """
+        The (M, 3) array of world space unit normals of the triangles.
+
+        These are only recalculated the first time they are needed after the
+        rotation or a non-uniform scaling changed, so static shapes never pay for them.
+        """
+        if self._normals_transform_key() != self._normals_key:
+            self.calculate_normals()
+        return self._world_normals.data
+
     def calculate_normals(self):
-        self.normals: list[Vector3] = []
-        
-        for triangle in self.triangles:
-            a_vec, b_vec, c_vec = [self.location_of_vertex(self.vertices[i]) for i in triangle]
-            
-            normal = (b_vec - a_vec).cross_product(c_vec - a_vec).direction()
-            
-            self.normals.append(normal)
+        """
+        Derives the world space normals from the object space ones
+        """
+        sx, sy, sz = self.scaling.as_tuple()
+        if self._world_normals is None:
+            self._world_normals = Vector3Array.zeros(len(self.triangles))
+
+        normals = self._world_normals
+        normals.data[:] = self.object_normals
+
+        # Normals of scaled triangles are scaled by the cofactor matrix of the scaling,
+        # which also flips them when the scaling mirrors the shape
+        if not sx == sy == sz or sx <= 0:
+            normals.ihadamard_product(Vector3(sy*sz, sx*sz, sx*sy))
+
+        normals.rotate_by_quaternion_(self.rotation).normalize_()
+        self._normals_key = self._normals_transform_key()
             
+    def face_centers(self) -> np.ndarray:
+        """
+        Returns the (M, 3) array of the centers of the triangles in world space
+        """
+        corners = self.world_vertices()[self.triangles]
+        return (corners[:, 0] + corners[:, 1] + corners[:, 2]) / 3
+
+    def light_shades(self, lights: list[Light], ambient_light: float = 0.0) -> np.ndarray:
+        """
+        Returns the palette index (1 for the first character of intensities) of
+        every triangle under the given lights.
+
+        All the triangles are shaded at once, and only again after the lights
+        or the shape's orientation change (or its position, for lights that
+        depend on it), so static scenes don't pay for lighting every frame.
+        """
+        uses_position = any(light.USES_POSITION for light in lights)
+        key = (
+            self._normals_transform_key(),
+            self.transform_key() if uses_position else None,
+            tuple(light.light_key() for light in lights),
+            ambient_light,
+        )
+
+        if key != self._shades_key:
+            normals = self.normals
+            centers = self.face_centers() if uses_position else None
+
+            brightness = np.full(len(normals), float(ambient_light))
+            for light in lights:
+                brightness += light.illuminate(centers, normals)
+
+            # Same mapping from brightness to characters as shading by the viewing direction
+            levels = np.trunc(np.clip(np.nan_to_num(brightness), 0, 1) * 5.9)
+            self._shades = levels.astype(np.uint8) + 1
+            self._shades_key = key
+
+        return self._shades
+
+    def level_of_detail(self, level: int) -> Shape:
+        """
+        Returns a shape drawing the given level of detail of the mesh (see
+        Mesh.levels) with this shape's transform, 0 being the shape itself.
+        It keeps its own world space caches
+        """
+        if level == 0:
+            return self
+
+        mesh = self.mesh.levels[level]
+        shape = self._lods.get(mesh)
+        if shape is None:
+            shape = self._lods[mesh] = Shape.from_mesh(mesh, self.position, self.rotation, self.scaling)
+
+        shape.position, shape.rotation, shape.scaling = self.position, self.rotation, self.scaling
+        return shape
+
+    def world_bounding_sphere(self) -> tuple[Vector3, float]:
+        """
+        Returns the center and radius of a sphere containing the shape in world space
+        """
+        radius = self.mesh.bounding_radius * max(abs(s) for s in self.scaling.as_tuple())
+        return self.location_of_vertex(self.mesh.bounding_center), radius
+
     def location_of_vertex(self, vertex):
         return self.position + Vector3(*vertex).hadamard_product(self.scaling).rotate_by_quaternion(self.rotation)
     
-    def update(self, timestamp: int):
-        super().update(timestamp)
-        self.calculate_normals()
-        
-            
-        
     @classmethod
     def from_obj(cls, filename: str, position: Vector3, rotation: Quaternion, scaling: Vector3):
-        vertices = []
-        triangles = []
-        
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-            
-            for line in lines:
-                line = line.strip()
-                tokens = line.split(" ")
-                
-                tokens = [token for token in tokens if token != '']
-
-                if len(tokens) == 0:
-                    continue
-
-                if tokens[0] == '#':
-                    continue
-                elif tokens[0] == 'v':
-                    vertices.append((float(tokens[1]), float(tokens[2]), float(tokens[3])))
-                elif tokens[0] == 'f':
-                    verts = [int(tok.split("/")[0]) for tok in tokens[1:]]
-                    if len(verts) == 3:
-                        first, second, third = verts
-                        triangles.append((first - 1, second - 1, third - 1))
-                    elif len(verts) == 4:
-                        first, second, third, fourth = verts
-                        triangles.append((first - 1, second - 1, third - 1))
-                        triangles.append((third - 1, fourth - 1, first - 1))
-                    else:
-                        raise ValueError("Faces must be triangles or quads")
-                        
-        
-        return cls(vertices, triangles, position, rotation, scaling)
+        """
+        Loads a shape from an OBJ file, with a mesh of its own. Parsed models are cached next to the file, see obj_loader.
+        Use Environment.create_shape_from_file to share the mesh between shapes loaded from the same file
+        """
+        return cls.from_mesh(Mesh.from_obj(filename), position, rotation, scaling)
         
 class Cube(Shape):
+    MESH = Mesh(
+        vertices=[(-1, -1, -1), (-1, -1, 1), (-1, 1, -1), (-1, 1, 1), (1, -1, -1), (1, -1, 1), (1, 1, -1), (1, 1, 1)],
+        triangles=[(0, 1, 3), (0, 3, 2), (0, 4, 5), (0, 5, 1), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3), (3, 7, 6), (3, 6, 2), (4, 6, 7), (4, 7, 5)],
+        name="cube",
+    )
+
     def __init__(self, position: Vector3, rotation: Quaternion, scaling: Vector3):
-        vertices = [(-1, -1, -1), (-1, -1, 1), (-1, 1, -1), (-1, 1, 1), (1, -1, -1), (1, -1, 1), (1, 1, -1), (1, 1, 1)]
-        triangles = [(0, 1, 3), (0, 3, 2), (0, 4, 5), (0, 5, 1), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3), (3, 7, 6), (3, 6, 2), (4, 6, 7), (4, 7, 5)]
-        super().__init__(vertices, triangles, position, rotation, scaling)
+        super().__init__(None, None, position, rotation, scaling, mesh=Cube.MESH)
         
 class Tetrahedron(Shape):
+    MESH = Mesh(
+        vertices=[(0, 1, 0), (1, -1/3, 0), (-1/2, -1/3, -math.sqrt(3)/2), (-1/2, -1/3, math.sqrt(3)/2)],
+        triangles=[(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 3, 2)],
+        name="tetrahedron",
+    )
+
     def __init__(self, position: Vector3, rotation: Quaternion, scaling: Vector3):
-        vertices = [(0, 1, 0), (1, -1/3, 0), (-1/2, -1/3, -math.sqrt(3)/2), (-1/2, -1/3, math.sqrt(3)/2)]
-        triangles = [(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 3, 2)]
-        super().__init__(vertices, triangles, position, rotation, scaling)
+        super().__init__(None, None, position, rotation, scaling, mesh=Tetrahedron.MESH)
     
 
         
             
+class PreparedShape:
+    def __init__(self, shape: Shape, lights: list[Light], ambient_light: float):
+        """
+        A shape's world space data for one frame, shared by every camera that
+        renders the frame. Each part is computed the first time a camera needs
+        it, so shapes no camera sees are never transformed
+        """
+        self.shape = shape
+        self.lights = lights
+        self.ambient_light = ambient_light
+        self._levels: dict[int, PreparedShape] = {}
+
+    def level(self, level: int) -> PreparedShape:
+        """
+        Returns the prepared data of a level of detail of the shape, see Shape.level_of_detail
+        """
+        if level == 0:
+            return self
+        if level not in self._levels:
+            self._levels[level] = PreparedShape(self.shape.level_of_detail(level), self.lights, self.ambient_light)
+        return self._levels[level]
+
+    @cached_property
+    def bounding_sphere(self) -> tuple[Vector3, float]:
+        return self.shape.world_bounding_sphere()
+
+    @cached_property
+    def normals(self) -> np.ndarray:
+        return self.shape.normals
+
+    @cached_property
+    def world_vertices(self) -> np.ndarray:
+        return self.shape.world_vertices()
+
+    @cached_property
+    def shades(self) -> np.ndarray:
+        """
+        Palette indices of the triangles under the lights, None without lights
+        """
+        if not self.lights:
+            return None
+        return self.shape.light_shades(self.lights, self.ambient_light)
+
+
+class ShapeLayer:
+    def __init__(self, key: tuple, records: tuple[np.ndarray, np.ndarray, np.ndarray], width: int, height: int):
+        """
+        A shape's triangle records (see Camera._triangle_records) kept by a
+        camera between frames, with the rectangle of the screen they cover.
+        records is None for shapes outside the view.
+
+        Arguments:
+        key: the shape's state when the records were made
+        """
+        self.key = key
+        self.records = records
+        self.rect = None
+
+        if records is not None and len(records[0]):
+            vertices = records[0]
+            self.mins = vertices.min(axis=1)
+            self.maxs = vertices.max(axis=1)
+            self.rect = raster.clip_rect(*self.mins.min(axis=0).tolist(), *(self.maxs.max(axis=0) + 1).tolist(), width, height)
+
+    def overlaps(self, rect: tuple[int, int, int, int]) -> bool:
+        return self.rect is not None and raster.rects_overlap(self.rect, rect)
+
+    def overlapping(self, rect: tuple[int, int, int, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the records of the triangles whose bounding boxes overlap rect
+        """
+        x_0, y_0, x_1, y_1 = rect
+        mask = (self.mins[:, 0] < x_1) & (self.maxs[:, 0] >= x_0) & (self.mins[:, 1] < y_1) & (self.maxs[:, 1] >= y_0)
+        if mask.all():
+            return self.records
+        return tuple(array[mask] for array in self.records)
+
+
 class Camera(Object_3D):
-    def __init__(self, width: int, height: int, environment: "Environment", zoom: float, perspective: bool, depth: float, position: Vector3, rotation: Quaternion, scaling: Vector3):
+    def __init__(self, width: int, height: int, environment: "Environment", zoom: float, perspective: bool, depth: float, position: Vector3, rotation: Quaternion, scaling: Vector3, backend: str = "python", culling: bool = False, workers: int = None, incremental: bool = False, lod: bool = False, occlusion: bool = False):
+        """
+        Creates a new camera.
+
+        Arguments:
+        backend: "python" rasterizes one pixel at a time, "numpy" rasterizes all
+            the triangles of a frame as array operations, and "parallel" splits
+            the numpy backend's work across worker processes by rows. All give the same output
+        culling: skip shapes whose bounding spheres are outside the view, and the
+            triangles of large meshes that are far from it (see BVH_MIN_TRIANGLES).
+            Off by default, as testing the triangles of a partly visible mesh
+            costs more than drawing them unless much of the mesh is off-screen
+        workers: number of processes used by the parallel backend, by default one per CPU
+        incremental: only redraw the parts of the screen where shapes moved, appeared
+            or disappeared since the last frame, reusing the rest of the last image.
+            The output is the same, but mostly static scenes render much faster
+        lod: draw meshes with levels of detail (see Mesh.levels) at the coarsest
+            level that moves no vertex more than LOD_MAX_ERROR characters on screen
+        occlusion: draw shapes and their triangles roughly front to back, skipping
+            those entirely behind what is already drawn (see culling.DepthPyramid).
+            The output is the same. Only used by the python and numpy backends,
+            without incremental
+        """
         super().__init__(position, rotation, scaling)
         self.width = width
         self.height = height
@@ -143,143 +515,651 @@ class Camera(Object_3D):
         self.zoom = zoom
         self.perspective = perspective
         self.depth = depth
+
+        if backend not in RASTER_BACKENDS:
+            raise ValueError(f"Unknown raster backend {backend!r}, expected one of {RASTER_BACKENDS}")
+        self.backend = backend
+        self.culling = culling
+        self.workers = workers
+        self.lod = lod
+        self.occlusion = occlusion
+        self._parallel_rasterizer: ParallelRasterizer = None
+
+        # Column and row of the camera's top left corner in frames composited by Environment.render
+        self.viewport = (0, 0)
+
+        # Per frame view setup, rebuilt only when the camera moves
+        self._basis: tuple[Vector3, Vector3, Vector3] = None
+        self._basis_key = None
+        self._view_projection: np.ndarray = None
+        self._view_projection_key = None
+
+        # State kept between frames by incremental rendering
+        self.incremental = incremental
+        self._layers: dict[Shape, ShapeLayer] = {}
+        self._layers_view_key = None
+
+        # Frame buffers, allocated once and reused every frame: the palette index
+        # (see PALETTE) and the depth of every pixel
+        self.color_buffer: np.ndarray = None
+        self.depth_buffer: np.ndarray = None
+
+        # Occlusion culling's coarse depths, and the submission order of the
+        # triangle drawn at each pixel, which decides depth ties when drawing out of order
+        self._depth_pyramid: culling.DepthPyramid = None
+        self.owner_buffer: np.ndarray = None
+
         self.clear_screen()
 
-    def _is_in_bounds(self, point: tuple[int, int]):
-        x, y = point
-        return 0 <= x < self.width and 0 <= y < self.height
+    def _render_triangle(self, shade: int, triangle: list[list[int]], depth_plane: list[float], clip: tuple[int, int, int, int] = None, order: int = None):
+        """
+        Draws a triangle one row at a time, see raster.edge_functions and raster.depth_planes.
+        Only the pixels in clip (x_0, y_0, x_1, y_1, ends excluded) are drawn, by default the whole screen.
+        When triangles are drawn out of order, order is the triangle's place in
+        the submission order, which decides depth ties (see raster.rasterize)
+        """
+        (a_x, a_y), (b_x, b_y), (c_x, c_y) = triangle
+        edges = raster.edge_functions(a_x, a_y, b_x, b_y, c_x, c_y)
+        d_x, d_y, d_0 = depth_plane
 
-    def _render_triangle(self, intensity: float, triangle_3d: tuple[Vector3, Vector3, Vector3], viewing_normal: Vector3, triangle_normal: Vector3):
-        triangle = [self.world_to_screen_space(point.as_tuple(), viewing_normal, self.perspective, self.depth) for point in triangle_3d]
+        # Flat views of the frame buffers, indexed by y*width + x
+        color = self._color_view
+        depth = self._depth_view
+        owner = self._owner_view if order is not None else None
+        width = self.width
+        tested = written = 0
 
-        rect_min_x = min([vertex[0] for vertex in triangle])
-        rect_max_x = max([vertex[0] for vertex in triangle])
-        rect_min_y = min([vertex[1] for vertex in triangle])
-        rect_max_y = max([vertex[1] for vertex in triangle])
-            
-        a, b, c = triangle
-        a_cam_vec = self.position
-        n_vec = triangle_normal
-        
-        depth_normal = self.depth*viewing_normal.direction()
+        clip_x_0, clip_y_0, clip_x_1, clip_y_1 = clip if clip is not None else (0, 0, self.width, self.height)
+        first_x = max(min(a_x, b_x, c_x), clip_x_0)
+        last_x = min(max(a_x, b_x, c_x), clip_x_1 - 1)
+
+        for y in range(max(min(a_y, b_y, c_y), clip_y_0), min(max(a_y, b_y, c_y), clip_y_1 - 1) + 1):
+            # Clip the row to the span where every edge function is >= 0
+            start, stop = first_x, last_x
+            for e_x, e_y, e_0 in edges:
+                row = e_y*y + e_0
+                if e_x > 0:
+                    start = max(start, -(row // e_x))
+                elif e_x < 0:
+                    stop = min(stop, row // -e_x)
+                elif row < 0:
+                    stop = -1
+
+            if start > stop:
+                continue
+
+            offset = y*width
+            row_depth = d_y*y + d_0
+            tested += stop - start + 1
 
-        for y in range(rect_min_y, rect_max_y + 1):
-            for x in range(rect_min_x, rect_max_x + 1):
-                if not self._is_in_bounds((x, y)):
+            for x in range(start, stop + 1):
+                try:
+                    z = 1 / (d_x*x + row_depth)
+                except ZeroDivisionError:
                     continue
 
-                x_a = (x-a[0], y-a[1])
-                x_b = (x-b[0], y-b[1])
-                x_c = (x-c[0], y-c[1])
-                
-                a_b = x_a[0]*x_b[1]-x_b[0]*x_a[1]
-                b_c = x_b[0]*x_c[1]-x_c[0]*x_b[1]
-                c_a = x_c[0]*x_a[1]-x_a[0]*x_c[1]
-                
-                if a_b <= 0 and b_c <= 0 and c_a <= 0 or a_b >= 0 and b_c >= 0 and c_a >= 0:
-
-                    u = x - self.width // 2
-                    v = self.height // 2 - y
-                    
-                    p_prime_vec = u*self.x_vec + v*self.y_vec + depth_normal
-                    a_triangle_vec = triangle_3d[0]
-                    
-                    dist = (a_triangle_vec - a_cam_vec).dot_product(n_vec) * (p_prime_vec.magnitude() / p_prime_vec.dot_product(n_vec))
-                    
-                    if dist < self.z_buffer[y][x]:
-                        self.screen[y][x] = intensity
-                        self.z_buffer[y][x] = dist
+                i = offset + x
+                if z < depth[i] or owner is not None and z == depth[i] and order < owner[i]:
+                    color[i] = shade
+                    depth[i] = z
+                    written += 1
+                    if owner is not None:
+                        owner[i] = order
+
+        return tested, written
+
+    def _render_batch(self, batch: list[tuple[np.ndarray, np.ndarray, np.ndarray]], counters: dict[str, int] = None):
+        if not batch:
+            return
+
+        vertices, planes, shades = (np.concatenate(arrays) for arrays in zip(*batch))
+
+        if self.backend == "parallel":
+            rasterizer = self._parallel_rasterizer
+            if rasterizer is None or (rasterizer.width, rasterizer.height) != (self.width, self.height):
+                self.close()
+                rasterizer = self._parallel_rasterizer = ParallelRasterizer(self.width, self.height, self.workers)
+
+            color, depth = rasterizer.rasterize(vertices, planes, shades, counters=counters)
+            np.copyto(self.color_buffer, color)
+            np.copyto(self.depth_buffer, depth)
+        else:
+            raster.rasterize(self.color_buffer, self.depth_buffer, vertices, planes, shades, counters=counters)
+
+    def close(self):
+        """
+        Releases the worker processes and shared memory of the parallel backend, if any
+        """
+        if self._parallel_rasterizer is not None:
+            self._parallel_rasterizer.close()
+            self._parallel_rasterizer = None
 
     def clear_screen(self):
-        self.screen = [[" " for _ in range(self.width)] for _ in range(self.height)]
-        self.z_buffer = [[float("inf") for _ in range(self.width)] for _ in range(self.height)]
+        """
+        Empties the frame buffers, only allocating them when the size changed
+        """
+        if self.color_buffer is not None and self.color_buffer.shape == (self.height, self.width):
+            self.color_buffer.fill(0)
+            self.depth_buffer.fill(float("inf"))
+            return
 
-    def world_to_screen_space(self, point: tuple[int, int, int], viewing_normal: Vector3, perspective=False, depth=None):
-        p_vec = Vector3(*point)
-        a_vec = self.position
-        b_vec = viewing_normal
-        
+        self.color_buffer = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.depth_buffer = np.full((self.height, self.width), float("inf"))
+        self._color_view = memoryview(self.color_buffer.reshape(-1))
+        self._depth_view = memoryview(self.depth_buffer.reshape(-1))
+
+    @property
+    def screen(self) -> list[list[str]]:
+        """
+        The last frame as rows of characters, built from the frame buffers
+        """
+        return raster.to_characters(self.color_buffer, PALETTE)
+
+    @property
+    def z_buffer(self) -> list[list[float]]:
+        """
+        The depths of the last frame as rows of floats
+        """
+        return self.depth_buffer.tolist()
+
+    def _screen_basis(self, viewing_normal: Vector3) -> tuple[Vector3, Vector3]:
         # Screen space unit vectors
-        x_vec = b_vec.cross_product(Vector3(0, 1, 0)).direction()
-        y_vec = x_vec.cross_product(b_vec).direction()
-        
-        self.x_vec = x_vec
-        self.y_vec = y_vec
-        
-        p_minus_a = p_vec - a_vec
-        
+        x_vec = viewing_normal.cross_product(Vector3(0, 1, 0)).direction()
+        y_vec = x_vec.cross_product(viewing_normal).direction()
+        return x_vec, y_vec
+
+    def view_basis(self) -> tuple[Vector3, Vector3, Vector3]:
+        """
+        Returns the viewing direction and the screen space x and y unit vectors.
+        They only depend on the rotation, and are cached until it changes
+        """
+        key = self.rotation.as_tuple()
+        if key != self._basis_key:
+            viewing_normal = Vector3.FORWARD.rotate_by_quaternion(self.rotation)
+            self._basis = (viewing_normal, *self._screen_basis(viewing_normal))
+            self._basis_key = key
+        return self._basis
+
+    def _build_view_projection(self, viewing_normal: Vector3, x_vec: Vector3, y_vec: Vector3, perspective: bool, depth: float) -> np.ndarray:
+        b, x, y = (np.array(vec.as_tuple()) for vec in (viewing_normal.direction(), x_vec, y_vec))
+
+        # World to view space: x and y along the screen, z along the viewing direction
+        view = np.identity(4)
+        view[:3, :3] = (x, y, b)
+        view[:3, 3] = -view[:3, :3] @ np.array(self.position.as_tuple())
+
         if perspective:
-            b_mag = b_vec.magnitude()
-            d_vec = -depth * b_vec / b_mag + (b_mag * depth / p_minus_a.dot_product(b_vec)) * p_minus_a
+            # w is the distance in front of the camera over depth, so dividing by it
+            # projects onto the screen plane at that depth
+            projection = np.array([
+                [self.zoom, 0, 0, 0],
+                [0, self.zoom, 0, 0],
+                [0, 0, 1, 0],
+                [0, 0, 1/depth, 0],
+            ])
         else:
-            d_vec = p_minus_a - (p_minus_a.dot_product(b_vec) / b_vec.square_magnitude()) * b_vec
-        
-        x_cross_y = x_vec.cross_product(y_vec)
-
-        if abs(x_cross_y.x) >= 1e-4:
-            u = d_vec.cross_product(y_vec).x / x_cross_y.x
-            v = x_vec.cross_product(d_vec).x / x_cross_y.x
-        elif abs(x_cross_y.y) >= 1e-4:
-            u = d_vec.cross_product(y_vec).y / x_cross_y.y
-            v = x_vec.cross_product(d_vec).y / x_cross_y.y
+            projection = np.diag([self.zoom, self.zoom, 1, 1])
+
+        return projection @ view
+
+    def view_projection_matrix(self) -> np.ndarray:
+        """
+        Returns the 4x4 matrix taking homogeneous world coordinates to clip space.
+        After dividing by w, x and y are offsets from the center of the screen in
+        characters (y pointing up). Before it, z is the distance along the viewing
+        direction. Cached until the camera's transform or projection settings change
+        """
+        key = (self.transform_key(), self.zoom, self.perspective, self.depth)
+        if key != self._view_projection_key:
+            viewing_normal, x_vec, y_vec = self.view_basis()
+            self._view_projection = self._build_view_projection(viewing_normal, x_vec, y_vec, self.perspective, self.depth)
+            self._view_projection_key = key
+        return self._view_projection
+
+    def project(self, points: np.ndarray, view_projection: np.ndarray = None) -> np.ndarray:
+        """
+        Projects an (N, 3) array of world space points to an (N, 2) integer array of screen coordinates.
+
+        Arguments:
+        view_projection: the matrix to use instead of view_projection_matrix()
+        """
+        if view_projection is None:
+            view_projection = self.view_projection_matrix()
+
+        clip = points @ view_projection[:, :3].T + view_projection[:, 3]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            offsets = np.trunc(clip[:, :2] / clip[:, 3:])
+
+        # Points level with (or behind) the camera have no sensible projection,
+        # keep them finite and small enough for the rasterizer's integer maths
+        offsets = np.clip(np.nan_to_num(offsets), -SCREEN_COORDINATE_LIMIT, SCREEN_COORDINATE_LIMIT).astype(np.int64)
+
+        screen = np.empty_like(offsets)
+        screen[:, 0] = self.width // 2 + offsets[:, 0]
+        screen[:, 1] = self.height // 2 - offsets[:, 1]
+        return screen
+
+    def _frustum_planes(self, viewing_normal: Vector3, x_vec: Vector3, y_vec: Vector3) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the planes bounding everything that can land on the screen, as
+        used by the culling module. The planes are a pixel wider than the
+        screen on every side, to allow for rounding screen coordinates
+        """
+        b, x, y = (np.array(vec.as_tuple()) for vec in (viewing_normal.direction(), x_vec, y_vec))
+
+        right = self.width - self.width // 2 + 1
+        left = self.width // 2 + 1
+        top = self.height // 2 + 1
+        bottom = self.height - self.height // 2 + 1
+
+        if self.perspective:
+            # Planes through the camera, e.g. zoom*depth*(p.x) <= right*(p.b) for the
+            # right edge, where p is relative to the camera. Also cull what's behind it
+            scale = self.zoom * self.depth
+            normals = np.array([right*b - scale*x, left*b + scale*x, top*b - scale*y, bottom*b + scale*y, b])
+            offsets = np.zeros(5)
         else:
-            u = d_vec.cross_product(y_vec).z / x_cross_y.z
-            v = x_vec.cross_product(d_vec).z / x_cross_y.z
-        
-        return (self.width // 2 + int(self.zoom*u), self.height // 2 - int(self.zoom*v))
-    
-    def render(self):
-        self.clear_screen()
+            normals = np.array([-self.zoom*x, self.zoom*x, -self.zoom*y, self.zoom*y])
+            offsets = np.array([right, left, top, bottom], dtype=float)
+
+        # Make the planes relative to the world origin instead of the camera
+        return normals, offsets - normals @ np.array(self.position.as_tuple())
+
+    def world_to_screen_space(self, point: tuple[int, int, int], viewing_normal: Vector3 = None, perspective: bool = None, depth: float = None):
+        """
+        Projects a single point to screen coordinates. The viewing normal and
+        projection settings default to the camera's own, use project for many points
+        """
+        if viewing_normal is None and perspective is None and depth is None:
+            view_projection = self.view_projection_matrix()
+        else:
+            viewing_normal = viewing_normal if viewing_normal is not None else self.view_basis()[0]
+            view_projection = self._build_view_projection(
+                viewing_normal,
+                *self._screen_basis(viewing_normal),
+                self.perspective if perspective is None else perspective,
+                self.depth if depth is None else depth,
+            )
+
+        x, y = self.project(np.array([point], dtype=float), view_projection)[0]
+        return (int(x), int(y))
+
+    def _triangle_records(self, world_vertices: np.ndarray, triangles: np.ndarray, normals: np.ndarray, basis: tuple[Vector3, Vector3, Vector3, Vector3], view_projection: np.ndarray, shades: np.ndarray = None):
+        """
+        Returns the screen space vertices, depth planes (see raster.depth_planes)
+        and palette indices of a shape's triangles that face the camera.
+        Without the triangles' shades, they are shaded by the viewing direction
+        """
+        viewing_normal, x_vec, y_vec, depth_normal = basis
+
+        # Dot product of (first vertex - camera position) with the normal, i.e. the
+        # distance from the camera to the triangle's plane, scaled by the normal's length
+        offset = world_vertices[triangles[:, 0]] - np.array(self.position.as_tuple())
+        plane_distances = offset[:, 0]*normals[:, 0] + offset[:, 1]*normals[:, 1] + offset[:, 2]*normals[:, 2]
+
+        v_x, v_y, v_z = viewing_normal.as_tuple()
+        cos_normal_viewing = -(normals[:, 0]*v_x + normals[:, 1]*v_y + normals[:, 2]*v_z) / viewing_normal.magnitude()
+
+        # Back-face culling
+        if self.perspective:
+            front = plane_distances < 0
+        else:
+            front = cos_normal_viewing > 0
+        front &= np.isfinite(cos_normal_viewing)
+
+        if shades is None:
+            # Faces seen at a grazing angle in perspective have negative cosines, which
+            # index the palette from the end
+            shades = np.trunc(cos_normal_viewing * 5.9).astype(np.int64) % len(intensities) + 1
+        shades = shades[front]
+
+        triangles = triangles[front]
+        screen_vertices = self.project(world_vertices, view_projection)
+        planes = raster.depth_planes(plane_distances[front] * self.depth, normals[front], self.width, self.height, x_vec, y_vec, depth_normal)
+
+        return screen_vertices[triangles], planes, shades.astype(np.uint8)
+
+    def _shape_records(self, item: PreparedShape, basis: tuple[Vector3, Vector3, Vector3, Vector3], view_projection: np.ndarray, planes: tuple[np.ndarray, np.ndarray]):
+        """
+        Culls a shape and returns the records of its triangles facing the camera
+        (see _triangle_records), or None when it is outside the view
+        """
+        stats = self.environment.stats
+        shape = item.shape
+
+        if stats is not None:
+            start = stats.clock()
+
+        visible = None
+
+        if self.culling:
+            center, radius = item.bounding_sphere
+            visibility = culling.sphere_visibility(*planes, center.as_tuple(), radius)
+
+            if visibility == culling.OUTSIDE:
+                if stats is not None:
+                    stats.add_time("cull", stats.clock() - start)
+                    stats.count("triangles_submitted", len(shape.triangles))
+                    stats.count("triangles_culled", len(shape.triangles))
+                return None
+
+        if self.lod:
+            item = item.level(self._level_of_detail(item, basis[0]))
+            shape = item.shape
+
+        triangles = shape.triangles
+        submitted = len(triangles)
+
+        if self.culling:
+            if visibility == culling.PARTIAL and len(triangles) >= BVH_MIN_TRIANGLES:
+                shape_planes = culling.transform_planes(*planes, shape.rotation.rotation_matrix(), shape.scaling.as_tuple(), shape.position.as_tuple())
+                visible = shape.mesh.bvh.query(*shape_planes)
+                triangles = triangles[visible]
+
+        if stats is not None:
+            culled = stats.clock()
+
+        normals = item.normals if visible is None else item.normals[visible]
+
+        if stats is not None:
+            normals_done = stats.clock()
+
+        world_vertices = item.world_vertices
+
+        if stats is not None:
+            transformed = stats.clock()
+
+        shades = item.shades
+        if shades is not None and visible is not None:
+            shades = shades[visible]
+
+        if stats is not None:
+            lit = stats.clock()
+
+        records = self._triangle_records(world_vertices, triangles, normals, basis, view_projection, shades)
+
+        if stats is not None:
+            stats.add_time("cull", culled - start)
+            stats.add_time("normals", normals_done - culled)
+            stats.add_time("transform", transformed - normals_done)
+            stats.add_time("lighting", lit - transformed)
+            stats.add_time("setup", stats.clock() - lit)
+            stats.count("triangles_submitted", submitted)
+            stats.count("triangles_culled", submitted - len(triangles))
+            stats.count("triangles_back_facing", len(triangles) - len(records[0]))
+            stats.count("triangles_rasterized", len(records[0]))
+
+        return records
+
+    def _level_of_detail(self, item: PreparedShape, viewing_normal: Vector3) -> int:
+        """
+        Returns the coarsest level of detail of a shape whose error is at most
+        LOD_MAX_ERROR characters on screen, where the shape is closest to the camera
+        """
+        levels = item.shape.mesh.levels
+        if len(levels) == 1:
+            return 0
+
+        center, radius = item.bounding_sphere
+        if self.perspective:
+            distance = (center - self.position).dot_product(viewing_normal) - radius
+            if distance <= 0:
+                return 0
+            characters_per_unit = self.zoom * self.depth / distance
+        else:
+            characters_per_unit = self.zoom
+
+        scale = max(abs(s) for s in item.shape.scaling.as_tuple()) * characters_per_unit
+        level = 0
+        while level + 1 < len(levels) and levels[level + 1].lod_error * scale <= LOD_MAX_ERROR:
+            level += 1
+        return level
+
+    def _draw_records(self, records: tuple[np.ndarray, np.ndarray, np.ndarray], counters: dict[str, int] = None, clip: tuple[int, int, int, int] = None, order: np.ndarray = None):
+        # Draws triangle records one at a time with the python backend
+        orders = order.tolist() if order is not None else [None] * len(records[0])
+        for triangle, plane, shade, rank in zip(*(array.tolist() for array in records), orders):
+            tested, written = self._render_triangle(shade, triangle, plane, clip, rank)
+            if counters is not None:
+                counters["pixels_tested"] += tested
+                counters["pixels_written"] += written
+
+    def render(self, prepared: list[PreparedShape] = None) -> list[list[str]]:
+        """
+        Renders the environment and returns it as rows of characters, see draw
+        """
+        self.draw(prepared)
+        return self.screen
+
+    def draw(self, prepared: list[PreparedShape] = None) -> np.ndarray:
+        """
+        Renders the environment into the frame buffers, and returns self.color_buffer,
+        the (height, width) array of palette indices.
+
+        Arguments:
+        prepared: the shapes' data for this frame, from Environment.prepare_shapes.
+            Cameras rendering the same frame share it
+        """
+        stats = self.environment.stats
+        if prepared is None:
+            prepared = self.environment.prepare_shapes()
 
         # TODO logic to calculate viewing normal
-        vec_normal = Vector3.FORWARD.rotate_by_quaternion(self.rotation)
-        
+        viewing_normal, x_vec, y_vec = self.view_basis()
+        view_projection = self.view_projection_matrix()
+        basis = (viewing_normal, x_vec, y_vec, self.depth*viewing_normal.direction())
+        planes = self._frustum_planes(viewing_normal, x_vec, y_vec) if self.culling else None
+
+        if self.incremental:
+            self._draw_incremental(prepared, basis, view_projection, planes)
+        elif self.occlusion and self.backend != "parallel":
+            self._draw_occluded(prepared, basis, view_projection, planes)
+        else:
+            self._draw_all(prepared, basis, view_projection, planes)
+
+        if stats is not None:
+            stats.count("pixels_covered", int(np.count_nonzero(self.color_buffer)))
+        return self.color_buffer
+
+    def _draw_all(self, prepared: list[PreparedShape], basis: tuple[Vector3, Vector3, Vector3, Vector3], view_projection: np.ndarray, planes: tuple[np.ndarray, np.ndarray]):
+        # Draws every shape in order, from empty buffers
+        stats = self.environment.stats
+        self.clear_screen()
+        batch = []
+        counters = stats.counters if stats is not None else None
+
         # Render each shape
-        for shape in self.environment.shapes:
-            if shape.hidden:
+        for item in prepared:
+            records = self._shape_records(item, basis, view_projection, planes)
+            if records is None:
                 continue
 
-            # For each triangle and its normal in the shape
-            for triangle, normal in zip(shape.triangles, shape.normals):
-                cos_normal_viewing = -normal.dot_product(vec_normal) / vec_normal.magnitude()
-                
-                
-                if self.perspective:
-                    point = Vector3(*shape.vertices[triangle[0]]) \
-                                .hadamard_product(shape.scaling) \
-                                .rotate_by_quaternion(shape.rotation) \
-                                + shape.position
-                    if (point - self.position).dot_product(normal) >= 0:
-                        continue
-                else:
-                    # If face is facing away
-                    if cos_normal_viewing <= 0:
-                        continue
-
-                # Get actual triangle instead of the conventional representation
-                actual_triangle = _triangle_index_to_triangle(triangle, shape.vertices)
-                
-                transformed_triangle = tuple(
-                    (
-                        Vector3(*vertex)
-                            .hadamard_product(shape.scaling)
-                            .rotate_by_quaternion(shape.rotation)
-                        + shape.position
-                    )
-                    for vertex in actual_triangle
-                )
-
-                self._render_triangle(intensities[int(cos_normal_viewing * 5.9)], transformed_triangle, vec_normal, normal)                 
-                
-        return self.screen
-        
+            if self.backend == "python":
+                if stats is not None:
+                    start = stats.clock()
+
+                self._draw_records(records, counters)
+
+                if stats is not None:
+                    stats.add_time("raster", stats.clock() - start)
+            else:
+                batch.append(records)
+
+        if self.backend != "python":
+            if stats is not None:
+                start = stats.clock()
 
+            self._render_batch(batch, counters)
 
-def _triangle_index_to_triangle(triangle: tuple[int, int, int], vertices: list[tuple[int, int, int]]):
-    return [vertices[i] for i in triangle]
+            if stats is not None:
+                stats.add_time("raster", stats.clock() - start)
+
+    def _draw_occluded(self, prepared: list[PreparedShape], basis: tuple[Vector3, Vector3, Vector3, Vector3], view_projection: np.ndarray, planes: tuple[np.ndarray, np.ndarray]):
+        """
+        Draws the shapes nearest first, skipping any shape or triangle whose
+        screen bounds are behind everything already drawn there (see
+        culling.DepthPyramid). Triangles are queued and drawn OCCLUSION_BATCH at
+        a time, each batch being tested against the pyramid as updated by the
+        previous ones, and shapes with more triangles are split nearest first.
+
+        Triangles are drawn out of order, so each pixel keeps the submission
+        order of its triangle (shape index, then triangle index) in
+        owner_buffer to settle depth ties as drawing in order would
+        """
+        stats = self.environment.stats
+        counters = stats.counters if stats is not None else None
+        self.clear_screen()
+
+        pyramid = self._depth_pyramid
+        if pyramid is None or (pyramid.width, pyramid.height) != (self.width, self.height):
+            pyramid = self._depth_pyramid = culling.DepthPyramid(self.width, self.height)
+            self.owner_buffer = np.zeros((self.height, self.width), dtype=np.int64)
+            self._owner_view = memoryview(self.owner_buffer.reshape(-1))
+        else:
+            pyramid.clear()
+
+        # Distance from the camera to the nearest point of each bounding sphere, along the view
+        direction = basis[0].direction()
+        nearest = []
+        for item in prepared:
+            center, radius = item.bounding_sphere
+            nearest.append((center - self.position).dot_product(direction) - radius)
+
+        queue = []
+        queued = 0
+
+        def draw_queue():
+            # Draws the queued triangles that aren't hidden, and updates the pyramid
+            if stats is not None:
+                start = stats.clock()
+
+            vertices, depth_planes, shades, order, x_min, y_min, x_max, y_max, near = (np.concatenate(arrays) for arrays in zip(*queue))
+            visible = ~pyramid.occluded(x_min, y_min, x_max, y_max, near)
+            records = (vertices[visible], depth_planes[visible], shades[visible])
+
+            if self.backend == "python":
+                self._draw_records(records, counters, order=order[visible])
+            else:
+                raster.rasterize(self.color_buffer, self.depth_buffer, *records, counters=counters, order=order[visible], owner=self.owner_buffer)
+            pyramid.update(self.depth_buffer)
+
+            if stats is not None:
+                occluded = len(visible) - len(records[0])
+                stats.count("triangles_occluded", occluded)
+                stats.count("triangles_rasterized", -occluded)
+                stats.add_time("raster", stats.clock() - start)
+
+        for index in sorted(range(len(prepared)), key=nearest.__getitem__):
+            records = self._shape_records(prepared[index], basis, view_projection, planes)
+            if records is None or len(records[0]) == 0:
+                continue
+
+            x_min, y_min, x_max, y_max, near = raster.triangle_bounds(records[0], records[1], self.width, self.height)
+            if pyramid.rect_occluded(int(x_min.min()), int(y_min.min()), int(x_max.max()), int(y_max.max()), float(near.min())):
+                if stats is not None:
+                    stats.count("triangles_occluded", len(near))
+                    stats.count("triangles_rasterized", -len(near))
+                continue
+
+            order = (index << 32) + np.arange(len(near))
+            arrays = (*records, order, x_min, y_min, x_max, y_max, near)
+
+            # Large shapes are split, nearest triangles first, so those can hide the others
+            if len(near) > OCCLUSION_BATCH:
+                nearest_first = np.argsort(near, kind="stable")
+                arrays = tuple(array[nearest_first] for array in arrays)
+
+            for batch_start in range(0, len(near), OCCLUSION_BATCH):
+                queue.append(tuple(array[batch_start:batch_start + OCCLUSION_BATCH] for array in arrays))
+                queued += len(queue[-1][0])
+                if queued >= OCCLUSION_BATCH:
+                    draw_queue()
+                    queue, queued = [], 0
+
+        if queue:
+            draw_queue()
+
+    def _view_key(self):
+        # Everything besides the shapes that the image depends on
+        environment = self.environment
+        return (
+            self.transform_key(),
+            (self.width, self.height, self.zoom, self.perspective, self.depth, self.culling, self.backend, self.lod, self.occlusion),
+            tuple(light.light_key() for light in environment.lights),
+            environment.ambient_light,
+        )
+
+    def _draw_incremental(self, prepared: list[PreparedShape], basis: tuple[Vector3, Vector3, Vector3, Vector3], view_projection: np.ndarray, planes: tuple[np.ndarray, np.ndarray]):
+        """
+        Renders only the parts of the screen that changed since the last frame.
+
+        The triangle records of every shape are kept from frame to frame, with
+        the rectangle of the screen they cover. Shapes that moved, appeared or
+        disappeared mark their old and new rectangles dirty. The dirty
+        rectangles are cleared and every shape overlapping them is drawn again
+        from its records, clipped to them, in the usual order, so the image is
+        the same as a full render. Anything else that changes the image, like
+        moving the camera or a light, redraws everything.
+        """
+        stats = self.environment.stats
+        counters = stats.counters if stats is not None else None
+
+        view_key = self._view_key()
+        redraw_all = view_key != self._layers_view_key
+        if redraw_all:
+            self.clear_screen()
+
+        layers = {}
+        dirty = []
+        for item in prepared:
+            shape = item.shape
+            key = shape.transform_key() + (id(shape.mesh),)
+            layer = self._layers.get(shape)
+
+            if not redraw_all and layer is not None and layer.key == key:
+                layers[shape] = layer
+                continue
+
+            new_layer = ShapeLayer(key, self._shape_records(item, basis, view_projection, planes), self.width, self.height)
+            layers[shape] = new_layer
+            dirty.append(new_layer.rect)
+            if layer is not None:
+                dirty.append(layer.rect)
+
+        # Shapes removed or hidden since the last frame
+        dirty.extend(layer.rect for shape, layer in self._layers.items() if shape not in layers)
+
+        self._layers = layers
+        self._layers_view_key = view_key
+
+        if stats is not None:
+            start = stats.clock()
+
+        regions = raster.merge_rects(dirty)
+        if redraw_all or sum((x_1 - x_0) * (y_1 - y_0) for x_0, y_0, x_1, y_1 in regions) * 2 > self.width * self.height:
+            regions = [(0, 0, self.width, self.height)]
+
+        for region in regions:
+            x_0, y_0, x_1, y_1 = region
+            self.color_buffer[y_0:y_1, x_0:x_1] = 0
+            self.depth_buffer[y_0:y_1, x_0:x_1] = float("inf")
+
+            batch = [layer.overlapping(region) for layer in layers.values() if layer.overlaps(region)]
+            if self.backend == "python":
+                for records in batch:
+                    self._draw_records(records, counters, region)
+            elif batch:
+                vertices, depth_planes, shades = (np.concatenate(arrays) for arrays in zip(*batch))
+                raster.rasterize(self.color_buffer, self.depth_buffer, vertices, depth_planes, shades, rows=(y_0, y_1), counters=counters, columns=(x_0, x_1))
+
+        if stats is not None:
+            stats.add_time("raster", stats.clock() - start)
+
+        return self.color_buffer
+        
 
 
- 
 
 class Environment:
     def __init__(self, shapes: list[Shape]=None, lights: list[Light]=None):
@@ -295,19 +1175,203 @@ class Environment:
         #     rotation=Quaternion.from_euler(math.pi / 6, math.pi, 0),
         #     scaling=UNIT_SCALING
         # )
-        self.main_camera: Camera = None
+        # Every camera rendering the environment, the first being the main camera
+        self.cameras: list[Camera] = []
         self.lights = lights if lights is not None else []
+
+        # Brightness added to every face when there are lights, from 0 to 1
+        self.ambient_light = 0.0
+
+        # Meshes loaded from files, shared by every shape created from the same file
+        self.meshes = MeshCache()
+
+        # Frame statistics, None unless enabled with enable_stats
+        self.stats: Profiler = None
+
+        # Transforms of the shapes, None unless enabled with enable_transform_store
+        self.transforms: TransformStore = None
+
+        # Frame buffer of composite, reused between frames
+        self._frame: np.ndarray = None
+
+    @property
+    def main_camera(self) -> Camera:
+        return self.cameras[0] if self.cameras else None
+
+    @main_camera.setter
+    def main_camera(self, camera: Camera):
+        if self.cameras:
+            self.cameras[0] = camera
+        else:
+            self.cameras.append(camera)
+
+    def add_camera(self, camera: Camera, column: int = 0, row: int = 0) -> Camera:
+        """
+        Adds a camera rendering the environment alongside the main camera. With
+        several cameras, Environment.render composites their images into one
+        frame, with this camera's top left corner at the given column and row.
+        Cameras added later are drawn over earlier ones where they overlap
+        """
+        camera.viewport = (column, row)
+        self.cameras.append(camera)
+        return camera
+
+    def enable_stats(self, history: int = 120, overlay: bool = False) -> Profiler:
+        """
+        Starts recording frame statistics, see profiling.py. Returns the profiler, also available as self.stats
+
+        Arguments:
+        history: how many frames of statistics to keep
+        overlay: write a line of statistics over the top of every rendered frame
+        """
+        self.stats = Profiler(history, overlay)
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+
+    def enable_transform_store(self) -> TransformStore:
+        """
+        Keeps the shapes' transforms in a TransformStore, so that behaviors
+        implementing update_many update all their shapes in one call (see
+        transforms.py). Shapes added to or removed from self.shapes later join
+        or leave the store on the next update. Returns the store, also
+        available as self.transforms
+        """
+        if self.transforms is None:
+            self.transforms = TransformStore()
+            self.transforms.sync(self.shapes)
+        return self.transforms
+
+    def disable_transform_store(self):
+        if self.transforms is None:
+            return
+        for shape in list(self.transforms.objects):
+            self.transforms.remove(shape)
+        self.transforms = None
+
+    def save_snapshot(self, path: str, timestamp: int = 0):
+        """
+        Saves the environment to a binary snapshot file (see snapshot.py), with
+        the timestamp of the next update to run, to start from with load_snapshot
+        """
+        import snapshot
+        snapshot.save_snapshot(self, path, timestamp)
+
+    @classmethod
+    def load_snapshot(cls, path: str, mmap: bool = True) -> tuple[Environment, int]:
+        """
+        Loads an environment saved by save_snapshot, returning it and the timestamp
+        to continue from. With mmap, the meshes are memory mapped from the file
+        """
+        import snapshot
+        return snapshot.load_snapshot(path, mmap)
         
     def update(self, timestamp):
-        for shape in self.shapes:
-            shape.update(timestamp)
-        self.main_camera.update(timestamp)
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
+
+        # Batched behaviors run first, then every shape's other behaviors
+        if self.transforms is not None:
+            self.transforms.sync(self.shapes)
+            self.transforms.update(timestamp, stats)
+
+        objects = (self.shapes, self.lights, self.cameras)
+        if stats is None:
+            for group in objects:
+                for obj in group:
+                    obj.update(timestamp)
+        else:
+            # Each object's update is counted as the time of its behaviors
+            for group in objects:
+                for obj in group:
+                    obj_start = stats.clock()
+                    obj.update(timestamp)
+                    stats.add_behavior_time(obj._behavior_names(), stats.clock() - obj_start)
+            stats.add_time("update", stats.clock() - start)
         
-    def render(self):
-        return self.main_camera.render()
+    def prepare_shapes(self) -> list[PreparedShape]:
+        """
+        Returns the shapes to render this frame, see PreparedShape
+        """
+        return [PreparedShape(shape, self.lights, self.ambient_light) for shape in self.shapes if not shape.hidden]
+
+    def draw_cameras(self) -> list[np.ndarray]:
+        """
+        Draws the frame with every camera, returning each camera's palette
+        indices (see Camera.draw). The shapes are transformed, and their normals
+        and lighting computed, once for all the cameras
+        """
+        prepared = self.prepare_shapes()
+        return [camera.draw(prepared) for camera in self.cameras]
+
+    def render_cameras(self) -> list[list[list[str]]]:
+        """
+        Renders the frame with every camera, returning each camera's own screen as rows of characters
+        """
+        self.draw_cameras()
+        return [camera.screen for camera in self.cameras]
+
+    def composite(self, images: list[np.ndarray]) -> np.ndarray:
+        """
+        Places the cameras' palette indices at their viewports in one frame just
+        big enough for all of them. The frame's buffer is reused between calls
+        """
+        width = max(camera.viewport[0] + camera.width for camera in self.cameras)
+        height = max(camera.viewport[1] + camera.height for camera in self.cameras)
+
+        if self._frame is None or self._frame.shape != (height, width):
+            self._frame = np.zeros((height, width), dtype=np.uint8)
+        else:
+            self._frame.fill(0)
+
+        for camera, image in zip(self.cameras, images):
+            column, row = camera.viewport
+            self._frame[row:row + camera.height, column:column + camera.width] = image
+        return self._frame
+
+    def draw(self) -> np.ndarray:
+        """
+        Draws a frame, returning the (height, width) array of palette indices
+        (see PALETTE) of the main camera, or of every camera composited
+        """
+        images = self.draw_cameras()
+        frame = images[0] if len(images) == 1 else self.composite(images)
+
+        if self.stats is not None:
+            self.stats.end_frame()
+        return frame
+
+    def _overlay_line(self, width: int) -> str:
+        # The line of statistics written over the top of the frame, if enabled
+        stats = self.stats
+        if stats is None or not stats.overlay:
+            return None
+        return stats.overlay_line(width)
+
+    def render(self) -> list[list[str]]:
+        """
+        Draws a frame and returns it as rows of characters
+        """
+        frame = self.draw()
+        screen = raster.to_characters(frame, PALETTE)
+
+        overlay = self._overlay_line(frame.shape[1])
+        if overlay is not None and screen:
+            screen[0] = list(overlay)
+        return screen
+
+    def render_bytes(self) -> bytes:
+        """
+        Draws a frame and encodes it for a sink like encode_frame(self.render()),
+        going straight from palette indices to bytes
+        """
+        frame = self.draw()
+        return encode_indices(frame, PALETTE, self._overlay_line(frame.shape[1]))
     
     def create_shape_from_file(self, filepath: type[Shape], position: Vector3, rotation: Quaternion, scaling: Vector3):
-        new_shape = Shape.from_obj(filepath, position, rotation, scaling)
+        new_shape = Shape.from_mesh(self.meshes.load(filepath), position, rotation, scaling)
         self.shapes.append(new_shape)
         return new_shape
 
@@ -327,24 +1391,60 @@ class Environment:
         self.shapes.append(new_shape)
         return new_shape
 
+    def create_directional_light(self, rotation: Quaternion, intensity: float = 1.0):
+        new_light = DirectionalLight(rotation, intensity)
+        self.lights.append(new_light)
+        return new_light
+
+    def create_point_light(self, position: Vector3, intensity: float = 1.0, range: float = None):
+        new_light = PointLight(position, intensity, range)
+        self.lights.append(new_light)
+        return new_light
+
+
+def main_loop(env: Environment, output_file: str="output.txt", sleep_time: float=0.1, sink: FrameSink=None, fps: float=None, max_frame_skip: int=5,
+              timestamp: int=0, snapshot_path: str=None, snapshot_interval: int=600):
+    """
+    Updates and renders the environment forever, sending every frame to a sink.
+
+    The environment is updated every sleep_time seconds of wall clock time,
+    however long rendering takes, and the timestamps passed to the behaviors
+    count these updates. scheduler.Time gives the timing in seconds.
+
+    Arguments:
+    output_file: the text file frames are written to when no sink is given
+    sleep_time: seconds between updates
+    sink: where frames are sent, see sinks.py
+    fps: frames rendered per second, by default one per update
+    max_frame_skip: most frames skipped in a row when rendering falls behind
+    timestamp: the first update's timestamp, e.g. the one returned by Environment.load_snapshot
+    snapshot_path: save a snapshot of the environment there every snapshot_interval
+        updates, to restart from after a crash (see Environment.save_snapshot)
+    """
+    sink = sink if sink is not None else FileSink(output_file)
 
-def main_loop(env: Environment, output_file: str="output.txt", sleep_time: float=0.1):
-    timestamp = 0
-    while True:
+    def update(timestamp: int):
         env.update(timestamp)
-        output = env.render()
-        timestamp += 1
+        if snapshot_path is not None and (timestamp + 1) % snapshot_interval == 0:
+            env.save_snapshot(snapshot_path, timestamp + 1)
 
-        with open(output_file, 'w') as file:
-            output_str = ""
-            for row in output:
-                new_row = "".join([element for tup in zip(row, row) for element in tup])
-                output_str += new_row
-                output_str += "\n"
+    def render():
+        frame = env.render_bytes()
 
-            file.write(output_str)
-        
-        sleep(0.1)
+        stats = env.stats
+        if stats is not None:
+            start = stats.clock()
+
+        sink.write(frame)
+
+        # Counted in the next frame's statistics, since this one has ended
+        if stats is not None:
+            stats.add_time("output", stats.clock() - start)
+
+    try:
+        Scheduler(update, render, timestep=sleep_time, fps=fps, max_frame_skip=max_frame_skip, timestamp=timestamp).run()
+    finally:
+        sink.close()
     
 if __name__ == "__main__":
     e = Environment()
@@ -391,21 +1491,4 @@ if __name__ == "__main__":
     
     # e = Environment()
 
-    time = 0 
-    while True:
-        output = e.render()
-        time += 1
-        # s.rotate()
-        e.update(time)
-
-        with open("output.txt", 'w') as file:
-            output_str = ""
-            for row in output:
-                new_row = "".join([element for tup in zip(row, row) for element in tup])
-                output_str += new_row
-                output_str += "\n"
-
-            file.write(output_str)
-            
-        sleep(0.1)
-        
\ No newline at end of file
+    main_loop(e, "output.txt", 0.1)
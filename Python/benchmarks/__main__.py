@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Command line interface of the benchmark suite, see benchmarks/suite.py.
+
+Run from the Python folder, e.g.
+    python -m benchmarks --frames 30 --output results.json
+    python -m benchmarks --scene teapot --resolution 240x120 --compare results.json
+"""
+import argparse
+import json
+import sys
+
+from asciithree import RASTER_BACKENDS
+from benchmarks.suite import RESOLUTIONS, SCENES, STAGES, case_name, run_suite
+
+
+def parse_resolution(text: str) -> tuple[int, int]:
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a resolution like 70x50, got {text!r}")
+    return width, height
+
+
+def print_result(result: dict):
+    stages = "  ".join(f"{stage} {result['stages_ms'][stage]:7.2f}" for stage in STAGES)
+    print(f"{case_name(result):<28} {result['fps']:8.1f} fps  {stages}  "
+          f"peak {result['peak_memory_bytes'] / 2**20:6.1f} MiB  {result['checksum'][:12]}", flush=True)
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Prints the speedup of every case against a previous run and whether its output changed
+    """
+    previous = {case_name(result): result for result in baseline["results"]}
+    print(f"\nCompared with {baseline['environment'].get('commit') or 'baseline'}:")
+
+    changed = 0
+    for result in results["results"]:
+        name = case_name(result)
+        if name not in previous:
+            continue
+
+        old = previous[name]
+        same = old["checksum"] == result["checksum"] and old["frames"] == result["frames"]
+        changed += not same
+        print(f"{name:<28} {result['fps'] / old['fps']:6.2f}x fps  {'same output' if same else 'OUTPUT CHANGED'}")
+
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks rendering the preset scenes.")
+    parser.add_argument("--frames", type=int, default=20, help="frames rendered per case (default 20)")
+    parser.add_argument("--scene", action="append", choices=list(SCENES), help="scene to run, can be repeated (default all)")
+    parser.add_argument("--resolution", action="append", type=parse_resolution,
+                        help="camera resolution like 70x50, can be repeated (default %s)" % ", ".join(f"{w}x{h}" for w, h in RESOLUTIONS))
+    parser.add_argument("--projection", choices=("perspective", "orthographic", "both"), default="both")
+    parser.add_argument("--backend", choices=RASTER_BACKENDS, default="python")
+    parser.add_argument("--culling", action="store_true", help="enable view frustum culling")
+    parser.add_argument("--output", help="save the results as JSON to this file")
+    parser.add_argument("--compare", help="compare with the results saved in this JSON file")
+    args = parser.parse_args(argv)
+
+    projections = {"perspective": (True,), "orthographic": (False,), "both": (True, False)}[args.projection]
+
+    results = run_suite(
+        scenes=args.scene,
+        resolutions=args.resolution,
+        projections=projections,
+        frames=args.frames,
+        report=print_result,
+        backend=args.backend,
+        culling=args.culling,
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
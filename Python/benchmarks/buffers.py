@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Measures the time and memory allocated per frame by the camera's frame
+buffers: clearing them, drawing into them (Camera.draw) and turning them into
+characters for output, against the nested lists of characters and floats
+the camera used to rebuild every frame.
+
+Run from the Python folder with `python -m benchmarks.buffers`.
+"""
+import time
+import tracemalloc
+
+from benchmarks.suite import build_scene
+
+
+def legacy_clear(width: int, height: int):
+    # What Camera.clear_screen used to allocate every frame
+    screen = [[" " for _ in range(width)] for _ in range(height)]
+    z_buffer = [[float("inf") for _ in range(width)] for _ in range(height)]
+    return screen, z_buffer
+
+
+def measure(function, frames: int) -> tuple[float, float]:
+    """
+    Returns the mean time in milliseconds and the mean memory allocated in KiB per call
+    """
+    start = time.perf_counter()
+    for _ in range(frames):
+        function()
+    elapsed = (time.perf_counter() - start) / frames
+
+    tracemalloc.start()
+    for _ in range(frames):
+        function()
+    allocated = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return elapsed * 1e3, allocated
+
+
+def main(frames: int = 10):
+    for width, height in ((70, 50), (140, 70)):
+        for backend in ("python", "numpy"):
+            env = build_scene("teapot", width, height, True, backend=backend)
+            env.update(0)
+            camera = env.main_camera
+
+            cases = {
+                "clear (nested lists)": lambda: legacy_clear(width, height),
+                "clear (buffers)": camera.clear_screen,
+                "draw": env.draw,
+                "render_bytes": env.render_bytes,
+                "render (rows of characters)": env.render,
+            }
+            print(f"{width}x{height}, {backend} backend:")
+            for name, function in cases.items():
+                elapsed, allocated = measure(function, frames)
+                print(f"  {name:>28}: {elapsed:6.2f} ms, peak {allocated:7.1f} KiB allocated")
+
+
+if __name__ == "__main__":
+    main()
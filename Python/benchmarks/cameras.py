@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compares rendering a scene from three viewpoints (front, side and top) with
+three cameras in one Environment, against three separate Environments that
+each update and transform every shape for their own camera.
+
+Run from the Python folder with `python -m benchmarks.cameras`.
+"""
+import math
+import time
+
+from asciithree import *
+from benchmarks.suite import SCENES
+
+# Position and rotation of each viewpoint
+VIEWS = [
+    (Vector3(0, 0, 35), Quaternion.from_euler(0, math.pi, 0)),
+    (Vector3(-35, 0, 0), Quaternion.from_euler(0, math.pi / 2, 0)),
+    (Vector3(0, 35, 0.01), Quaternion.from_euler(math.pi / 2, math.pi, 0)),
+]
+
+
+def make_camera(env: Environment, view: int, width: int, height: int, **camera_options) -> Camera:
+    position, rotation = VIEWS[view]
+    return Camera(width, height, env, width / 70, True, 100, position, rotation, UNIT_SCALING, **camera_options)
+
+
+def shared_environment(scene: str, width: int, height: int, **camera_options) -> Environment:
+    env = Environment()
+    SCENES[scene](env)
+    for view in range(len(VIEWS)):
+        env.add_camera(make_camera(env, view, width, height, **camera_options), column=view * width)
+    return env
+
+
+def separate_environments(scene: str, width: int, height: int, **camera_options) -> list[Environment]:
+    envs = []
+    for view in range(len(VIEWS)):
+        env = Environment()
+        SCENES[scene](env)
+        env.main_camera = make_camera(env, view, width, height, **camera_options)
+        envs.append(env)
+    return envs
+
+
+def time_frames(envs: list[Environment], frames: int) -> float:
+    start = time.perf_counter()
+    for timestamp in range(frames):
+        for env in envs:
+            env.update(timestamp)
+            env.render()
+    return (time.perf_counter() - start) / frames
+
+
+def main(frames: int = 10, width: int = 50, height: int = 35):
+    for scene in ("teapot", "instances"):
+        for backend in ("python", "numpy"):
+            shared = time_frames([shared_environment(scene, width, height, backend=backend)], frames)
+            separate = time_frames(separate_environments(scene, width, height, backend=backend), frames)
+            print(f"{scene}, {backend} backend, {len(VIEWS)} views: {shared * 1e3:.1f} ms/frame shared, {separate * 1e3:.1f} ms/frame in separate environments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Compares full and incremental rendering (Camera(incremental=True)) of a
+static grid of cubes and teapot in which only a few shapes oscillate, for an
+increasing number of moving shapes.
+
+Run from the Python folder with `python -m benchmarks.incremental`.
+"""
+import math
+import time
+
+from asciithree import *
+from scripts.oscillating import oscillating
+
+
+def build(moving: int, backend: str, incremental: bool) -> Environment:
+    env = Environment()
+    env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 2)
+
+    shapes = []
+    for i in range(10):
+        for j in range(10):
+            shapes.append(env.create_cube(Vector3(3*i - 13.5, -4, 3*j - 13.5), Quaternion.IDENTITY, UNIT_SCALING))
+    for shape in shapes[:moving]:
+        shape.add_behavior(oscillating(0.3))
+
+    env.main_camera = Camera(
+        140, 70, env, 2, True, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING,
+        backend=backend, incremental=incremental,
+    )
+    return env
+
+
+def time_frames(env: Environment, frames: int) -> float:
+    env.update(0)
+    env.render()
+
+    start = time.perf_counter()
+    for timestamp in range(1, frames + 1):
+        env.update(timestamp)
+        env.render()
+    return (time.perf_counter() - start) / frames
+
+
+def main(frames: int = 10):
+    for backend in ("python", "numpy"):
+        for moving in (0, 1, 10, 100):
+            full = time_frames(build(moving, backend, False), frames)
+            incremental = time_frames(build(moving, backend, True), frames)
+            print(f"{backend} backend, {moving} of 101 shapes moving: {full * 1e3:.1f} ms/frame full, {incremental * 1e3:.1f} ms/frame incremental")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Measures load time and memory for N copies of the "among us" preset, with
+each shape loading its own mesh (Shape.from_obj) against shapes sharing one
+mesh through the Environment's mesh cache (Environment.create_preset_shape).
+
+Run from the Python folder with `python -m benchmarks.instancing`.
+"""
+import time
+import tracemalloc
+
+from asciithree import *
+
+PRESET = "among us"
+
+
+def separate(count: int):
+    env = Environment()
+    for i in range(count):
+        env.shapes.append(Shape.from_obj(f"presets/{PRESET}.obj", Vector3(i, 0, 0), Quaternion.IDENTITY, UNIT_SCALING))
+    return env
+
+
+def shared(count: int):
+    env = Environment()
+    for i in range(count):
+        env.create_preset_shape(PRESET, Vector3(i, 0, 0), Quaternion.IDENTITY, UNIT_SCALING)
+    return env
+
+
+def measure(build, count: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    env = build(count)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    meshes = {id(shape.mesh) for shape in env.shapes}
+    return elapsed, memory, len(meshes)
+
+
+def main(counts=(1, 10, 100, 500)):
+    # Warm the on-disk mesh cache so both variants skip OBJ parsing
+    Shape.from_obj(f"presets/{PRESET}.obj", ZERO_VECTOR, Quaternion.IDENTITY, UNIT_SCALING)
+
+    print(f"{'instances':>10} {'variant':>9} {'meshes':>7} {'load time':>11} {'memory':>11}")
+    for count in counts:
+        for name, build in (("separate", separate), ("shared", shared)):
+            elapsed, memory, meshes = measure(build, count)
+            print(f"{count:>10} {name:>9} {meshes:>7} {elapsed * 1e3:9.1f}ms {memory / 2**20:8.2f}MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Measures the cost of lights per frame: shading by the viewing direction
+without lights, lit shading cached between frames, and lit shading
+recomputed every frame (as when the lights move).
+
+Run from the Python folder with `python -m benchmarks.lighting`.
+"""
+import time
+
+from asciithree import *
+from benchmarks.suite import build_scene
+
+
+def render_frames(env: Environment, frames: int, moving_light: Light = None) -> float:
+    start = time.perf_counter()
+    for timestamp in range(frames):
+        if moving_light is not None:
+            moving_light.rotation = Quaternion.from_euler(0.5, 0.1 * timestamp, 0)
+        env.render()
+    return (time.perf_counter() - start) / frames
+
+
+def lit_scene(scene: str, **camera_options) -> Environment:
+    env = build_scene(scene, 70, 50, True, **camera_options)
+    env.ambient_light = 0.1
+    env.create_directional_light(Quaternion.from_euler(0.5, 0.3, 0), 0.8)
+    env.create_point_light(Vector3(0, 10, 10), 1.0, range=20)
+    return env
+
+
+def main(frames: int = 10):
+    for scene in ("teapot", "instances"):
+        for backend in ("python", "numpy"):
+            env = build_scene(scene, 70, 50, True, backend=backend)
+            env.update(0)
+            unlit = render_frames(env, frames)
+
+            env = lit_scene(scene, backend=backend)
+            env.update(0)
+            cached = render_frames(env, frames)
+
+            env = lit_scene(scene, backend=backend)
+            env.update(0)
+            recomputed = render_frames(env, frames, moving_light=env.lights[0])
+
+            print(
+                f"{scene}, {backend} backend: {unlit * 1e3:.1f} ms/frame without lights, "
+                f"{cached * 1e3:.1f} with cached lighting, {recomputed * 1e3:.1f} with a moving light"
+            )
+
+
+if __name__ == "__main__":
+    main()
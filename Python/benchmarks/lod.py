@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Renders a teapot at decreasing sizes on screen with and without levels of
+detail (Camera(lod=True)), printing the frame time, the triangles drawn
+and how many characters differ from the full resolution image.
+
+Run from the Python folder with `python -m benchmarks.lod`.
+"""
+import math
+import time
+
+from asciithree import *
+
+
+def build(distance: float, backend: str, lod: bool) -> Environment:
+    env = Environment()
+    env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 3)
+    env.main_camera = Camera(
+        140, 70, env, 2, True, 100, Vector3(0, 0, distance), Quaternion.from_euler(0, math.pi, 0), UNIT_SCALING,
+        backend=backend, lod=lod,
+    )
+    env.enable_stats()
+    return env
+
+
+def measure(env: Environment, frames: int) -> tuple[float, int, list[list[str]]]:
+    screen = env.render()
+    start = time.perf_counter()
+    for _ in range(frames):
+        env.render()
+    elapsed = (time.perf_counter() - start) / frames
+    return elapsed, env.stats.last["counters"].get("triangles_submitted", 0), screen
+
+
+def main(frames: int = 5):
+    # Distances at which the teapot covers from most of the screen to a few characters
+    for backend in ("python", "numpy"):
+        for distance in (40, 150, 400, 1000):
+            full_time, full_triangles, full_screen = measure(build(distance, backend, False), frames)
+            lod_time, lod_triangles, lod_screen = measure(build(distance, backend, True), frames)
+
+            covered = sum(char != " " for row in full_screen for char in row)
+            changed = sum(a != b for row_a, row_b in zip(full_screen, lod_screen) for a, b in zip(row_a, row_b))
+            print(
+                f"{backend} backend, distance {distance} ({covered} characters): "
+                f"full {full_time * 1e3:.1f} ms, {full_triangles} triangles; "
+                f"lod {lod_time * 1e3:.1f} ms, {lod_triangles} triangles, {changed} characters differ"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compares the memory and speed of the current math layer against the original
+dict-backed Vector3, whose relevant parts are reproduced below.
+
+Run from the Python folder with `python -m benchmarks.math_layer`.
+"""
+from __future__ import annotations
+
+import timeit
+import tracemalloc
+
+from math_3d import *
+
+
+class LegacyVector3:
+    def __init__(self, x: float, y: float, z: float):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def dot_product(self, other):
+        return self.x*other.x + self.y*other.y + self.z*other.z
+
+    def __add__(self, other):
+        return LegacyVector3(self.x+other.x, self.y+other.y, self.z+other.z)
+
+    def __sub__(self, other):
+        return self + -other
+
+    def __mul__(self, number: float):
+        return LegacyVector3(self.x*number, self.y*number, self.z*number)
+
+    def __neg__(self):
+        return self * (-1)
+
+
+def bytes_per_vertex(build, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    vertices = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del vertices
+    return (after - before) / count
+
+
+def ops_per_second(statement, number: int = 200_000) -> float:
+    return number / min(timeit.repeat(statement, number=number, repeat=5))
+
+
+def main(count: int = 100_000):
+    print(f"Memory per mesh vertex ({count} vertices)")
+    memory = {
+        "legacy Vector3": bytes_per_vertex(lambda n: [LegacyVector3(i, i, i) for i in range(n)], count),
+        "Vector3": bytes_per_vertex(lambda n: [Vector3(i, i, i) for i in range(n)], count),
+        "Vector3Array": bytes_per_vertex(lambda n: Vector3Array.zeros(n), count),
+    }
+    for name, size in memory.items():
+        print(f"{name:>16}: {size:7.1f} bytes")
+
+    a, b = LegacyVector3(1.0, 2.0, 3.0), LegacyVector3(4.0, 5.0, 6.0)
+    c, d = Vector3(1.0, 2.0, 3.0), Vector3(4.0, 5.0, 6.0)
+
+    print("\nOperations per second")
+    operations = {
+        "a + b": (lambda: a + b, lambda: c + d, lambda: c.iadd(d)),
+        "a - b": (lambda: a - b, lambda: c - d, lambda: c.isub(d)),
+        "a * 2": (lambda: a * 2.0, lambda: c * 2.0, lambda: c.imul(1.0)),
+        "a . b": (lambda: a.dot_product(b), lambda: c.dot_product(d), None),
+    }
+    print(f"{'':>8} {'legacy':>12} {'Vector3':>12} {'in place':>12}")
+    for name, (legacy, current, in_place) in operations.items():
+        rates = [ops_per_second(legacy), ops_per_second(current)]
+        rates.append(ops_per_second(in_place) if in_place is not None else None)
+        print(f"{name:>8} " + " ".join(f"{rate / 1e6:10.2f} M" if rate else f"{'-':>12}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
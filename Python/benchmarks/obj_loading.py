@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Compares loading the preset models by parsing the OBJ text (cold) against
+loading them from the binary mesh cache.
+
+Run from the Python folder with `python -m benchmarks.obj_loading`.
+"""
+import os
+import timeit
+
+from obj_loader import CACHE_SUFFIX, load_obj, parse_obj
+
+PRESETS = ["teapot", "sphere", "among us"]
+
+
+def main(repeat: int = 5):
+    print(f"{'model':>10} {'triangles':>10} {'cold':>10} {'cached':>10} {'speedup':>8}")
+
+    for preset in PRESETS:
+        filename = os.path.join("presets", f"{preset}.obj")
+
+        # Make sure the cache exists before timing cached loads
+        vertices, triangles = load_obj(filename)
+
+        cold = min(timeit.repeat(lambda: parse_obj(filename), number=1, repeat=repeat))
+        cached = min(timeit.repeat(lambda: load_obj(filename), number=1, repeat=repeat))
+
+        print(f"{preset:>10} {len(triangles):>10} {cold * 1e3:8.2f}ms {cached * 1e3:8.2f}ms {cold / cached:7.1f}x")
+
+    print(f"\nCache files are stored next to the models with the {CACHE_SUFFIX} suffix")
+
+
+if __name__ == "__main__":
+    main()
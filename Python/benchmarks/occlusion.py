@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compares drawing with and without occlusion culling (Camera(occlusion=True))
+on overdrawn scenes: the shapes of asciithree.py's example nested in each
+other, and a teapot behind a wall of cubes. Reports the time per frame, the
+overdraw (depth tests per covered pixel) and the triangles rejected, and
+checks that the frames are the same.
+
+Run from the Python folder with `python -m benchmarks.occlusion`.
+"""
+import math
+import time
+
+from asciithree import *
+from benchmarks.suite import Spin
+
+
+def nested(env: Environment):
+    env.create_cube(Vector3(0, 0, 0), Quaternion.IDENTITY, UNIT_SCALING * 5).add_behavior(Spin(0.1))
+    env.create_cube(Vector3(5, -5, -5), Quaternion.IDENTITY, Vector3(1, 0.5, 1) * 5)
+    env.create_tetrahedron(Vector3(5, 5, 5), Quaternion.IDENTITY, UNIT_SCALING * 5)
+    env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.IDENTITY, UNIT_SCALING * 3).add_behavior(Spin(0.2))
+    env.create_preset_shape("among us", Vector3(0, 0, 0), Quaternion.IDENTITY, UNIT_SCALING / 15)
+
+
+def wall(env: Environment):
+    # Drawn first, so that without occlusion culling the wall is drawn over it
+    env.create_preset_shape("teapot", Vector3(0, 0, -6), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 3).add_behavior(Spin(0.1))
+    for i in range(11):
+        for j in range(6):
+            env.create_cube(Vector3(2*i - 10, 2*j + 5, 10), Quaternion.IDENTITY, UNIT_SCALING * 2)
+
+
+SCENES = {"nested": nested, "wall": wall}
+
+
+def build(scene: str, backend: str, occlusion: bool) -> Environment:
+    env = Environment()
+    SCENES[scene](env)
+    env.main_camera = Camera(
+        140, 70, env, 2, True, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING,
+        backend=backend, occlusion=occlusion,
+    )
+    env.enable_stats()
+    return env
+
+
+def run(env: Environment, frames: int, repeats: int = 3) -> tuple[float, list[bytes]]:
+    # Best time per frame over the repeats, after a first frame that fills the caches
+    env.update(0)
+    env.render_bytes()
+
+    best = float("inf")
+    for _ in range(repeats):
+        images = []
+        start = time.perf_counter()
+        for timestamp in range(1, frames + 1):
+            env.update(timestamp)
+            images.append(env.render_bytes())
+        best = min(best, (time.perf_counter() - start) / frames)
+    return best, images
+
+
+def main(frames: int = 5):
+    for scene in SCENES:
+        for backend in ("python", "numpy"):
+            results = {}
+            for occlusion in (False, True):
+                env = build(scene, backend, occlusion)
+                seconds, images = run(env, frames)
+                summary = env.stats.summary()["counters"]
+                results[occlusion] = (seconds, images, env.stats.overdraw(), summary["triangles_occluded"]["mean"], summary["triangles_rasterized"]["mean"])
+
+            (off, off_images, off_overdraw, _, off_drawn), (on, on_images, on_overdraw, occluded, on_drawn) = results[False], results[True]
+            print(f"{scene:>6}, {backend:>6}: {off * 1e3:6.1f} -> {on * 1e3:6.1f} ms/frame ({off / on:.2f}x), "
+                  f"overdraw {off_overdraw:.2f} -> {on_overdraw:.2f}, triangles drawn {off_drawn:.0f} -> {on_drawn:.0f} "
+                  f"({occluded:.0f} occluded), same frames: {off_images == on_images}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Renders an animation of a benchmark scene offline (offline.render_animation)
+with one and with several worker processes, checks that playing the file
+back gives the same frames as rendering them directly, and compares its size
+to the text main_loop would write.
+
+Run from the Python folder with `python -m benchmarks.offline`.
+"""
+import os
+import tempfile
+import time
+from functools import partial
+
+from animation import AnimationReader
+from benchmarks.suite import build_scene
+from offline import render_animation
+from sinks import encode_frame
+
+
+def main(scene: str = "teapot", frames: int = 60):
+    build = partial(build_scene, scene, 70, 50, True, backend="numpy")
+
+    # Frames as main_loop would draw them, one after the other
+    env = build()
+    start = time.perf_counter()
+    expected = []
+    for timestamp in range(frames):
+        env.update(timestamp)
+        expected.append(encode_frame(env.render()))
+    sequential = time.perf_counter() - start
+    text_bytes = sum(len(frame) for frame in expected)
+    print(f"{scene}, {frames} frames: {sequential:.2f} s rendering in a loop, {text_bytes} bytes of text")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, f"{scene}.anim")
+
+        for workers in sorted({1, os.cpu_count() or 1, 4}):
+            result = render_animation(build, frames, path, workers=workers)
+            print(f"  {workers} workers: {result['seconds']:.2f} s, {result['bytes']} bytes ({text_bytes / result['bytes']:.0f}x smaller than text)")
+
+        with AnimationReader(path) as reader:
+            start = time.perf_counter()
+            played = [reader.frame_bytes(i) for i in range(len(reader))]
+            playback = time.perf_counter() - start
+            reader.frame(frames // 2)
+            seeked = reader.frame_bytes(frames - 1)
+
+        print(f"  playback: {playback / frames * 1e3:.2f} ms/frame, frames identical: {played == expected and seeked == expected[-1]}")
+
+
+if __name__ == "__main__":
+    main()
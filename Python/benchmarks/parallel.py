@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Measures how the parallel backend scales with the number of workers on a
+wide camera, and checks its output is identical to the serial backends.
+
+Run from the Python folder with `python -m benchmarks.parallel`.
+"""
+import math
+import os
+import time
+
+from asciithree import *
+
+WIDTH, HEIGHT = 240, 120
+
+
+def build_scene(backend: str, workers: int = None) -> Environment:
+    env = Environment()
+    env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 6)
+    env.create_preset_shape("sphere", Vector3(-12, 6, 0), Quaternion.IDENTITY, UNIT_SCALING * 3)
+    env.create_cube(Vector3(12, -6, 0), Quaternion.from_euler(0.5, 0.5, 0), UNIT_SCALING * 4)
+
+    env.main_camera = Camera(
+        width=WIDTH,
+        height=HEIGHT,
+        environment=env,
+        zoom=3,
+        perspective=True,
+        depth=100,
+        position=Vector3(0, 25, 30),
+        rotation=Quaternion.from_euler(math.pi / 6, math.pi, 0),
+        scaling=UNIT_SCALING,
+        backend=backend,
+        workers=workers,
+    )
+    return env
+
+
+def time_frames(env: Environment, frames: int) -> tuple[float, str]:
+    env.render()  # warm up caches and worker processes
+    start = time.perf_counter()
+    for _ in range(frames):
+        output = env.render()
+    elapsed = (time.perf_counter() - start) / frames
+    return elapsed, "\n".join("".join(row) for row in output)
+
+
+def main(frames: int = 5, worker_counts=(1, 2, 4, 8)):
+    print(f"{WIDTH}x{HEIGHT}, {os.cpu_count()} CPUs available")
+
+    serial_time, expected = time_frames(build_scene("python"), frames)
+    print(f"{'python':>12}: {serial_time * 1e3:8.1f} ms/frame")
+
+    numpy_time, output = time_frames(build_scene("numpy"), frames)
+    print(f"{'numpy':>12}: {numpy_time * 1e3:8.1f} ms/frame  identical: {output == expected}")
+
+    for workers in worker_counts:
+        env = build_scene("parallel", workers)
+        elapsed, output = time_frames(env, frames)
+        env.main_camera.close()
+        print(f"{f'{workers} workers':>12}: {elapsed * 1e3:8.1f} ms/frame  identical: {output == expected}  ({numpy_time / elapsed:.2f}x numpy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Prints the frame statistics of a benchmark scene for every raster backend,
+and measures the overhead of recording them.
+
+Run from the Python folder with `python -m benchmarks.profiling`.
+"""
+import time
+
+from benchmarks.suite import build_scene
+from profiling import COUNTERS, STAGES
+
+
+def render_frames(env, frames: int) -> float:
+    start = time.perf_counter()
+    for timestamp in range(frames):
+        env.update(timestamp)
+        env.render()
+    return (time.perf_counter() - start) / frames
+
+
+def main(scene: str = "teapot", frames: int = 10):
+    for backend in ("python", "numpy"):
+        disabled = render_frames(build_scene(scene, 70, 50, True, backend=backend), frames)
+
+        env = build_scene(scene, 70, 50, True, backend=backend)
+        env.enable_stats(overlay=True)
+        enabled = render_frames(env, frames)
+
+        summary = env.stats.summary()
+        print(f"{scene}, {backend} backend: {disabled * 1e3:.1f} ms/frame without stats, {enabled * 1e3:.1f} ms/frame with them")
+        print("  " + "  ".join(f"{stage} {summary['times_ms'][stage]['mean']:.2f}ms" for stage in STAGES))
+        print("  " + "  ".join(f"{counter} {summary['counters'][counter]['mean']:.0f}" for counter in COUNTERS))
+        print("  behaviors: " + "  ".join(f"{name} {cost['mean']:.3f}ms" for name, cost in summary["behaviors_ms"].items()))
+        print("  overlay: " + "".join(env.render()[0]))
+
+
+if __name__ == "__main__":
+    main()
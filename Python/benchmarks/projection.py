@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Measures projecting the teapot's vertices to the screen one at a time
+(Camera.world_to_screen_space) against all at once (Camera.project), and
+checks both give the same screen coordinates.
+
+Run from the Python folder with `python -m benchmarks.projection`.
+"""
+import math
+import time
+
+from asciithree import *
+
+
+def main(repeats: int = 5):
+    env = Environment()
+    shape = env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 3)
+
+    for perspective in (True, False):
+        camera = Camera(120, 60, env, 2, perspective, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING)
+        points = shape.world_vertices()
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            single = [camera.world_to_screen_space(point) for point in points.tolist()]
+        single_time = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            batched = camera.project(points)
+        batched_time = (time.perf_counter() - start) / repeats
+
+        name = "perspective" if perspective else "orthographic"
+        print(f"{name:>12}: {len(points)} vertices, one at a time {single_time * 1e3:7.2f} ms, "
+              f"batched {batched_time * 1e3:6.3f} ms ({single_time / batched_time:.0f}x), "
+              f"identical: {single == [tuple(point) for point in batched.tolist()]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Measures the pixel throughput of the Python rasterizer on the teapot,
+against the previous loop that tested every pixel of each triangle's
+bounding box and computed the depth with a ray-plane intersection.
+
+Run from the Python folder with `python -m benchmarks.rasterization`.
+"""
+import math
+import time
+
+from asciithree import *
+
+
+def legacy_render_triangle(camera: Camera, screen: list[list[str]], z_buffer: list[list[float]], intensity: str, triangle, plane_distance: float, triangle_normal, basis):
+    # The loop Camera._render_triangle used to run, on the nested lists the camera used to draw into
+    rect_min_x = min([vertex[0] for vertex in triangle])
+    rect_max_x = max([vertex[0] for vertex in triangle])
+    rect_min_y = min([vertex[1] for vertex in triangle])
+    rect_max_y = max([vertex[1] for vertex in triangle])
+
+    a, b, c = triangle
+    x_vec, y_vec, depth_normal = basis
+    x_x, x_y, x_z = x_vec.as_tuple()
+    y_x, y_y, y_z = y_vec.as_tuple()
+    d_x, d_y, d_z = depth_normal.as_tuple()
+    n_x, n_y, n_z = triangle_normal
+
+    tested = 0
+
+    for y in range(max(rect_min_y, 0), min(rect_max_y, camera.height - 1) + 1):
+        for x in range(max(rect_min_x, 0), min(rect_max_x, camera.width - 1) + 1):
+            x_a = (x-a[0], y-a[1])
+            x_b = (x-b[0], y-b[1])
+            x_c = (x-c[0], y-c[1])
+
+            a_b = x_a[0]*x_b[1]-x_b[0]*x_a[1]
+            b_c = x_b[0]*x_c[1]-x_c[0]*x_b[1]
+            c_a = x_c[0]*x_a[1]-x_a[0]*x_c[1]
+
+            if a_b <= 0 and b_c <= 0 and c_a <= 0 or a_b >= 0 and b_c >= 0 and c_a >= 0:
+                u = x - camera.width // 2
+                v = camera.height // 2 - y
+
+                p_x = u*x_x + v*y_x + d_x
+                p_y = u*x_y + v*y_y + d_y
+                p_z = u*x_z + v*y_z + d_z
+
+                dist = plane_distance * (math.sqrt(p_x*p_x + p_y*p_y + p_z*p_z) / (p_x*n_x + p_y*n_y + p_z*n_z))
+                tested += 1
+
+                if dist < z_buffer[y][x]:
+                    screen[y][x] = intensity
+                    z_buffer[y][x] = dist
+
+    return tested
+
+
+def triangles_to_draw(camera: Camera, shape: Shape):
+    """
+    Returns the teapot's front facing triangles in both rasterizers' formats
+    """
+    viewing_normal, x_vec, y_vec = camera.view_basis()
+    basis = (viewing_normal, x_vec, y_vec, camera.depth*viewing_normal.direction())
+    world_vertices = shape.world_vertices()
+    triangles, normals = shape.triangles, shape.normals
+
+    records = camera._triangle_records(world_vertices, triangles, normals, basis, camera.view_projection_matrix())
+
+    offset = world_vertices[triangles[:, 0]] - np.array(camera.position.as_tuple())
+    plane_distances = (offset * normals).sum(axis=1)
+    front = plane_distances < 0
+    legacy = (records[0].tolist(), plane_distances[front].tolist(), normals[front].tolist(), records[2].tolist())
+
+    return [array.tolist() for array in records], legacy, basis[1:]
+
+
+def main(width: int = 140, height: int = 70, repeats: int = 3):
+    env = Environment()
+    shape = env.create_preset_shape("teapot", Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 3)
+    camera = env.main_camera = Camera(width, height, env, 2 * width / 70, True, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING)
+
+    records, legacy, basis = triangles_to_draw(camera, shape)
+    palette = PALETTE
+
+    timings = {}
+    for name in ("legacy", "spans"):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            tested = 0
+            if name == "legacy":
+                rows = [[" " for _ in range(width)] for _ in range(height)]
+                z_buffer = [[float("inf") for _ in range(width)] for _ in range(height)]
+                for triangle, plane_distance, normal, shade in zip(*legacy):
+                    tested += legacy_render_triangle(camera, rows, z_buffer, palette[shade], triangle, plane_distance, normal, basis)
+            else:
+                camera.clear_screen()
+                for triangle, plane, shade in zip(*records):
+                    tested += camera._render_triangle(shade, triangle, plane)[0]
+                rows = camera.screen
+        timings[name] = (time.perf_counter() - start) / repeats
+        screen = "\n".join("".join(row) for row in rows)
+        print(f"{name:>7}: {len(records[0])} triangles, {tested} pixels in {timings[name] * 1e3:6.1f} ms, "
+              f"{tested / timings[name] / 1e6:5.2f} Mpixels/s")
+
+        if name == "legacy":
+            legacy_screen = screen
+
+    changed = sum(a != b for a, b in zip(legacy_screen, screen))
+    print(f"speedup {timings['legacy'] / timings['spans']:.1f}x, {changed} characters differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Compares rotating vectors with the quaternion sandwich product against the
+cached rotation matrix.
+
+Run from the Python folder with `python -m benchmarks.rotation`.
+"""
+import random
+import timeit
+
+from math_3d import *
+
+
+def sandwich(vectors: list[Vector3], rotation: Quaternion):
+    return [(rotation * v * rotation.inverse()).vec for v in vectors]
+
+
+def matrix(vectors: list[Vector3], rotation: Quaternion):
+    return [v.rotate_by_quaternion(rotation) for v in vectors]
+
+
+def main(count: int = 10_000, repeat: int = 5):
+    random.seed(0)
+    vectors = [Vector3(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1)) for _ in range(count)]
+    points = [v.as_tuple() for v in vectors]
+    rotation = Quaternion.from_euler(0.3, 0.7, 0.2)
+
+    timings = {
+        "sandwich product": min(timeit.repeat(lambda: sandwich(vectors, rotation), number=1, repeat=repeat)),
+        "rotate_by_quaternion": min(timeit.repeat(lambda: matrix(vectors, rotation), number=1, repeat=repeat)),
+        "rotate_many": min(timeit.repeat(lambda: rotation.rotate_many(points), number=1, repeat=repeat)),
+    }
+
+    baseline = timings["sandwich product"]
+    print(f"Rotating {count} vectors")
+    for name, seconds in timings.items():
+        print(f"{name:>22}: {seconds * 1e3:8.2f} ms  ({baseline / seconds:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Runs a light and a heavy scene for a few seconds with the old loop (update,
+render, then sleep) and with the fixed timestep scheduler, and reports how
+many updates per second the simulation got. With the scheduler both scenes
+should get one update per timestep, with the old loop the heavy scene's
+simulation slows down.
+
+Run from the Python folder with `python -m benchmarks.scheduler`.
+"""
+import math
+import time
+
+from asciithree import *
+
+TIMESTEP = 0.1
+
+
+def build_scene(teapots: int) -> Environment:
+    env = Environment()
+    env.create_cube(Vector3(0, 0, 0), Quaternion.IDENTITY, UNIT_SCALING * 3)
+    for i in range(teapots):
+        env.create_preset_shape("teapot", Vector3(3*i - 6, 0, -5), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 2)
+
+    env.main_camera = Camera(70, 50, env, 1, True, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING)
+    return env
+
+
+def old_loop(env: Environment, duration: float) -> int:
+    timestamp = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        env.update(timestamp)
+        env.render()
+        timestamp += 1
+        time.sleep(TIMESTEP)
+    return timestamp
+
+
+def main(duration: float = 3.0):
+    for name, teapots in (("light", 0), ("heavy", 5)):
+        env = build_scene(teapots)
+        start = time.perf_counter()
+        env.render()
+        render_time = time.perf_counter() - start
+
+        updates = old_loop(env, duration)
+        print(f"{name:>6} ({render_time * 1e3:5.0f} ms/render)   old loop: {updates / duration:5.1f} updates/s")
+
+        scheduler = Scheduler(env.update, env.render, timestep=TIMESTEP)
+        scheduler.run(duration)
+        print(f"{'':>24}  scheduler: {scheduler.timestamp / duration:5.1f} updates/s, "
+              f"{scheduler.frames_rendered / duration:5.1f} frames/s, {scheduler.frames_skipped} frames skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Load test of the frame broadcast server (server.FrameServer): serves a
+benchmark scene to hundreds of simulated clients over a Unix socket, in the
+same process, some of which are slow to acknowledge frames. Reports the
+render time per frame, which shouldn't grow with the number of clients, the
+encodings per frame, which shouldn't either, the frames dropped by slow
+clients, and checks that every client's last frame matches the server's.
+
+Run from the Python folder with `python -m benchmarks.server`.
+"""
+import asyncio
+import os
+import tempfile
+
+from benchmarks.suite import build_scene
+from server import FrameClient, FrameServer
+
+
+async def viewer(client: FrameClient, delay: float, received: list):
+    # Receives frames until the server disconnects, taking delay seconds per frame
+    try:
+        while True:
+            number, _ = await client.receive(ack=False)
+            if delay:
+                await asyncio.sleep(delay)
+            await client.ack(number)
+            received.append(number)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        await client.close()
+
+
+async def run_case(path: str, clients: int, frames: int, timestep: float, slow_fraction: float = 0.1, slow_delay: float = 0.25):
+    server = FrameServer(build_scene("teapot", 70, 50, True, backend="numpy"), timestep=timestep)
+    await server.start_unix(path)
+
+    connections = [await FrameClient.connect_unix(path) for _ in range(clients)]
+    slow = int(clients * slow_fraction)
+    received = [[] for _ in connections]
+    viewers = [
+        asyncio.create_task(viewer(client, slow_delay if i < slow else 0, received[i]))
+        for i, client in enumerate(connections)
+    ]
+
+    await server.run(frames)
+    # Let the clients catch up with the last frame before comparing
+    await asyncio.sleep(slow_delay * 2)
+    matching = sum(
+        client.frame is not None and (client.frame == server._frames[client.frame_number]).all()
+        for client in connections
+    )
+    stats = server.stats()
+    await server.close()
+    await asyncio.gather(*viewers)
+
+    fast_frames = [len(frames_received) for frames_received in received[slow:]]
+    slow_frames = [len(frames_received) for frames_received in received[:slow]]
+    print(f"{clients:4} clients: render {stats['render_ms']:6.2f} ms/frame, "
+          f"{stats['encodings'] / stats['frames_rendered']:4.2f} encodings/frame, "
+          f"{stats['bytes_sent'] / max(stats['frames_sent'], 1):6.0f} bytes/message, "
+          f"fast clients got {min(fast_frames, default=0)}-{max(fast_frames, default=0)}/{frames} frames, "
+          f"slow clients {min(slow_frames, default=0)}-{max(slow_frames, default=0)}, "
+          f"{stats['frames_dropped']} dropped, {matching}/{clients} up to date", flush=True)
+
+
+def main(client_counts=(0, 10, 100, 300), frames: int = 40, timestep: float = 0.1):
+    with tempfile.TemporaryDirectory() as folder:
+        for clients in client_counts:
+            path = os.path.join(folder, f"server{clients}.sock")
+            asyncio.run(run_case(path, clients, frames, timestep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Measures the bytes and system calls per frame of each frame sink for a
+mostly static scene, a few static shapes and one small oscillating cube,
+against the old loop that rewrote output.txt every frame.
+
+Run from the Python folder with `python -m benchmarks.sinks`.
+"""
+import io
+import math
+import os
+import tempfile
+import time
+
+from asciithree import *
+from sinks import AnsiTerminalSink, FileSink, MappedFileSink, StreamSink, encode_frame, read_mapped_frame
+
+
+class Wobble(Behavior):
+    def start(self, shape: Shape):
+        self.origin = shape.position
+
+    def update(self, timestamp: int, shape: Shape):
+        shape.position = self.origin + Vector3(math.sin(timestamp / 4), 0, 0)
+
+
+def build_scene() -> Environment:
+    env = Environment()
+    env.create_preset_shape("teapot", Vector3(-8, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 2)
+    env.create_preset_shape("sphere", Vector3(8, 0, 0), Quaternion.IDENTITY, UNIT_SCALING * 2)
+    env.create_tetrahedron(Vector3(0, 0, 8), Quaternion.IDENTITY, UNIT_SCALING * 3)
+    env.create_cube(Vector3(0, 0, -8), Quaternion.IDENTITY, UNIT_SCALING).add_behavior(Wobble())
+
+    env.main_camera = Camera(100, 50, env, 1.4, True, 100, Vector3(0, 25, 30), Quaternion.from_euler(math.pi / 6, math.pi, 0), UNIT_SCALING)
+    return env
+
+
+def legacy_write(output_file: str, output: list[list[str]]):
+    # The loop main_loop used to run for every frame
+    with open(output_file, 'w') as file:
+        output_str = ""
+        for row in output:
+            new_row = "".join([element for tup in zip(row, row) for element in tup])
+            output_str += new_row
+            output_str += "\n"
+
+        file.write(output_str)
+    return output_str
+
+
+def main(frames: int = 60):
+    env = build_scene()
+    screens = []
+    for timestamp in range(frames):
+        env.update(timestamp)
+        screens.append([row[:] for row in env.render()])
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "output.txt")
+
+    start = time.perf_counter()
+    legacy_bytes = sum(len(legacy_write(path, screen)) for screen in screens)
+    legacy_time = (time.perf_counter() - start) / frames
+    assert open(path, "rb").read() == encode_frame(screens[-1])
+
+    # Opening, writing and closing the file (the truncation is done by open)
+    print(f"{'legacy':>10}: {legacy_bytes / frames:8.0f} bytes/frame  {3:5.2f} syscalls/frame  {legacy_time * 1e3:6.2f} ms/frame")
+
+    sinks = {
+        "file": FileSink(path),
+        "mmap": MappedFileSink(os.path.join(directory, "frames.bin")),
+        "ansi": AnsiTerminalSink(io.BytesIO()),
+        "stream": StreamSink(io.BytesIO()),
+    }
+    for name, sink in sinks.items():
+        start = time.perf_counter()
+        for screen in screens:
+            sink.write(encode_frame(screen))
+        elapsed = (time.perf_counter() - start) / frames
+
+        if name == "mmap":
+            assert read_mapped_frame(sink.path) == encode_frame(screens[-1])
+        sink.close()
+
+        stats = sink.stats()
+        print(f"{name:>10}: {stats['bytes_per_frame']:8.0f} bytes/frame  {stats['syscalls_per_frame']:5.2f} syscalls/frame  "
+              f"{elapsed * 1e3:6.2f} ms/frame  ({stats['skipped']} unchanged frames skipped)")
+
+
+if __name__ == "__main__":
+    main()
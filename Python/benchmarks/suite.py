@@ -0,0 +1,218 @@
+"""
+Rendering benchmark suite over deterministic scenes.
+
+Every scene is rendered for a number of frames at several resolutions, with
+a perspective and an orthographic camera. Each frame is split into stages
+that are timed separately:
+
+update: Environment.update, running the behaviors
+normals: world space normals of the shapes
+transform: world space vertices of the shapes
+raster: Environment.render_bytes, i.e. culling, projection, rasterisation
+    and encoding the frame as text
+output: writing the frame to a sink
+
+The rendered frames are hashed, so runs on different commits can be checked
+for giving the same output as well as compared for speed.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from asciithree import *
+from sinks import StreamSink
+
+# Camera resolutions (width, height) benchmarked by default
+RESOLUTIONS = [(70, 50), (140, 70)]
+
+STAGES = ("update", "normals", "transform", "raster", "output")
+
+
+class Spin(Behavior):
+    """
+    Turns a shape at a constant rate, so frame n only depends on n
+    """
+    def __init__(self, speed: float):
+        self.speed = speed
+
+    def start(self, shape: Shape):
+        self.initial = shape.rotation
+
+    def update(self, timestamp: int, shape: Shape):
+        shape.rotation = Quaternion.from_axis_angle(Vector3.UP, self.speed * timestamp) * self.initial
+
+
+def _preset(name: str, scale: float):
+    def build(env: Environment):
+        env.create_preset_shape(name, Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * scale).add_behavior(Spin(0.1))
+    return build
+
+
+def _cube(env: Environment):
+    env.create_cube(Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 5).add_behavior(Spin(0.1))
+
+
+def _tetrahedron(env: Environment):
+    env.create_tetrahedron(Vector3(0, 0, 0), Quaternion.from_euler(0.3, 0.7, 0.2), UNIT_SCALING * 6).add_behavior(Spin(0.1))
+
+
+def _instances(env: Environment):
+    # A grid of cubes sharing one mesh, every other one spinning, to measure the cost per shape
+    for i in range(10):
+        for j in range(10):
+            shape = env.create_cube(Vector3(3*i - 13.5, 0, 3*j - 13.5), Quaternion.IDENTITY, UNIT_SCALING)
+            if (i + j) % 2 == 0:
+                shape.add_behavior(Spin(0.2))
+
+
+SCENES = {
+    "cube": _cube,
+    "tetrahedron": _tetrahedron,
+    "teapot": _preset("teapot", 3),
+    "sphere": _preset("sphere", 5),
+    "instances": _instances,
+}
+
+
+def build_scene(name: str, width: int, height: int, perspective: bool, **camera_options) -> Environment:
+    """
+    Creates one of the SCENES, with a camera whose zoom scales with its width
+    """
+    env = Environment()
+    SCENES[name](env)
+
+    env.main_camera = Camera(
+        width=width,
+        height=height,
+        environment=env,
+        zoom=(1 if perspective else 2) * width / 70,
+        perspective=perspective,
+        depth=100,
+        position=Vector3(0, 25, 30),
+        rotation=Quaternion.from_euler(math.pi / 6, math.pi, 0),
+        scaling=UNIT_SCALING,
+        **camera_options,
+    )
+    return env
+
+
+class _NullStream:
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def _render_frames(env: Environment, frames: int, timings: dict[str, float] = None) -> str:
+    checksum = hashlib.sha256()
+    sink = StreamSink(_NullStream())
+    clock = time.perf_counter
+
+    for timestamp in range(frames):
+        start = clock()
+        env.update(timestamp)
+        updated = clock()
+
+        shapes = [shape for shape in env.shapes if not shape.hidden]
+        for shape in shapes:
+            shape.normals
+        normals = clock()
+
+        for shape in shapes:
+            shape.world_vertices()
+        transformed = clock()
+
+        frame = env.render_bytes()
+        rendered = clock()
+
+        sink.write(frame)
+        checksum.update(frame)
+        written = clock()
+
+        if timings is not None:
+            timings["update"] += updated - start
+            timings["normals"] += normals - updated
+            timings["transform"] += transformed - normals
+            timings["raster"] += rendered - transformed
+            timings["output"] += written - rendered
+
+    return checksum.hexdigest()
+
+
+def run_case(scene: str, width: int, height: int, perspective: bool, frames: int, **camera_options) -> dict:
+    """
+    Benchmarks one scene, returning its frame rate, mean stage timings in
+    milliseconds, peak traced memory and the checksum of the frames
+    """
+    env = build_scene(scene, width, height, perspective, **camera_options)
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = time.perf_counter()
+    checksum = _render_frames(env, frames, timings)
+    elapsed = time.perf_counter() - start
+
+    # Measure memory on a fresh copy of the scene, since tracing slows everything down
+    tracemalloc.start()
+    env = build_scene(scene, width, height, perspective, **camera_options)
+    _render_frames(env, min(frames, 3))
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    env.main_camera.close()
+
+    return {
+        "scene": scene,
+        "width": width,
+        "height": height,
+        "perspective": perspective,
+        "frames": frames,
+        "fps": frames / elapsed,
+        "stages_ms": {stage: 1e3 * total / frames for stage, total in timings.items()},
+        "peak_memory_bytes": peak_memory,
+        "checksum": checksum,
+    }
+
+
+def case_name(result: dict) -> str:
+    projection = "persp" if result["perspective"] else "ortho"
+    return f"{result['scene']}-{projection}-{result['width']}x{result['height']}"
+
+
+def environment_info() -> dict:
+    """
+    Describes where the benchmark ran, including the git commit when available
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suite(scenes=None, resolutions=None, projections=(True, False), frames: int = 20, report=None, **camera_options) -> dict:
+    """
+    Runs every combination of scene, resolution and projection, calling
+    report(result) after each one
+    """
+    results = []
+    for scene in scenes or SCENES:
+        for width, height in resolutions or RESOLUTIONS:
+            for perspective in projections:
+                result = run_case(scene, width, height, perspective, frames, **camera_options)
+                results.append(result)
+                if report is not None:
+                    report(result)
+
+    return {"environment": environment_info(), "camera": camera_options, "results": results}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compares the update phase of a swarm of cubes running oscillating and a
+spinning behavior, one shape at a time and batched with a transform store
+(Environment.enable_transform_store and Behavior.update_many), for an
+increasing number of cubes. Checks that both give the same transforms.
+
+Run from the Python folder with `python -m benchmarks.transforms`.
+"""
+import math
+import time
+
+from asciithree import *
+from scripts.oscillating import oscillating
+from transforms import TransformBatch, multiply_quaternions
+
+
+class Spin(Behavior):
+    """
+    Turns a shape around the vertical axis at a constant rate
+    """
+    def __init__(self, speed: float):
+        self.speed = speed
+
+    def start(self, shape: Shape):
+        self.initial = shape.rotation
+
+    def update(self, timestamp: int, shape: Shape):
+        shape.rotation = Quaternion.from_axis_angle(Vector3.UP, self.speed * timestamp) * self.initial
+
+    @classmethod
+    def update_many(cls, timestamp: int, transforms: TransformBatch):
+        # Same as from_axis_angle, which always gives a positive vector part
+        real = np.cos(transforms.parameter("speed") * timestamp / 2)
+        turns = np.zeros((len(transforms), 4))
+        turns[:, 0] = real
+        turns[:, 1:] = np.sqrt(1 - real**2)[:, None] * np.array(Vector3.UP.direction().as_tuple())
+        transforms.rotations[:] = multiply_quaternions(turns, transforms.parameter("initial"))
+
+
+def build(cubes: int, batched: bool) -> Environment:
+    env = Environment()
+    side = math.ceil(math.sqrt(cubes))
+    for i in range(cubes):
+        shape = env.create_cube(Vector3(3*(i % side), 0, 3*(i // side)), Quaternion.from_euler(0.3, 0.1*i, 0), UNIT_SCALING)
+        shape.add_behavior(oscillating(0.5 + (i % 7) / 10))
+        if i % 2:
+            shape.add_behavior(Spin(0.05 + (i % 5) / 100))
+
+    if batched:
+        env.enable_transform_store()
+    return env
+
+
+def time_updates(env: Environment, frames: int) -> float:
+    start = time.perf_counter()
+    for timestamp in range(frames):
+        env.update(timestamp)
+    return (time.perf_counter() - start) / frames
+
+
+def transforms(env: Environment) -> np.ndarray:
+    return np.array([shape.position.as_tuple() + shape.rotation.as_tuple()[:1] + shape.rotation.vec.as_tuple() for shape in env.shapes])
+
+
+def main(counts=(1000, 5000, 10000), frames: int = 20):
+    for cubes in counts:
+        per_object = build(cubes, False)
+        batched = build(cubes, True)
+
+        slow = time_updates(per_object, frames)
+        fast = time_updates(batched, frames)
+        error = np.abs(transforms(per_object) - transforms(batched)).max()
+
+        print(f"{cubes:6} cubes: update {slow * 1e3:7.2f} ms per object, {fast * 1e3:6.2f} ms batched, "
+              f"{slow / fast:5.1f}x, largest difference {error:.1e}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,16 @@
-CUSTOM_SHAPES_DIR="custom_models"
\ No newline at end of file
+CUSTOM_SHAPES_DIR="custom_models"
+
+# Meshes with at least this many triangles are culled triangle by triangle
+# through a BVH when they are partially visible
+BVH_MIN_TRIANGLES=512
+
+# Meshes with at least this many triangles get simplified levels of detail,
+# used by cameras with lod=True for shapes that are small on screen
+LOD_MIN_TRIANGLES=256
+
+# Most error, in characters on screen, allowed when picking a level of detail
+LOD_MAX_ERROR=0.5
+
+# Triangles drawn between updates of the depth pyramid by cameras with occlusion=True.
+# Smaller batches reject more hidden triangles, but update the pyramid more often
+OCCLUSION_BATCH=512
@@ -0,0 +1,240 @@
+"""
+Visibility tests against a camera's view volume.
+
+The view volume is a list of planes, stored as an (P, 3) array of normals and
+a (P,) array of offsets; a point p is inside when normals @ p + offsets >= 0
+for every plane. Shapes are tested with their bounding spheres, and large
+meshes can be queried through a bounding volume hierarchy (BVH) so only the
+triangles near the view volume are drawn.
+
+Shapes and triangles hidden behind what has already been drawn are found
+with a DepthPyramid, a hierarchical depth buffer (Hi-Z).
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+OUTSIDE, PARTIAL, INSIDE = 0, 1, 2
+
+# Most triangles stored in a BVH leaf
+LEAF_SIZE = 16
+
+# The arrays a built BVH consists of
+BVH_ARRAYS = ("order", "box_min", "box_max", "start", "end", "left", "right")
+
+# Side of the finest cells of a DepthPyramid, in pixels. A power of two
+PYRAMID_TILE = 8
+
+# Relative margin between a triangle's nearest depth and the depths it must be
+# behind to be rejected, so rounding in the rasterizer can't make it visible
+PYRAMID_MARGIN = 1e-9
+
+
+def sphere_visibility(normals: np.ndarray, offsets: np.ndarray, center, radius: float) -> int:
+    """
+    Returns whether a sphere is OUTSIDE, INSIDE or PARTIAL(ly inside) the planes
+    """
+    distances = normals @ np.asarray(center, dtype=float) + offsets
+    reach = radius * np.sqrt((normals * normals).sum(axis=1))
+
+    if (distances < -reach).any():
+        return OUTSIDE
+    if (distances >= reach).all():
+        return INSIDE
+    return PARTIAL
+
+
+def transform_planes(normals: np.ndarray, offsets: np.ndarray, rotation_matrix, scaling, position):
+    """
+    Converts world space planes into the object space of a shape, so that
+    object space points x can be tested directly for the world point rotation @ (scaling * x) + position
+    """
+    object_normals = (normals @ np.asarray(rotation_matrix, dtype=float)) * np.asarray(scaling, dtype=float)
+    object_offsets = normals @ np.asarray(position, dtype=float) + offsets
+    return object_normals, object_offsets
+
+
+def _box_visibility(normals, offsets, box_min, box_max):
+    # Visibility of many boxes at once, (K, 3) corners against (P, 3) planes
+    center = (box_min + box_max) / 2
+    extent = (box_max - box_min) / 2
+
+    distances = center @ normals.T + offsets
+    reach = extent @ np.abs(normals).T
+
+    outside = (distances < -reach).any(axis=1)
+    inside = (distances >= reach).all(axis=1)
+    return outside, inside
+
+
+class BVH:
+    def __init__(self, vertices: np.ndarray, triangles: np.ndarray, leaf_size: int = LEAF_SIZE):
+        """
+        Builds a bounding volume hierarchy over the triangles of a mesh, in object space.
+
+        Every node covers a contiguous range of self.order, the permutation of
+        the triangle indices, so a whole subtree can be collected with one slice.
+        """
+        corners = vertices[triangles].astype(float)
+        triangle_min = corners.min(axis=1)
+        triangle_max = corners.max(axis=1)
+        centroids = corners.mean(axis=1)
+
+        self.order = np.arange(len(triangles))
+        box_min, box_max, start, end, left, right = [], [], [], [], [], []
+
+        def add_node(lo, hi):
+            indices = self.order[lo:hi]
+            box_min.append(triangle_min[indices].min(axis=0) if hi > lo else np.zeros(3))
+            box_max.append(triangle_max[indices].max(axis=0) if hi > lo else np.zeros(3))
+            start.append(lo)
+            end.append(hi)
+            left.append(-1)
+            right.append(-1)
+            return len(start) - 1
+
+        stack = [add_node(0, len(triangles))]
+        while stack:
+            node = stack.pop()
+            lo, hi = start[node], end[node]
+            if hi - lo <= leaf_size:
+                continue
+
+            # Median split along the longest axis of the centroids
+            indices = self.order[lo:hi]
+            spread = centroids[indices].max(axis=0) - centroids[indices].min(axis=0)
+            axis = int(np.argmax(spread))
+            self.order[lo:hi] = indices[np.argsort(centroids[indices, axis], kind="stable")]
+
+            middle = (lo + hi) // 2
+            left[node] = add_node(lo, middle)
+            right[node] = add_node(middle, hi)
+            stack += [left[node], right[node]]
+
+        self.box_min = np.array(box_min)
+        self.box_max = np.array(box_max)
+        self.start = np.array(start)
+        self.end = np.array(end)
+        self.left = np.array(left)
+        self.right = np.array(right)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> BVH:
+        """
+        Recreates a hierarchy from the arrays named in BVH_ARRAYS of one built before, e.g. read from a snapshot
+        """
+        bvh = cls.__new__(cls)
+        for name in BVH_ARRAYS:
+            setattr(bvh, name, arrays[name])
+        return bvh
+
+    def query(self, normals: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        Returns the sorted indices of the triangles in leaves that aren't
+        entirely outside the (object space) planes
+        """
+        found = []
+        frontier = np.array([0])
+
+        # Walk the tree one level at a time, testing every node of a level together
+        while len(frontier):
+            outside, inside = _box_visibility(normals, offsets, self.box_min[frontier], self.box_max[frontier])
+            leaf = self.left[frontier] < 0
+
+            take = frontier[~outside & (inside | leaf)]
+            found += [self.order[lo:hi] for lo, hi in zip(self.start[take], self.end[take])]
+
+            split = frontier[~outside & ~inside & ~leaf]
+            frontier = np.concatenate((self.left[split], self.right[split]))
+
+        if not found:
+            return np.zeros(0, dtype=int)
+
+        # Keep the original triangle order, which decides depth ties
+        return np.sort(np.concatenate(found))
+
+
+class DepthPyramid:
+    def __init__(self, width: int, height: int, tile: int = PYRAMID_TILE):
+        """
+        A hierarchical depth buffer for a width x height screen: the farthest
+        depth of every tile x tile block of pixels, then of every 2 x 2 block of
+        those, and so on up to a single cell covering the screen. A triangle
+        nearer than the farthest depth over its screen bounds may be visible,
+        anything else would fail every depth test.
+        """
+        self.width = width
+        self.height = height
+        self.shift = tile.bit_length() - 1
+
+        rows, columns = -(-height // tile), -(-width // tile)
+        # Pixels past the edges of the screen are never drawn, so they don't count
+        self._padded = np.full((rows * tile, columns * tile), -np.inf)
+
+        self.levels: list[np.ndarray] = [np.full((rows, columns), np.inf)]
+        while self.levels[-1].shape != (1, 1):
+            rows, columns = self.levels[-1].shape
+            self.levels.append(np.full((-(-rows // 2), -(-columns // 2)), np.inf))
+
+    def clear(self):
+        for level in self.levels:
+            level.fill(np.inf)
+
+    def update(self, depth_buffer: np.ndarray):
+        """
+        Rebuilds the pyramid from a (height, width) depth buffer
+        """
+        tile = 1 << self.shift
+        self._padded[:self.height, :self.width] = depth_buffer
+        rows, columns = self.levels[0].shape
+        self.levels[0][:] = self._padded.reshape(rows, tile, columns, tile).max(axis=(1, 3))
+
+        for finer, coarser in zip(self.levels, self.levels[1:]):
+            rows, columns = coarser.shape
+            padded = np.full((2 * rows, 2 * columns), -np.inf)
+            padded[:finer.shape[0], :finer.shape[1]] = finer
+            coarser[:] = padded.reshape(rows, 2, columns, 2).max(axis=(1, 3))
+
+    def rect_occluded(self, x_min: int, y_min: int, x_max: int, y_max: int, near: float) -> bool:
+        """
+        occluded for a single rectangle, e.g. the bounds of a whole shape
+        """
+        if x_min > x_max or y_min > y_max or not math.isfinite(near):
+            return False
+
+        shift = self.shift
+        for level in self.levels:
+            x_0, x_1, y_0, y_1 = x_min >> shift, x_max >> shift, y_min >> shift, y_max >> shift
+            if x_1 - x_0 <= 1 and y_1 - y_0 <= 1:
+                farthest = max(level.item(y_0, x_0), level.item(y_0, x_1), level.item(y_1, x_0), level.item(y_1, x_1))
+                return near * (1 - PYRAMID_MARGIN) > farthest
+            shift += 1
+        return False
+
+    def occluded(self, x_min: np.ndarray, y_min: np.ndarray, x_max: np.ndarray, y_max: np.ndarray, near: np.ndarray) -> np.ndarray:
+        """
+        Returns which of the rectangles of pixels (bounds included, on the screen)
+        are entirely behind the depths drawn there, given the nearest depth of
+        what would be drawn in each. Empty rectangles are never occluded.
+
+        Each rectangle is tested at the finest level where it spans at most 2 x 2
+        cells, so a test costs the same whatever its size
+        """
+        occluded = np.zeros(len(near), dtype=bool)
+        undecided = (x_min <= x_max) & (y_min <= y_max) & np.isfinite(near)
+        shift = self.shift
+
+        for level in self.levels:
+            x_0, x_1, y_0, y_1 = x_min >> shift, x_max >> shift, y_min >> shift, y_max >> shift
+            tested = np.flatnonzero(undecided & (x_1 - x_0 <= 1) & (y_1 - y_0 <= 1))
+
+            if len(tested):
+                x_0, x_1, y_0, y_1 = x_0[tested], x_1[tested], y_0[tested], y_1[tested]
+                farthest = np.maximum(np.maximum(level[y_0, x_0], level[y_0, x_1]), np.maximum(level[y_1, x_0], level[y_1, x_1]))
+                occluded[tested] = near[tested] * (1 - PYRAMID_MARGIN) > farthest
+                undecided[tested] = False
+            shift += 1
+
+        return occluded
@@ -0,0 +1,115 @@
+"""
+Levels of detail, simplified versions of a mesh for shapes that are small on screen.
+
+Levels are made by vertex clustering: the mesh's bounding box is cut into a
+grid of cubic cells, the vertices in each cell are merged into their mean,
+and triangles that collapse to a line or a point are dropped. No vertex
+moves further than a cell's diagonal, which is the level's error, so a
+camera can pick the coarsest level whose error is less than a fraction of a
+character on screen.
+
+Levels generated for an OBJ file are saved to a sidecar file next to it, like
+obj_loader's cache, so they are only built once per model.
+"""
+from __future__ import annotations
+
+import math
+import os
+
+import numpy as np
+
+from packed import load_or_build
+
+CACHE_SUFFIX = ".lodcache"
+
+# Bump when the simplification changes, to invalidate existing caches
+CACHE_VERSION = 1
+
+# Grid resolutions tried, in cells along the longest side of the bounding box
+RESOLUTIONS = (64, 32, 16, 8, 4)
+
+# Levels that don't remove at least this fraction of the previous level's triangles are skipped
+MIN_REDUCTION = 0.25
+
+
+def cluster_vertices(vertices: np.ndarray, triangles: np.ndarray, cell_size: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simplifies a mesh by merging the vertices in each cell of a grid with the
+    given cell size. Returns the new (N, 3) vertices and (M, 3) triangles
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.reshape(-1)
+
+    # Mean of the vertices in every cell
+    merged = np.stack([np.bincount(cluster, weights=vertices[:, i], minlength=len(counts)) for i in range(3)], axis=1)
+    merged /= counts[:, None]
+
+    faces = cluster[triangles]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+
+    # Triangles merged onto the same vertices with the same winding are drawn once.
+    # Rotating each triangle to start at its smallest index keeps its winding
+    first = faces.argmin(axis=1)
+    rows = np.arange(len(faces))[:, None]
+    rotated = faces[rows, (first[:, None] + np.arange(3)) % 3]
+    _, unique = np.unique(rotated, axis=0, return_index=True)
+    faces = faces[np.sort(unique)]
+
+    # Drop the vertices no triangle uses any more
+    used, remapped = np.unique(faces, return_inverse=True)
+    return merged[used], remapped.reshape(-1, 3).astype(np.int32)
+
+
+def build_levels(vertices: np.ndarray, triangles: np.ndarray, min_triangles: int = 16) -> list[tuple[np.ndarray, np.ndarray, float]]:
+    """
+    Returns the levels of detail of a mesh, from finest to coarsest, as
+    (vertices, triangles, error) tuples, error being the furthest any vertex
+    may have moved in object space. The mesh itself isn't included.
+
+    Arguments:
+    min_triangles: levels stop before reaching fewer triangles than this
+    """
+    if len(triangles) == 0:
+        return []
+
+    extent = float((vertices.max(axis=0) - vertices.min(axis=0)).max())
+    if extent == 0:
+        return []
+
+    levels = []
+    previous = len(triangles)
+    for resolution in RESOLUTIONS:
+        cell_size = extent / resolution
+        level_vertices, level_triangles = cluster_vertices(vertices, triangles, cell_size)
+
+        if len(level_triangles) < min_triangles:
+            break
+        if len(level_triangles) > previous * (1 - MIN_REDUCTION):
+            continue
+
+        levels.append((level_vertices, level_triangles, cell_size * math.sqrt(3)))
+        previous = len(level_triangles)
+
+    return levels
+
+
+def load_levels(filename: str, vertices: np.ndarray, triangles: np.ndarray, min_triangles: int = 16) -> list[tuple[np.ndarray, np.ndarray, float]]:
+    """
+    build_levels for the mesh of an OBJ file, read from (or written to) the
+    sidecar cache file, which is keyed by the model's modification time and size
+    """
+    stat = os.stat(filename)
+    key = {"version": CACHE_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "min_triangles": min_triangles}
+
+    def build():
+        levels = build_levels(vertices, triangles, min_triangles)
+        arrays = {}
+        for i, (level_vertices, level_triangles, _) in enumerate(levels):
+            arrays[f"vertices_{i}"] = level_vertices
+            arrays[f"triangles_{i}"] = level_triangles
+        return arrays, {"errors": [error for _, _, error in levels]}
+
+    metadata, arrays = load_or_build(filename + CACHE_SUFFIX, key, build)
+    return [(arrays[f"vertices_{i}"], arrays[f"triangles_{i}"], error) for i, error in enumerate(metadata["errors"])]
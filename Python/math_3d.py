@@ -1,18 +1,25 @@
 from __future__ import annotations
 import math
 
+import numpy as np
+
 class Quaternion:
     IDENTITY: Quaternion = None
+    __slots__ = ("real", "vec", "_matrix", "_matrix_key", "_matrix_array")
+
     def __init__(self, real: float, vec: Vector3):
         self.real = real
         self.vec = vec
+        self._matrix = None
+        self._matrix_key = None
+        self._matrix_array = None
     
     def __add__(self, other):
-        if type(other) == Quaternion:
+        if isinstance(other, Quaternion):
             return Quaternion(self.real+other.real, self.vec+other.vec)
-        elif type(other) == Vector3:
+        elif isinstance(other, Vector3):
             return Quaternion(self.real, self.vec+other)
-        elif type(other) in [int, float]:
+        elif isinstance(other, (int, float)):
             return Quaternion(self.real+other, self.vec)
         else:
             raise Exception("Huh?")
@@ -30,31 +37,97 @@ class Quaternion:
         return -self + other
     
     def __mul__(self, other):
-        if type(other) == Quaternion:
+        if isinstance(other, Quaternion):
             return Quaternion(
                 self.real*other.real - self.vec.dot_product(other.vec), 
                 self.real*other.vec + other.real*self.vec + self.vec.cross_product(other.vec)
             )
-        elif type(other) == Vector3:
+        elif isinstance(other, Vector3):
             return Quaternion(
                 -self.vec.dot_product(other),
                 self.real*other + self.vec.cross_product(other)
             )
-        elif type(other) in [int, float]:
+        elif isinstance(other, (int, float)):
             return Quaternion(self.real*other, self.vec*other)
+        return NotImplemented
         
     def __rmul__(self, other):
-        if type(other) == Quaternion:
+        if isinstance(other, Quaternion):
             return other * self
         else:
             return self * other
         
     def __truediv__(self, other) -> Quaternion:
-        if type(other) == Quaternion:
+        if isinstance(other, Quaternion):
             return self * other.inverse()
         else:
             return self * (1 / other)
+
+    # In-place variants. These modify the quaternion (and its vec) instead of
+    # allocating a new one, so only use them on quaternions nothing else shares,
+    # e.g. not on Quaternion.IDENTITY
+
+    def imul(self, other: Quaternion) -> Quaternion:
+        """
+        Sets self to self * other and returns self
+        """
+        w, (x, y, z) = self.real, self.vec.as_tuple()
+        o_w, (o_x, o_y, o_z) = other.real, other.vec.as_tuple()
+
+        self.real = w*o_w - (x*o_x + y*o_y + z*o_z)
+        self.vec.x = w*o_x + o_w*x + (y*o_z - z*o_y)
+        self.vec.y = w*o_y + o_w*y + (z*o_x - x*o_z)
+        self.vec.z = w*o_z + o_w*z + (x*o_y - y*o_x)
+        return self
+
+    def normalize_(self) -> Quaternion:
+        """
+        Scales self to unit length and returns self
+        """
+        norm = math.sqrt(self.real**2 + self.vec.square_magnitude())
+        self.real /= norm
+        self.vec.imul(1 / norm)
+        return self
     
+    def as_tuple(self):
+        return (self.real,) + self.vec.as_tuple()
+
+    def rotation_matrix(self) -> tuple[tuple[float, float, float], ...]:
+        """
+        Returns the rows of the 3x3 matrix of the rotation this quaternion represents,
+        i.e. the matrix of v -> (q * v * q.inverse()).vec
+
+        The matrix is cached until the quaternion's components change.
+        """
+        w, (x, y, z) = key = self.real, self.vec.as_tuple()
+
+        if key != self._matrix_key:
+            norm = w*w + x*x + y*y + z*z
+
+            # Unit quaternions don't need the inverse's division
+            s = 2 if norm == 1 else 2 / norm
+
+            self._matrix = (
+                (1 - s*(y*y + z*z), s*(x*y - w*z), s*(x*z + w*y)),
+                (s*(x*y + w*z), 1 - s*(x*x + z*z), s*(y*z - w*x)),
+                (s*(x*z - w*y), s*(y*z + w*x), 1 - s*(x*x + y*y)),
+            )
+            self._matrix_key = key
+            self._matrix_array = None
+
+        return self._matrix
+
+    def rotate_many(self, points, out: np.ndarray = None) -> np.ndarray:
+        """
+        Rotates an (N, 3) array of points by this quaternion.
+        If out is given the result is written into it, which may be points itself
+        """
+        matrix = self.rotation_matrix()
+        if self._matrix_array is None:
+            self._matrix_array = np.array(matrix).T
+
+        return np.matmul(np.asarray(points, dtype=float), self._matrix_array, out=out)
+
     def inverse(self):
         return Quaternion(self.real, -self.vec) / (self.real**2 + self.vec.square_magnitude())
     
@@ -89,6 +162,8 @@ class Vector3:
     LEFT: Vector3 = None
     UP: Vector3 = None
     FORWARD: Vector3 = None
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: float, y: float, z: float):
         self.x = x
         self.y = y
@@ -117,12 +192,13 @@ class Vector3:
         return self / mag
     
     def rotate_about_axis(self, axis: Vector3, angle: float) -> Vector3:
-        q = Quaternion.from_axis_angle(axis, angle)
-        
-        return (q * self * q.inverse()).vec
+        return self.rotate_by_quaternion(Quaternion.from_axis_angle(axis, angle))
     
     def rotate_by_quaternion(self, quaternion: Quaternion) -> Vector3:
-        return (quaternion * self * quaternion.inverse()).vec
+        (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = quaternion.rotation_matrix()
+        x, y, z = self.x, self.y, self.z
+
+        return Vector3(r00*x + r01*y + r02*z, r10*x + r11*y + r12*z, r20*x + r21*y + r22*z)
     
     def as_tuple(self):
         return self.x, self.y, self.z
@@ -131,7 +207,7 @@ class Vector3:
         return int(self.x), int(self.y), int(self.z)
     
     def __sub__(self, other: Vector3):
-        return self + -other
+        return Vector3(self.x-other.x, self.y-other.y, self.z-other.z)
 
     def __add__(self, other: Vector3):
         return Vector3(self.x+other.x, self.y+other.y, self.z+other.z)
@@ -146,7 +222,163 @@ class Vector3:
         return self * number
     
     def __neg__(self):
-        return self * (-1)
+        return Vector3(-self.x, -self.y, -self.z)
+
+    # In-place variants. These modify the vector instead of allocating a new one,
+    # so only use them on vectors nothing else shares, e.g. not on Vector3.UP
+
+    def iadd(self, other: Vector3) -> Vector3:
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def isub(self, other: Vector3) -> Vector3:
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def imul(self, number: float) -> Vector3:
+        self.x *= number
+        self.y *= number
+        self.z *= number
+        return self
+
+    def ihadamard_product(self, other: Vector3) -> Vector3:
+        self.x *= other.x
+        self.y *= other.y
+        self.z *= other.z
+        return self
+
+    def normalize_(self) -> Vector3:
+        mag = self.magnitude()
+
+        if mag != 0:
+            self.imul(1 / mag)
+        return self
+
+    def rotate_by_quaternion_(self, quaternion: Quaternion) -> Vector3:
+        (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = quaternion.rotation_matrix()
+        x, y, z = self.x, self.y, self.z
+
+        self.x = r00*x + r01*y + r02*z
+        self.y = r10*x + r11*y + r12*z
+        self.z = r20*x + r21*y + r22*z
+        return self
+
+
+class Vector3Array:
+    """
+    A packed batch of vectors, stored as one contiguous (N, 3) float array.
+
+    Supports the same operations as Vector3, applied to every vector at once.
+    The other operand can be a Vector3 (broadcast to every row), another
+    Vector3Array of the same length, or a number where Vector3 takes one.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data: np.ndarray = np.ascontiguousarray(data, dtype=float).reshape(-1, 3)
+
+    @classmethod
+    def from_vectors(cls, vectors: list[Vector3]):
+        return cls([vector.as_tuple() for vector in vectors])
+
+    @classmethod
+    def zeros(cls, count: int):
+        return cls(np.zeros((count, 3)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        """
+        Returns the Vector3 at an integer index, or a Vector3Array for slices and index arrays
+        """
+        if isinstance(index, (int, np.integer)):
+            return Vector3(*self.data[index].tolist())
+        return Vector3Array(self.data[index])
+
+    def __iter__(self):
+        return (Vector3(*row) for row in self.data.tolist())
+
+    def cross_product(self, other) -> Vector3Array:
+        return Vector3Array(np.cross(self.data, _operand(other)))
+
+    def dot_product(self, other) -> np.ndarray:
+        return (self.data * _operand(other)).sum(axis=1)
+
+    def hadamard_product(self, other) -> Vector3Array:
+        return Vector3Array(self.data * _operand(other))
+
+    def square_magnitude(self) -> np.ndarray:
+        return self.dot_product(self)
+
+    def magnitude(self) -> np.ndarray:
+        return np.sqrt(self.square_magnitude())
+
+    def direction(self) -> Vector3Array:
+        return Vector3Array(self.data.copy()).normalize_()
+
+    def rotate_by_quaternion(self, quaternion: Quaternion) -> Vector3Array:
+        return Vector3Array(quaternion.rotate_many(self.data))
+
+    def __add__(self, other) -> Vector3Array:
+        return Vector3Array(self.data + _operand(other))
+
+    def __sub__(self, other) -> Vector3Array:
+        return Vector3Array(self.data - _operand(other))
+
+    def __mul__(self, number: float) -> Vector3Array:
+        return Vector3Array(self.data * number)
+
+    def __rmul__(self, number: float) -> Vector3Array:
+        return self * number
+
+    def __truediv__(self, number: float) -> Vector3Array:
+        return Vector3Array(self.data / number)
+
+    def __neg__(self) -> Vector3Array:
+        return Vector3Array(-self.data)
+
+    # In-place variants, which write into data without allocating new arrays
+
+    def iadd(self, other) -> Vector3Array:
+        self.data += _operand(other)
+        return self
+
+    def isub(self, other) -> Vector3Array:
+        self.data -= _operand(other)
+        return self
+
+    def imul(self, number: float) -> Vector3Array:
+        self.data *= number
+        return self
+
+    def ihadamard_product(self, other) -> Vector3Array:
+        self.data *= _operand(other)
+        return self
+
+    def normalize_(self) -> Vector3Array:
+        mag = self.magnitude()[:, None]
+        np.divide(self.data, mag, out=self.data, where=mag != 0)
+        return self
+
+    def rotate_by_quaternion_(self, quaternion: Quaternion) -> Vector3Array:
+        quaternion.rotate_many(self.data, out=self.data)
+        return self
+
+
+def _operand(other):
+    """
+    Converts the other operand of a Vector3Array operation into something NumPy broadcasts
+    """
+    if isinstance(other, Vector3):
+        return other.as_tuple()
+    elif isinstance(other, Vector3Array):
+        return other.data
+    return other
 
 Vector3.LEFT = Vector3(1, 0, 0)
 Vector3.UP = Vector3(0, 1, 0)
@@ -0,0 +1,166 @@
+"""
+Mesh resources shared between shapes.
+
+A Mesh is the immutable geometry of a model. Any number of Shapes can draw
+the same Mesh, each with its own transform and behaviors, so a crowd of
+identical models only stores (and loads) the geometry once.
+"""
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+import lod
+from config import LOD_MIN_TRIANGLES
+from culling import BVH
+from math_3d import Vector3Array
+from obj_loader import load_obj
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    # Freeze a view rather than the array itself, which may belong to the caller
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class Mesh:
+    def __init__(self, vertices, triangles, name: str = None, normals: np.ndarray = None):
+        """
+        Creates a new mesh.
+
+        Arguments:
+        vertices: an (N, 3) array-like of the coordinates of the vertices in R^3
+        triangles: an (M, 3) array-like of triangulated faces. The normals are given by the right hand rule
+        name: optional name of the mesh, e.g. the file it was loaded from
+        normals: the (M, 3) object space unit normals of the triangles, if already known (e.g. from a snapshot).
+            By default they are computed from the vertices
+        """
+        vertices = np.asarray(vertices).reshape(-1, 3)
+        if vertices.dtype.kind != "f":
+            vertices = vertices.astype(float)
+
+        triangles = np.asarray(triangles).reshape(-1, 3)
+        if triangles.dtype.kind not in "iu":
+            triangles = triangles.astype(np.int32)
+
+        self.vertices = _read_only(vertices)
+        self.triangles = _read_only(triangles)
+        self.name = name
+
+        # Object space face normals
+        if normals is None:
+            vertex_array = Vector3Array(vertices)
+            a_vec, b_vec, c_vec = (vertex_array[triangles[:, i]] for i in range(3))
+            normals = (b_vec - a_vec).cross_product(c_vec - a_vec).direction().data
+        self.normals = _read_only(np.asarray(normals).reshape(-1, 3))
+
+        # Bounding volumes in object space
+        if len(vertices):
+            self.aabb_min = vertices.min(axis=0).astype(float)
+            self.aabb_max = vertices.max(axis=0).astype(float)
+        else:
+            self.aabb_min = self.aabb_max = np.zeros(3)
+        self.bounding_center = (self.aabb_min + self.aabb_max) / 2
+        self.bounding_radius = float(np.sqrt(((vertices - self.bounding_center)**2).sum(axis=1)).max()) if len(vertices) else 0.0
+
+        self._bvh: BVH = None
+
+        # The OBJ file the mesh was loaded from, if any
+        self.source_file: str = None
+
+        # How far the vertices of this level of detail may be from the original mesh's, in object space
+        self.lod_error = 0.0
+        self._levels: list[Mesh] = None
+
+    @classmethod
+    def from_obj(cls, filename: str):
+        vertices, triangles = load_obj(filename)
+        mesh = cls(vertices, triangles, name=filename)
+        mesh.source_file = filename
+        return mesh
+
+    @property
+    def bvh(self) -> BVH:
+        """
+        The mesh's bounding volume hierarchy, built the first time it is needed
+        """
+        if self._bvh is None:
+            self._bvh = BVH(self.vertices, self.triangles)
+        return self._bvh
+
+    @property
+    def levels(self) -> list[Mesh]:
+        """
+        The mesh followed by its simplified levels of detail, coarser and coarser
+        (see lod.py). They are generated the first time they are needed, and
+        cached next to the OBJ file for meshes loaded from one. Meshes with fewer
+        than LOD_MIN_TRIANGLES triangles have no other levels
+        """
+        if self._levels is None:
+            self._levels = [self]
+            if len(self.triangles) >= LOD_MIN_TRIANGLES:
+                if self.source_file is not None:
+                    levels = lod.load_levels(self.source_file, self.vertices, self.triangles)
+                else:
+                    levels = lod.build_levels(self.vertices, self.triangles)
+
+                for i, (vertices, triangles, error) in enumerate(levels):
+                    level = Mesh(vertices, triangles, name=f"{self.name} (level {i + 1})")
+                    level.lod_error = error
+                    self._levels.append(level)
+        return self._levels
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the mesh's arrays
+        """
+        return self.vertices.nbytes + self.triangles.nbytes + self.normals.nbytes
+
+    def __repr__(self):
+        return f"Mesh({self.name!r}, {len(self.vertices)} vertices, {len(self.triangles)} triangles)"
+
+
+class MeshCache:
+    def __init__(self, capacity: int = 64):
+        """
+        A least recently used cache of meshes loaded from files, keyed by absolute path.
+
+        Arguments:
+        capacity: how many meshes to keep. Evicted meshes stay alive as long as shapes use them
+        """
+        self.capacity = capacity
+        self._meshes: OrderedDict[str, tuple[int, Mesh]] = OrderedDict()
+
+    def load(self, filename: str) -> Mesh:
+        """
+        Returns the mesh of an OBJ file, only loading it if it isn't cached or the file changed
+        """
+        path = os.path.abspath(filename)
+        mtime = os.stat(path).st_mtime_ns
+
+        cached = self._meshes.get(path)
+        if cached is not None and cached[0] == mtime:
+            self._meshes.move_to_end(path)
+            return cached[1]
+
+        mesh = Mesh.from_obj(filename)
+        self._meshes[path] = (mtime, mesh)
+        self._meshes.move_to_end(path)
+
+        while len(self._meshes) > self.capacity:
+            self._meshes.popitem(last=False)
+
+        return mesh
+
+    def clear(self):
+        self._meshes.clear()
+
+    def __contains__(self, filename: str):
+        return os.path.abspath(filename) in self._meshes
+
+    def __len__(self):
+        return len(self._meshes)
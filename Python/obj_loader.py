@@ -0,0 +1,79 @@
+"""
+Streaming Wavefront OBJ loader with a binary cache.
+
+Only vertex positions and faces are read. Faces with any number of vertices
+are fan triangulated. The parsed arrays are saved to a sidecar cache file
+next to the model, which later loads memory map instead of parsing the text
+again. The cache is keyed by the model's modification time and size, so
+editing the model invalidates it.
+"""
+from __future__ import annotations
+
+import os
+from array import array
+
+import numpy as np
+
+from packed import load_or_build
+
+CACHE_SUFFIX = ".meshcache"
+
+# Bump when the parser's output changes, to invalidate existing caches
+CACHE_VERSION = 1
+
+
+def load_obj(filename: str, use_cache: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Loads an OBJ file, returning a float32 (N, 3) array of vertices and an
+    int32 (M, 3) array of triangles indexing into it.
+
+    With use_cache, the result is read from (or written to) the sidecar cache file.
+    """
+    if not use_cache:
+        return parse_obj(filename)
+
+    stat = os.stat(filename)
+    key = {"version": CACHE_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def build():
+        vertices, triangles = parse_obj(filename)
+        return {"vertices": vertices, "triangles": triangles}, {}
+
+    _, arrays = load_or_build(filename + CACHE_SUFFIX, key, build)
+    return arrays["vertices"], arrays["triangles"]
+
+
+def parse_obj(filename: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parses an OBJ file line by line, without the cache
+    """
+    vertices = array("f")
+    triangles = array("i")
+    vertex_count = 0
+
+    with open(filename, "r") as file:
+        for line in file:
+            tokens = line.split()
+
+            if not tokens:
+                continue
+
+            if tokens[0] == "v":
+                vertices.extend((float(tokens[1]), float(tokens[2]), float(tokens[3])))
+                vertex_count += 1
+            elif tokens[0] == "f":
+                if len(tokens) < 4:
+                    raise ValueError("Faces must have at least 3 vertices")
+
+                # Indices are 1-based, or relative to the end when negative
+                verts = [int(token.split("/", 1)[0]) for token in tokens[1:]]
+                verts = [vert - 1 if vert > 0 else vertex_count + vert for vert in verts]
+
+                first = verts[0]
+                for second, third in zip(verts[1:], verts[2:]):
+                    triangles.extend((first, second, third))
+
+    return (
+        np.frombuffer(vertices, dtype=np.float32).reshape(-1, 3),
+        np.frombuffer(triangles, dtype=np.int32).reshape(-1, 3),
+    )
@@ -0,0 +1,96 @@
+"""
+Offline rendering of frame sequences to animation files (see animation.py).
+
+render_animation renders frames 0..N-1 of a scene as fast as possible
+instead of in real time. The frames are split into runs of consecutive
+frames, one per worker process. Each worker builds its own copy of the
+scene and advances it by calling Environment.update for every timestamp up
+to the end of its run, drawing only the frames of its run, then encodes them.
+The scene's behaviors must therefore only depend on the timestamps they are
+given, as in main_loop, where frame t is drawn after update(t).
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from animation import AnimationWriter, encode_frames
+from asciithree import PALETTE, Environment
+
+
+def _render_run(build_scene: Callable[[], Environment], start: int, stop: int, keyframe_interval: int):
+    """
+    Renders frames [start, stop) of a fresh copy of the scene, returning the
+    frame size and the encoded frames
+    """
+    env = build_scene()
+    for timestamp in range(start):
+        env.update(timestamp)
+
+    frames = []
+    for timestamp in range(start, stop):
+        env.update(timestamp)
+        frames.append(env.draw().copy())
+
+    for camera in env.cameras:
+        camera.close()
+
+    height, width = frames[0].shape
+    return width, height, encode_frames(frames, keyframe_interval, start)
+
+
+def _runs(frames: int, workers: int, keyframe_interval: int) -> list[tuple[int, int]]:
+    # Split the frames into one run per worker, starting on keyframes so that
+    # each run can be encoded on its own
+    groups = -(-frames // keyframe_interval)
+    per_worker = -(-groups // workers)
+    size = per_worker * keyframe_interval
+    return [(start, min(start + size, frames)) for start in range(0, frames, size)]
+
+
+def render_animation(build_scene: Callable[[], Environment], frames: int, path: str, workers: int = None,
+                     keyframe_interval: int = 30, timestep: float = 0.1) -> dict:
+    """
+    Renders frames 0..frames-1 of a scene to an animation file. Returns the
+    number of frames, the file size and the time taken.
+
+    Arguments:
+    build_scene: creates the scene's Environment, with its camera. It is called
+        in every worker, so it must be picklable, e.g. a module level function
+    workers: number of worker processes, by default one per CPU. With 1 the
+        frames are rendered in this process
+    keyframe_interval: frames between keyframes, see AnimationWriter
+    timestep: seconds per frame when played back
+    """
+    if frames <= 0:
+        raise ValueError("An animation needs at least one frame")
+
+    workers = workers or os.cpu_count() or 1
+    runs = _runs(frames, workers, keyframe_interval)
+    start = time.perf_counter()
+
+    if workers == 1:
+        results = (_render_run(build_scene, run_start, run_stop, keyframe_interval) for run_start, run_stop in runs)
+        _write(path, results, keyframe_interval, timestep)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(runs))) as executor:
+            futures = [executor.submit(_render_run, build_scene, run_start, run_stop, keyframe_interval) for run_start, run_stop in runs]
+            _write(path, (future.result() for future in futures), keyframe_interval, timestep)
+
+    return {"frames": frames, "bytes": os.path.getsize(path), "seconds": time.perf_counter() - start}
+
+
+def _write(path: str, results, keyframe_interval: int, timestep: float):
+    # Writes the workers' runs in order, as they finish
+    writer = None
+    try:
+        for width, height, encoded in results:
+            if writer is None:
+                writer = AnimationWriter(path, width, height, PALETTE, keyframe_interval, timestep)
+            for data, keyframe in encoded:
+                writer.write_encoded(data, keyframe)
+    finally:
+        if writer is not None:
+            writer.close()
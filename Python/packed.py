@@ -0,0 +1,130 @@
+"""
+A small binary container for named NumPy arrays that can be memory mapped.
+
+Layout:
+    MAGIC (8 bytes) | header length (8 byte little endian) | JSON header | arrays
+
+The JSON header holds user metadata and the dtype, shape and offset of every
+array. Arrays start on 64 byte boundaries so they can be viewed straight out
+of a memory map without copying.
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+from typing import Callable
+
+import numpy as np
+
+MAGIC = b"A3DPACK1"
+ALIGNMENT = 64
+
+_PREFIX = struct.Struct("<8sQ")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_packed(path: str, arrays: dict[str, np.ndarray], metadata: dict = None):
+    """
+    Writes arrays and JSON-serialisable metadata to path.
+
+    The file is written next to path, flushed to disk and renamed over it, so
+    readers never see a partial file, even after a crash or a power loss.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = json.dumps({"metadata": metadata or {}, "arrays": layout}).encode()
+    data_start = _align(_PREFIX.size + len(header))
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(_PREFIX.pack(MAGIC, len(header)))
+            file.write(header)
+            for name, array in arrays.items():
+                file.seek(data_start + layout[name]["offset"])
+                file.write(array.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_packed(path: str, mmap: bool = True) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Reads a file written by write_packed, returning (metadata, arrays).
+
+    With mmap the arrays are read-only views of a memory map of the file,
+    otherwise they are read into memory. Raises ValueError for files that
+    are truncated or not packed array files.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        prefix = file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a packed array file")
+        magic, header_length = _PREFIX.unpack(prefix)
+        if magic != MAGIC or _PREFIX.size + header_length > size:
+            raise ValueError(f"{path} is not a packed array file")
+        header = json.loads(file.read(header_length))
+        data_start = _align(_PREFIX.size + header_length)
+
+        if not mmap:
+            file.seek(data_start)
+            buffer = np.frombuffer(file.read(), dtype=np.uint8)
+
+    if mmap:
+        if size > data_start:
+            buffer = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start)
+        else:
+            buffer = np.zeros(0, dtype=np.uint8)
+
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        start = info["offset"]
+        if data_start + start + count * dtype.itemsize > size:
+            raise ValueError(f"{path} is truncated")
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(info["shape"])
+
+    return header["metadata"], arrays
+
+
+def load_or_build(path: str, key: dict, build: Callable[[], tuple[dict[str, np.ndarray], dict]]) -> tuple[dict, dict[str, np.ndarray]]:
+    """
+    Reads a cache file written for key, e.g. a model's modification time and
+    size, returning (metadata, arrays). When the file is missing, stale,
+    truncated or corrupt, calls build() for the arrays and metadata instead
+    and writes them to the file for next time.
+
+    The cache is only an optimisation: failing to read or write it (e.g. in a
+    read-only folder) never stops the arrays from being built.
+    """
+    try:
+        metadata, arrays = read_packed(path)
+        if metadata.get("source") == key:
+            return metadata, arrays
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    arrays, metadata = build()
+    metadata = dict(metadata, source=key)
+    try:
+        write_packed(path, arrays, metadata)
+    except OSError:
+        pass
+    return metadata, arrays
@@ -0,0 +1,198 @@
+"""
+Multiprocess rasterisation for Camera's "parallel" backend.
+
+Every frame the camera's projected triangles are copied into a shared memory
+block, and the screen is split into bands of rows that worker processes
+rasterize with the numpy backend. Workers write their bands straight into a
+shared color/depth buffer. The bands don't overlap, so there is nothing to
+merge, and the geometry is never pickled. Each pixel goes through the same
+arithmetic as in a serial render, so the output is byte-identical.
+"""
+from __future__ import annotations
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import raster
+
+# Bands handed out per worker, so a worker with an expensive band doesn't hold up the frame
+BANDS_PER_WORKER = 2
+
+
+def _geometry_layout(capacity: int):
+    return [
+        ("vertices", (capacity, 3, 2), np.int64),
+        ("planes", (capacity, 3), np.float64),
+        ("shades", (capacity,), np.uint8),
+    ]
+
+
+def _output_layout(width: int, height: int):
+    return [
+        ("z_buffer", (height, width), np.float64),
+        ("color", (height, width), np.uint8),
+    ]
+
+
+def _views(buffer, layout) -> dict[str, np.ndarray]:
+    views = {}
+    offset = 0
+    for name, shape, dtype in layout:
+        count = int(np.prod(shape))
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += count * np.dtype(dtype).itemsize
+        offset = -(-offset // 8) * 8
+    return views
+
+
+def _size(layout) -> int:
+    offset = 0
+    for _, shape, dtype in layout:
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset = -(-offset // 8) * 8
+    return max(offset, 1)
+
+
+def _release(block: shared_memory.SharedMemory, owner: int):
+    # Forked workers inherit the finalizers of their parent's rasterizers, only the owner may free the blocks
+    if os.getpid() != owner:
+        return
+
+    block.close()
+    block.unlink()
+
+
+############################
+# Worker side
+
+# Shared memory blocks attached by this worker, by name
+_attached: dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    block = _attached.get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+
+        # Blocks are replaced when they grow, so drop the ones no longer in use
+        if len(_attached) >= 4:
+            for old in list(_attached):
+                _attached.pop(old).close()
+        _attached[name] = block
+    return block
+
+
+def _rasterize_band(geometry: str, capacity: int, count: int, output: str, width: int, height: int,
+                    rows: tuple[int, int], counters: dict[str, int]):
+    triangles = _views(_attach(geometry).buf, _geometry_layout(capacity))
+    buffers = _views(_attach(output).buf, _output_layout(width, height))
+
+    raster.rasterize(
+        buffers["color"],
+        buffers["z_buffer"],
+        triangles["vertices"][:count],
+        triangles["planes"][:count],
+        triangles["shades"][:count],
+        rows=rows,
+        counters=counters,
+    )
+    return counters
+
+
+############################
+
+class ParallelRasterizer:
+    def __init__(self, width: int, height: int, workers: int = None):
+        """
+        Rasterizes batches of triangles for a width x height screen across worker processes.
+
+        Arguments:
+        workers: number of worker processes, by default one per CPU
+        """
+        self.width = width
+        self.height = height
+        self.workers = workers or os.cpu_count() or 1
+
+        band_count = min(self.workers * BANDS_PER_WORKER, height)
+        edges = np.linspace(0, height, band_count + 1).astype(int)
+        self.bands = [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+        self._executor: ProcessPoolExecutor = None
+        self._output = shared_memory.SharedMemory(create=True, size=_size(_output_layout(width, height)))
+        self._buffers = _views(self._output.buf, _output_layout(width, height))
+        self._geometry: shared_memory.SharedMemory = None
+        self._triangles: dict[str, np.ndarray] = None
+        self._capacity = 0
+
+        self._finalizers = [weakref.finalize(self, _release, self._output, os.getpid())]
+
+    def _reserve(self, count: int):
+        # Grow the geometry block, leaving room so it isn't replaced every frame
+        if count <= self._capacity:
+            return
+
+        capacity = max(count, 2 * self._capacity, 1024)
+        geometry = shared_memory.SharedMemory(create=True, size=_size(_geometry_layout(capacity)))
+
+        if self._geometry is not None:
+            self._triangles = None
+            self._finalizers.pop().detach()
+            _release(self._geometry, os.getpid())
+
+        self._geometry = geometry
+        self._triangles = _views(geometry.buf, _geometry_layout(capacity))
+        self._capacity = capacity
+        self._finalizers.append(weakref.finalize(self, _release, geometry, os.getpid()))
+
+    def rasterize(self, vertices: np.ndarray, planes: np.ndarray, shades: np.ndarray,
+                  counters: dict[str, int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Clears the screen and rasterizes a batch of triangles, with the same
+        arguments as raster.rasterize. Returns the (color, z_buffer) arrays,
+        which are overwritten by the next call
+        """
+        count = len(vertices)
+        self._reserve(count)
+
+        self._triangles["vertices"][:count] = vertices
+        self._triangles["planes"][:count] = planes
+        self._triangles["shades"][:count] = shades
+
+        self._buffers["color"].fill(0)
+        self._buffers["z_buffer"].fill(float("inf"))
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        futures = [
+            self._executor.submit(
+                _rasterize_band, self._geometry.name, self._capacity, count, self._output.name,
+                self.width, self.height, rows,
+                None if counters is None else {"pixels_tested": 0, "pixels_written": 0},
+            )
+            for rows in self.bands
+        ]
+        for future in futures:
+            band_counters = future.result()
+            if counters is not None:
+                for name, value in band_counters.items():
+                    counters[name] += value
+
+        return self._buffers["color"], self._buffers["z_buffer"]
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        self._buffers = self._triangles = None
+        for finalizer in self._finalizers:
+            finalizer()
+        self._finalizers = []
@@ -0,0 +1,145 @@
+"""
+Opt-in frame statistics for Environment and Camera.
+
+Enable them with Environment.enable_stats(). While enabled the environment
+and its camera record, for every rendered frame, the time spent in each
+stage, the time spent updating the objects, keyed by the Behavior classes
+they carry (or the object's class when it has none), and counters of
+triangles and pixels. Frames are kept in a rolling history. When disabled
+(the default), env.stats is None and nothing is recorded.
+
+Stages:
+update: Environment.update, including the behaviors
+cull: testing shapes and BVH nodes against the view volume
+normals: world space normals of the shapes
+transform: world space vertices of the shapes
+lighting: shading the faces by the environment's lights
+setup: back-face culling, projection and shading of the triangles
+raster: rasterisation
+output: writing the previous frame out, in main_loop
+
+Counters:
+triangles_submitted: triangles of the shapes that aren't hidden, at the level of detail drawn
+triangles_culled: triangles outside the view volume
+triangles_back_facing: triangles facing away from the camera
+triangles_occluded: triangles hidden behind what was already drawn, see Camera(occlusion=True)
+triangles_rasterized: triangles drawn
+pixels_tested: pixels covered by the drawn triangles, i.e. depth tests
+pixels_written: depth tests passed. The numpy and parallel backends resolve
+    every pixel once per batch, so overdraw within a batch isn't counted
+pixels_covered: pixels of the frame covered by a triangle. pixels_tested / pixels_covered
+    is the overdraw, the depth tests per visible pixel
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict, deque
+
+STAGES = ("update", "cull", "normals", "transform", "lighting", "setup", "raster", "output")
+COUNTERS = ("triangles_submitted", "triangles_culled", "triangles_back_facing", "triangles_occluded", "triangles_rasterized", "pixels_tested", "pixels_written", "pixels_covered")
+
+
+class Profiler:
+    def __init__(self, history: int = 120, overlay: bool = False, clock=time.perf_counter):
+        """
+        Collects frame statistics.
+
+        Arguments:
+        history: how many frames to keep
+        overlay: write a line of statistics over the top of every rendered frame
+        clock: the timer used, in seconds
+        """
+        self.history: deque[dict] = deque(maxlen=history)
+        self.overlay = overlay
+        self.clock = clock
+        self._start_frame()
+
+    def _start_frame(self):
+        self.times: defaultdict[str, float] = defaultdict(float)
+        self.counters: defaultdict[str, int] = defaultdict(int)
+        self.behaviors: defaultdict[str, float] = defaultdict(float)
+
+    def add_time(self, stage: str, seconds: float):
+        self.times[stage] += seconds
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+
+    def add_behavior_time(self, behavior: str, seconds: float):
+        self.behaviors[behavior] += seconds
+
+    def end_frame(self):
+        """
+        Moves the statistics recorded since the last call into the history
+        """
+        self.history.append({
+            "end": self.clock(),
+            "times": dict(self.times),
+            "counters": dict(self.counters),
+            "behaviors": dict(self.behaviors),
+        })
+        self._start_frame()
+
+    @property
+    def last(self) -> dict:
+        """
+        The latest frame's statistics, or None before the first frame
+        """
+        return self.history[-1] if self.history else None
+
+    def fps(self) -> float:
+        """
+        Frames per second over the history
+        """
+        if len(self.history) < 2:
+            return 0.0
+        elapsed = self.history[-1]["end"] - self.history[0]["end"]
+        return (len(self.history) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def overdraw(self) -> float:
+        """
+        Depth tests per pixel covered over the history, 1 meaning no pixel was drawn twice
+        """
+        tested = sum(frame["counters"].get("pixels_tested", 0) for frame in self.history)
+        covered = sum(frame["counters"].get("pixels_covered", 0) for frame in self.history)
+        return tested / covered if covered else 0.0
+
+    def summary(self) -> dict:
+        """
+        Returns the mean and maximum of every stage's time (in milliseconds),
+        counter and behavior cost (in milliseconds) over the history
+        """
+        frames = list(self.history)
+
+        def aggregate(key: str, names, scale: float):
+            result = {}
+            for name in names:
+                values = [frame[key].get(name, 0) * scale for frame in frames]
+                result[name] = {"mean": sum(values) / len(values), "max": max(values)} if values else {"mean": 0, "max": 0}
+            return result
+
+        behaviors = sorted({name for frame in frames for name in frame["behaviors"]})
+        return {
+            "frames": len(frames),
+            "fps": self.fps(),
+            "times_ms": aggregate("times", STAGES, 1e3),
+            "counters": aggregate("counters", COUNTERS, 1),
+            "behaviors_ms": aggregate("behaviors", behaviors, 1e3),
+        }
+
+    def overlay_line(self, width: int) -> str:
+        """
+        Returns a summary of the latest frame that fits in width characters
+        """
+        frame = self.last
+        if frame is None:
+            return " " * width
+
+        times, counters = frame["times"], frame["counters"]
+        line = (
+            f"{self.fps():.1f}fps {sum(times.values()) * 1e3:.1f}ms "
+            f"r{times.get('raster', 0) * 1e3:.1f}ms "
+            f"tri {counters.get('triangles_rasterized', 0)}/{counters.get('triangles_submitted', 0)} "
+            f"px {counters.get('pixels_written', 0)}/{counters.get('pixels_tested', 0)}"
+        )
+        return line[:width].ljust(width)
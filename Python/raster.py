@@ -0,0 +1,286 @@
+"""
+Rasterisation helpers shared by Camera's backends, and the NumPy backend.
+
+Triangles are drawn one row at a time. The three edge functions of a
+triangle are linear with integer coefficients, so on each row the pixels
+inside the triangle form a span whose ends are found exactly with integer
+division, and no pixel outside it is visited. The reciprocal of a pixel's
+depth is linear in its screen coordinates too (see depth_planes), so the
+depth only costs a multiply-add and a division per pixel.
+
+The NumPy backend turns every pixel of every span in a batch into a
+fragment and does the depth test as array operations. The arithmetic is the
+same as in Camera._render_triangle, so both backends produce the same
+character grid.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from math_3d import Vector3
+
+# Upper bound on the number of fragments generated at once
+MAX_FRAGMENTS = 1 << 20
+
+
+def edge_functions(a_x: int, a_y: int, b_x: int, b_y: int, c_x: int, c_y: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the coefficients (e_x, e_y, e_0) of the triangle's three edge
+    functions e_x*x + e_y*y + e_0, oriented so that a pixel is inside the
+    triangle (or on its border) when all three are >= 0
+    """
+    edges = [
+        (a_y - b_y, b_x - a_x, a_x*b_y - b_x*a_y),
+        (b_y - c_y, c_x - b_x, b_x*c_y - c_x*b_y),
+        (c_y - a_y, a_x - c_x, c_x*a_y - a_x*c_y),
+    ]
+
+    # The edge functions add up to twice the signed area everywhere
+    if edges[0][2] + edges[1][2] + edges[2][2] < 0:
+        edges = [(-e_x, -e_y, -e_0) for e_x, e_y, e_0 in edges]
+    return edges
+
+
+def depth_planes(scaled_distances: np.ndarray, normals: np.ndarray, width: int, height: int,
+                 x_vec: Vector3, y_vec: Vector3, depth_normal: Vector3) -> np.ndarray:
+    """
+    Returns a (T, 3) array of coefficients (d_x, d_y, d_0) such that the
+    reciprocal depth of each triangle at pixel (x, y) is d_x*x + d_y*y + d_0.
+
+    The ray through a pixel is p = u*x_vec + v*y_vec + depth_normal, with (u, v)
+    the pixel's offset from the center of the screen, and reaches the triangle's
+    plane at depth*(k/(p.n)), where k is the distance from the camera to the
+    plane along the normal n. p.n is linear in (x, y), so its quotient by k*depth is too.
+
+    Arguments:
+    scaled_distances: (T,) k*depth for each triangle
+    normals: (T, 3) triangle normals
+    width, height: size of the screen
+    x_vec, y_vec, depth_normal: the camera's screen space basis
+    """
+    x_n = normals[:, 0]*x_vec.x + normals[:, 1]*x_vec.y + normals[:, 2]*x_vec.z
+    y_n = normals[:, 0]*y_vec.x + normals[:, 1]*y_vec.y + normals[:, 2]*y_vec.z
+    d_n = normals[:, 0]*depth_normal.x + normals[:, 1]*depth_normal.y + normals[:, 2]*depth_normal.z
+
+    # u = x - width//2 and v = height//2 - y
+    planes = np.stack((x_n, -y_n, d_n - (width // 2)*x_n + (height // 2)*y_n), axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return planes / scaled_distances[:, None]
+
+
+def rasterize(
+    color: np.ndarray,
+    z_buffer: np.ndarray,
+    vertices: np.ndarray,
+    planes: np.ndarray,
+    shades: np.ndarray,
+    rows: tuple[int, int] = None,
+    counters: dict[str, int] = None,
+    columns: tuple[int, int] = None,
+    order: np.ndarray = None,
+    owner: np.ndarray = None,
+):
+    """
+    Rasterizes a batch of triangles into color and z_buffer, in order.
+
+    Arguments:
+    color: (height, width) array of palette indices, updated in place
+    z_buffer: (height, width) array of depths, updated in place
+    vertices: (T, 3, 2) integer screen coordinates of the triangles
+    planes: (T, 3) reciprocal depth coefficients of the triangles, see depth_planes
+    shades: (T,) palette index written for each triangle
+    rows: only rasterize the rows in [start, stop), leaving the others untouched
+    columns: likewise for the columns
+    counters: if given, "pixels_tested" and "pixels_written" are incremented by
+        the number of covered pixels and of pixels that passed the depth test
+    order: (T,) position of each triangle in the order the frame's triangles
+        were submitted, when they are drawn in another order. Depth ties then go
+        to the triangle submitted first, as if they had been drawn in that order
+    owner: (height, width) array of the order of the triangle drawn at each
+        pixel, updated in place, needed with order
+    """
+    height, width = z_buffer.shape
+    if len(vertices) == 0:
+        return
+
+    first_row, last_row = (0, height - 1) if rows is None else (max(rows[0], 0), min(rows[1], height) - 1)
+    first_column, last_column = (0, width - 1) if columns is None else (max(columns[0], 0), min(columns[1], width) - 1)
+
+    xs = vertices[:, :, 0]
+    ys = vertices[:, :, 1]
+    x_min = np.maximum(xs.min(axis=1), first_column)
+    x_max = np.minimum(xs.max(axis=1), last_column)
+    y_min = np.maximum(ys.min(axis=1), first_row)
+    y_max = np.minimum(ys.max(axis=1), last_row)
+
+    row_counts = np.where((x_max >= x_min) & (y_max >= y_min), y_max - y_min + 1, 0)
+    ends = np.cumsum(row_counts * (x_max - x_min + 1))
+
+    edges = _edge_arrays(xs, ys)
+
+    # Split the batch so that a few huge triangles cannot exhaust memory.
+    # Chunks are rasterized in order against the already updated buffers, so
+    # the result is the same as rasterizing the triangles one at a time
+    start = 0
+    while start < len(vertices):
+        offset = ends[start - 1] if start > 0 else 0
+        stop = max(int(np.searchsorted(ends, offset + MAX_FRAGMENTS, side="right")), start + 1)
+
+        _rasterize_chunk(
+            color.reshape(-1), z_buffer.reshape(-1), width,
+            np.arange(start, stop), row_counts, x_min, x_max, y_min, edges, planes, shades, counters,
+            order, None if owner is None else owner.reshape(-1),
+        )
+        start = stop
+
+
+def _edge_arrays(xs: np.ndarray, ys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # edge_functions for every triangle, as (T, 3) arrays of e_x, e_y and e_0
+    a_x, b_x, c_x = xs[:, 0], xs[:, 1], xs[:, 2]
+    a_y, b_y, c_y = ys[:, 0], ys[:, 1], ys[:, 2]
+
+    e_x = np.stack((a_y - b_y, b_y - c_y, c_y - a_y), axis=1)
+    e_y = np.stack((b_x - a_x, c_x - b_x, a_x - c_x), axis=1)
+    e_0 = np.stack((a_x*b_y - b_x*a_y, b_x*c_y - c_x*b_y, c_x*a_y - a_x*c_y), axis=1)
+
+    sign = np.where(e_0.sum(axis=1) < 0, -1, 1)[:, None]
+    return e_x * sign, e_y * sign, e_0 * sign
+
+
+def _rasterize_chunk(color, z_buffer, width, chunk, row_counts, x_min, x_max, y_min, edges, planes, shades, counters, order=None, owner=None):
+    # One entry per row of every triangle
+    chunk_rows = row_counts[chunk]
+    tri = np.repeat(chunk, chunk_rows)
+    if len(tri) == 0:
+        return
+
+    first = np.cumsum(chunk_rows) - chunk_rows
+    y = y_min[tri] + np.arange(len(tri)) - np.repeat(first, chunk_rows)
+
+    # Clip each row to the span where every edge function is >= 0
+    start = x_min[tri]
+    stop = x_max[tri]
+    e_x, e_y, e_0 = (array[tri] for array in edges)
+    for i in range(3):
+        slope = e_x[:, i]
+        row = e_y[:, i]*y + e_0[:, i]
+        divisor = np.where(slope == 0, 1, slope)
+
+        start = np.where(slope > 0, np.maximum(start, -(row // divisor)), start)
+        stop = np.where(slope < 0, np.minimum(stop, row // -divisor), stop)
+        stop = np.where((slope == 0) & (row < 0), -1, stop)
+
+    # One fragment per pixel of every span
+    lengths = np.maximum(stop - start + 1, 0)
+    span = np.repeat(np.arange(len(tri)), lengths)
+    if len(span) == 0:
+        return
+
+    span_first = np.cumsum(lengths) - lengths
+    x = start[span] + np.arange(len(span)) - span_first[span]
+    tri, y = tri[span], y[span]
+
+    d = planes[tri]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reciprocal = d[:, 0]*x + (d[:, 1]*y + d[:, 2])
+        depth = 1 / reciprocal
+
+    # Depth test. Sorting by pixel, then depth, then submission order picks the
+    # fragment a sequential strict z-test would have kept
+    pixel = y*width + x
+    current = z_buffer[pixel]
+    rank = tri if order is None else order[tri]
+    closer = depth < current
+    if owner is not None:
+        closer |= (depth == current) & (rank < owner[pixel])
+    closer &= reciprocal != 0
+    tested = len(pixel)
+    tri, rank, pixel, depth = tri[closer], rank[closer], pixel[closer], depth[closer]
+
+    sort = np.lexsort((rank, depth, pixel))
+    sorted_pixel = pixel[sort]
+    first = np.ones(len(sort), dtype=bool)
+    first[1:] = sorted_pixel[1:] != sorted_pixel[:-1]
+    winners = sort[first]
+
+    z_buffer[pixel[winners]] = depth[winners]
+    color[pixel[winners]] = shades[tri[winners]]
+    if owner is not None:
+        owner[pixel[winners]] = rank[winners]
+
+    if counters is not None:
+        counters["pixels_tested"] += tested
+        counters["pixels_written"] += len(winners)
+
+
+def triangle_bounds(vertices: np.ndarray, planes: np.ndarray, width: int, height: int) -> tuple[np.ndarray, ...]:
+    """
+    Returns the screen bounds x_min, y_min, x_max, y_max (included, clipped to
+    the screen) of each triangle, and the nearest depth any of its pixels can
+    have, or -inf when the triangle may reach behind the camera.
+
+    The reciprocal depth is linear over the triangle, so it is largest at a vertex
+
+    Arguments:
+    vertices: (T, 3, 2) integer screen coordinates of the triangles
+    planes: (T, 3) reciprocal depth coefficients of the triangles, see depth_planes
+    """
+    xs = vertices[:, :, 0]
+    ys = vertices[:, :, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reciprocals = planes[:, 0, None]*xs + (planes[:, 1, None]*ys + planes[:, 2, None])
+        near = 1 / reciprocals.max(axis=1)
+    near = np.where((reciprocals > 0).all(axis=1) & np.isfinite(near), near, -np.inf)
+
+    return (
+        np.maximum(xs.min(axis=1), 0), np.maximum(ys.min(axis=1), 0),
+        np.minimum(xs.max(axis=1), width - 1), np.minimum(ys.max(axis=1), height - 1),
+        near,
+    )
+
+
+def clip_rect(x_0: int, y_0: int, x_1: int, y_1: int, width: int, height: int) -> tuple[int, int, int, int]:
+    """
+    Returns the part of the rectangle [x_0, x_1) x [y_0, y_1) on a screen of the
+    given size, or None when it is off the screen
+    """
+    x_0, y_0, x_1, y_1 = max(x_0, 0), max(y_0, 0), min(x_1, width), min(y_1, height)
+    if x_0 >= x_1 or y_0 >= y_1:
+        return None
+    return x_0, y_0, x_1, y_1
+
+
+def rects_overlap(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_rects(rects: list[tuple[int, int, int, int]]) -> list[tuple[int, int, int, int]]:
+    """
+    Returns rectangles covering the given ones (None entries are ignored)
+    that don't overlap each other, merging overlapping ones into their bounding box
+    """
+    merged = []
+    for rect in rects:
+        if rect is None:
+            continue
+
+        # A merged rectangle can reach others, so keep merging until it doesn't overlap any
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            if rects_overlap(rect, other):
+                rect = (min(rect[0], other[0]), min(rect[1], other[1]), max(rect[2], other[2]), max(rect[3], other[3]))
+                merged.pop(i)
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+def to_characters(color: np.ndarray, palette: list[str]) -> list[list[str]]:
+    """
+    Converts a (height, width) array of palette indices to rows of characters
+    """
+    return np.array(palette)[color].tolist()
@@ -0,0 +1,114 @@
+"""
+Fixed timestep game loop.
+
+The simulation advances in steps of a fixed length of simulated time, and
+as many steps are run as wall clock time has passed, so behaviors move at the
+same speed however long a frame takes to render. Rendering is paced to a
+target frame rate by sleeping until each frame's deadline, and frames can be
+skipped when rendering falls behind.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+
+class Time:
+    """
+    Timing information for behaviors, similar to Unity's Time class. It is
+    updated by the running Scheduler, e.g. use Time.delta_time in Behavior.update
+    """
+    # Simulated seconds advanced by each update, the scheduler's timestep
+    delta_time: float = 0.0
+    # Simulated seconds since the start, at the beginning of the current update
+    time: float = 0.0
+    # Wall clock seconds between the last two rendered frames
+    frame_delta_time: float = 0.0
+    # Number of updates run so far
+    step_count: int = 0
+    # Number of frames rendered so far
+    frame_count: int = 0
+
+
+class Scheduler:
+    def __init__(self, update: Callable[[int], None], render: Callable[[], None], timestep: float = 0.1,
+                 fps: float = None, max_steps_per_frame: int = 5, max_frame_skip: int = 5, timestamp: int = 0,
+                 clock: Callable[[], float] = time.perf_counter, sleep: Callable[[float], None] = time.sleep):
+        """
+        Runs update(timestamp) every timestep seconds of wall clock time and
+        render() at up to fps frames per second.
+
+        Arguments:
+        timestep: simulated seconds per update
+        fps: target frame rate, by default one frame per timestep
+        max_steps_per_frame: most updates run to catch up before rendering. When
+            updates can't keep up, the simulation slows down instead of spiralling
+        max_frame_skip: most consecutive frames skipped when rendering is behind
+            schedule, 0 never skips
+        timestamp: the first update's timestamp, e.g. to resume a scene from a snapshot
+        clock, sleep: time sources, replaceable for tests and benchmarks
+        """
+        self.update = update
+        self.render = render
+        self.timestep = timestep
+        self.frame_period = 1 / fps if fps else timestep
+        self.max_steps_per_frame = max_steps_per_frame
+        self.max_frame_skip = max_frame_skip
+        self.clock = clock
+        self.sleep = sleep
+
+        self.timestamp = timestamp
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+    def run(self, duration: float = None):
+        """
+        Runs the loop, forever or for duration seconds of wall clock time
+        """
+        start = last = deadline = self.clock()
+        last_render = start
+        # Start with a step due, so the first frame shows the first update
+        accumulator = self.timestep
+        skipped_in_a_row = 0
+
+        while duration is None or last - start < duration:
+            now = self.clock()
+            accumulator += now - last
+            last = now
+
+            steps = 0
+            while accumulator >= self.timestep and steps < self.max_steps_per_frame:
+                Time.delta_time = self.timestep
+                Time.time = self.timestamp * self.timestep
+                Time.step_count = self.timestamp
+
+                self.update(self.timestamp)
+                self.timestamp += 1
+                accumulator -= self.timestep
+                steps += 1
+
+            if steps == self.max_steps_per_frame:
+                # Drop the time the simulation couldn't catch up on
+                accumulator = min(accumulator, self.timestep)
+
+            deadline += self.frame_period
+            now = self.clock()
+
+            if now > deadline and skipped_in_a_row < self.max_frame_skip:
+                self.frames_skipped += 1
+                skipped_in_a_row += 1
+            else:
+                Time.frame_delta_time = now - last_render
+                Time.frame_count = self.frames_rendered
+                last_render = now
+
+                self.render()
+                self.frames_rendered += 1
+                skipped_in_a_row = 0
+
+            now = self.clock()
+            if deadline > now:
+                self.sleep(deadline - now)
+            elif now - deadline > self.frame_period * max(self.max_frame_skip, 1):
+                # Too far behind to catch up by skipping frames, start pacing from now
+                deadline = now
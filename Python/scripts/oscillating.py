@@ -1,5 +1,6 @@
 from asciithree import Behavior, Shape
 from math_3d import Vector3
+from transforms import TransformBatch
 import math
 
 # Create behavior inheriting from Behavior
@@ -11,4 +12,9 @@ class oscillating(Behavior):
         self.shape_pos = shape.position
 
     def update(self, timestamp: int, shape: Shape):
-        shape.position = self.shape_pos + math.sin(timestamp)*Vector3(1, 1, 1)*self.osc_amount
\ No newline at end of file
+        shape.position = self.shape_pos + math.sin(timestamp)*Vector3(1, 1, 1)*self.osc_amount
+
+    # Optional: update every shape carrying the behavior at once, used when the environment has a transform store
+    @classmethod
+    def update_many(cls, timestamp: int, transforms: TransformBatch):
+        transforms.positions[:] = transforms.parameter("shape_pos") + (math.sin(timestamp)*transforms.parameter("osc_amount"))[:, None]
@@ -12,5 +12,11 @@ class name_of_behavior(Behavior):
         pass
 
     def update(self, timestamp: int, shape: Shape):
-        # Do something here
-        pass
\ No newline at end of file
+        # Do something here. timestamp counts the updates, scheduler.Time.time and scheduler.Time.delta_time give the time in seconds
+        pass
+
+    # Optionally, update every shape carrying the behavior in one call when the environment has a
+    # transform store (Environment.enable_transform_store), e.g. with numpy on transforms.positions
+    # @classmethod
+    # def update_many(cls, timestamp: int, transforms: TransformBatch):
+    #     pass
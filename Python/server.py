@@ -0,0 +1,304 @@
+"""
+Frame broadcast server: renders an Environment once per frame and streams
+the frames to any number of clients over TCP or Unix sockets.
+
+The scene is updated and drawn at a fixed timestep in a worker thread, so
+the event loop keeps serving clients while a frame renders. Every client has
+a sender coroutine that sends the latest frame whenever one is published,
+encoded as a delta from the last frame the client acknowledged (with
+animation.encode_frame). Encoded frames are cached per base frame, so a
+frame is encoded once per distinct base, not once per client. A client
+that hasn't acknowledged max_in_flight frames yet is skipped, and only gets
+the latest frame once it catches up, so slow clients drop frames instead
+of holding back the others or the render loop.
+
+Protocol, little endian:
+    server hello: magic, width, height, palette length, then the palette
+    server frame: frame number, base frame number, keyframe flag, payload length, then the payload
+    client ack:   frame number, after applying a frame
+
+Keyframe payloads are whole frames, other payloads apply to the base frame.
+FrameClient implements the client side.
+"""
+from __future__ import annotations
+
+import asyncio
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from animation import SAME, encode_frame, run_length_decode
+from asciithree import PALETTE, Environment
+
+HELLO = struct.Struct("<8sIII")
+MAGIC = b"A3DSTRM1"
+FRAME = struct.Struct("<IIBI")
+ACK = struct.Struct("<I")
+
+
+class _Client:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.wake = asyncio.Event()
+        self.acked: int = None
+        self.last_sent: int = None
+        self.unacked: list[int] = []
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+
+
+class FrameServer:
+    def __init__(self, env: Environment, timestep: float = 0.1, max_in_flight: int = 2, history: int = 32):
+        """
+        Serves frames of env, updated every timestep seconds.
+
+        Arguments:
+        max_in_flight: most frames sent to a client before it acknowledges them
+        history: how many recent frames are kept as bases for deltas. Clients
+            whose last acknowledged frame is older get a keyframe
+        """
+        self.env = env
+        self.timestep = timestep
+        self.max_in_flight = max_in_flight
+        self.history = history
+
+        self.palette = "".join(PALETTE).encode("ascii")
+        self.frame_number = -1
+        self._frames: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._encoded: dict[int, tuple[bytes, bool]] = {}
+        self._clients: set[_Client] = set()
+        self._servers: list[asyncio.AbstractServer] = []
+
+        self.frames_rendered = 0
+        self.render_seconds = 0.0
+        self.encodings = 0
+        self.total_frames_sent = 0
+        self.total_frames_dropped = 0
+        self.total_bytes_sent = 0
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> tuple[str, int]:
+        """
+        Listens for TCP clients, returning the address, e.g. to find the port chosen when port is 0
+        """
+        server = await asyncio.start_server(self._serve_client, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[:2]
+
+    async def start_unix(self, path: str):
+        """
+        Listens for clients on a Unix socket
+        """
+        self._servers.append(await asyncio.start_unix_server(self._serve_client, path))
+
+    def _frame_size(self) -> tuple[int, int]:
+        # The size of the frames env.draw returns, see Environment.composite
+        cameras = self.env.cameras
+        return (max(camera.viewport[1] + camera.height for camera in cameras),
+                max(camera.viewport[0] + camera.width for camera in cameras))
+
+    def _step(self, timestamp: int) -> np.ndarray:
+        # Runs in a worker thread. The frame is copied as the camera draws the next one into the same buffer
+        self.env.update(timestamp)
+        return self.env.draw().copy()
+
+    def _publish(self, frame: np.ndarray):
+        self.frame_number += 1
+        self._frames[self.frame_number] = frame
+        while len(self._frames) > self.history:
+            self._frames.popitem(last=False)
+        self._encoded = {}
+
+        for client in self._clients:
+            client.wake.set()
+
+    def _encode(self, base: int) -> tuple[bytes, bool]:
+        # The latest frame as a delta from base, or whole when base is None
+        encoded = self._encoded.get(base)
+        if encoded is None:
+            previous = self._frames.get(base) if base is not None else None
+            encoded = self._encoded[base] = encode_frame(self._frames[self.frame_number], previous)
+            self.encodings += 1
+        return encoded
+
+    async def run(self, frames: int = None):
+        """
+        Updates and renders the environment every timestep, forever or for the
+        given number of frames, publishing every frame to the clients
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        timestamp = 0
+
+        while frames is None or timestamp < frames:
+            start = loop.time()
+            frame = await loop.run_in_executor(None, self._step, timestamp)
+            self.render_seconds += loop.time() - start
+            self.frames_rendered += 1
+            self._publish(frame)
+            timestamp += 1
+
+            deadline += self.timestep
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Behind schedule, let the clients run and start pacing from now
+                await asyncio.sleep(0)
+                deadline = loop.time()
+
+    async def close(self):
+        """
+        Stops listening and disconnects every client
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+        for client in list(self._clients):
+            client.writer.close()
+            client.wake.set()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(writer)
+        self._clients.add(client)
+        acks = asyncio.create_task(self._read_acks(reader, client))
+
+        try:
+            height, width = self._frame_size()
+            writer.write(HELLO.pack(MAGIC, width, height, len(self.palette)) + self.palette)
+            await writer.drain()
+
+            if self._frames:
+                client.wake.set()
+
+            while not writer.is_closing():
+                await client.wake.wait()
+                client.wake.clear()
+
+                number = self.frame_number
+                if number < 0 or number == client.last_sent:
+                    continue
+                if len(client.unacked) >= self.max_in_flight:
+                    # Wait for an ack, which wakes the client up again
+                    continue
+
+                base = client.acked if client.acked in self._frames else None
+                data, keyframe = self._encode(base)
+                message = FRAME.pack(number, base if not keyframe else number, keyframe, len(data)) + data
+
+                if client.last_sent is not None:
+                    dropped = number - client.last_sent - 1
+                    client.frames_dropped += dropped
+                    self.total_frames_dropped += dropped
+                client.last_sent = number
+                client.unacked.append(number)
+                client.frames_sent += 1
+                client.bytes_sent += len(message)
+                self.total_frames_sent += 1
+                self.total_bytes_sent += len(message)
+
+                writer.write(message)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(client)
+            acks.cancel()
+            writer.close()
+
+    async def _read_acks(self, reader: asyncio.StreamReader, client: _Client):
+        try:
+            while True:
+                (number,) = ACK.unpack(await reader.readexactly(ACK.size))
+                client.acked = number if client.acked is None else max(client.acked, number)
+                client.unacked = [sent for sent in client.unacked if sent > number]
+                client.wake.set()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            client.writer.close()
+            client.wake.set()
+
+    def stats(self) -> dict:
+        """
+        Returns the frames rendered, the mean render time and the totals of frames sent and dropped
+        """
+        return {
+            "clients": len(self._clients),
+            "frames_rendered": self.frames_rendered,
+            "render_ms": 1e3 * self.render_seconds / max(self.frames_rendered, 1),
+            "encodings": self.encodings,
+            "frames_sent": self.total_frames_sent,
+            "frames_dropped": self.total_frames_dropped,
+            "bytes_sent": self.total_bytes_sent,
+        }
+
+
+class FrameClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Receives frames from a FrameServer, see connect_tcp and connect_unix
+        """
+        self.reader = reader
+        self.writer = writer
+        self.width = self.height = 0
+        self.palette: list[str] = None
+
+        # Frames received since the last acknowledged one, which later deltas may be based on
+        self._frames: dict[int, np.ndarray] = {}
+        self.frame_number: int = None
+        self.frame: np.ndarray = None
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> FrameClient:
+        client = cls(*await asyncio.open_connection(host, port))
+        await client._handshake()
+        return client
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> FrameClient:
+        client = cls(*await asyncio.open_unix_connection(path))
+        await client._handshake()
+        return client
+
+    async def _handshake(self):
+        magic, self.width, self.height, palette_length = HELLO.unpack(await self.reader.readexactly(HELLO.size))
+        if magic != MAGIC:
+            raise ValueError("Not a frame server")
+        self.palette = [chr(byte) for byte in await self.reader.readexactly(palette_length)]
+
+    async def receive(self, ack: bool = True) -> tuple[int, np.ndarray]:
+        """
+        Waits for the next frame and returns its number and palette indices.
+        With ack, the frame is acknowledged straight away; otherwise call ack
+        """
+        number, base, keyframe, length = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+        cells = run_length_decode(await self.reader.readexactly(length))
+        if not keyframe:
+            cells = np.where(cells == SAME, self._frames[base].reshape(-1), cells)
+
+        self.frame_number = number
+        self.frame = cells.reshape(self.height, self.width)
+        self._frames[number] = self.frame
+
+        if ack:
+            await self.ack(number)
+        return number, self.frame
+
+    async def ack(self, number: int):
+        """
+        Acknowledges a frame. Frames before it are no longer needed as bases
+        """
+        for old in [old for old in self._frames if old < number]:
+            del self._frames[old]
+        self.writer.write(ACK.pack(number))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
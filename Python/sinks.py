@@ -0,0 +1,309 @@
+"""
+Frame sinks, where main_loop sends the rendered frames.
+
+A frame is encoded once (see encode_frame) and handed to a sink, which only
+does I/O when the frame changed. Every sink counts the frames it received,
+the bytes it wrote and the I/O system calls it made, so outputs can be
+compared for mostly static scenes.
+
+FileSink: rewrites a text file, replacing it atomically so readers always see whole frames
+MappedFileSink: double-buffered memory-mapped frame file, updated in place
+AnsiTerminalSink: redraws only the changed cells of a terminal
+StreamSink: writes whole frames to a pipe, file object or socket
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+
+def encode_frame(screen: list[list[str]]) -> bytes:
+    """
+    Encodes a rendered screen as ASCII text. Every character is written twice,
+    since characters are about twice as tall as they are wide, and every row
+    ends with a newline
+    """
+    height = len(screen)
+    width = len(screen[0]) if height else 0
+
+    cells = np.frombuffer("".join(["".join(row) for row in screen]).encode("ascii"), dtype=np.uint8)
+    return _encode_cells(cells.reshape(height, width))
+
+
+def encode_indices(indices: np.ndarray, palette: list[str], first_line: str = None) -> bytes:
+    """
+    Encodes a (height, width) array of palette indices like encode_frame
+    encodes the same screen as characters, without building it.
+
+    Arguments:
+    palette: the character of each index
+    first_line: if given, written over the first row instead of its characters
+    """
+    cells = np.frombuffer("".join(palette).encode("ascii"), dtype=np.uint8)[indices]
+    if first_line is not None and len(cells):
+        cells[0] = np.frombuffer(first_line.encode("ascii"), dtype=np.uint8)
+    return _encode_cells(cells)
+
+
+def _encode_cells(cells: np.ndarray) -> bytes:
+    # Doubles every byte of a (height, width) array and ends every row with a newline
+    height, width = cells.shape
+    text = np.empty((height, 2*width + 1), dtype=np.uint8)
+    text[:, 0:-1:2] = text[:, 1:-1:2] = cells
+    text[:, -1] = ord("\n")
+    return text.tobytes()
+
+
+class FrameSink:
+    def __init__(self):
+        """
+        Base class of the frame sinks. Subclasses implement _write, which is
+        only called when the frame differs from the previous one
+        """
+        self.frames = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.syscalls = 0
+        self._previous: bytes = None
+
+    def write(self, frame: bytes):
+        self.frames += 1
+        if frame == self._previous:
+            self.skipped += 1
+            return
+
+        self._write(frame, self._previous)
+        self._previous = frame
+
+    def _write(self, frame: bytes, previous: bytes):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the totals and the averages per frame of bytes written and system calls
+        """
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "bytes_written": self.bytes_written,
+            "syscalls": self.syscalls,
+            "bytes_per_frame": self.bytes_written / frames,
+            "syscalls_per_frame": self.syscalls / frames,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileSink(FrameSink):
+    def __init__(self, path: str):
+        """
+        Writes each frame to a text file. The frame is written to a temporary
+        file first and moved over the old one, so a reader opening the file gets
+        either the previous frame or the new one, never a mix
+        """
+        super().__init__()
+        self.path = path
+        self._temp_path = f"{path}.{os.getpid()}.tmp"
+
+    def _write(self, frame: bytes, previous: bytes):
+        fd = os.open(self._temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            self.bytes_written += os.write(fd, frame)
+        finally:
+            os.close(fd)
+        os.replace(self._temp_path, self.path)
+        self.syscalls += 4
+
+
+class MappedFileSink(FrameSink):
+    # Magic, width, height, frames written, index of the slot holding the latest frame
+    HEADER = struct.Struct("<8sIIQI4x")
+    MAGIC = b"A3DFRAME"
+
+    # Each slot starts with a counter that is odd while the slot is being written
+    SLOT_HEADER = struct.Struct("<Q")
+
+    def __init__(self, path: str):
+        """
+        Keeps the latest frame in a memory-mapped file with two frame slots.
+        New frames are copied into the slot readers aren't pointed at, then the
+        header is flipped to it, so no system calls are made per frame and only
+        the rows that changed are copied. Use read_mapped_frame to read it
+        """
+        super().__init__()
+        self.path = path
+        self._file = None
+        self._map: mmap.mmap = None
+        self._frame_size = 0
+        self._sequence = 0
+        self._slot_frames: list[bytes] = [None, None]
+
+    def _open(self, frame: bytes):
+        self.close()
+
+        row_size = frame.index(b"\n") + 1
+        self._width = (row_size - 1) // 2
+        self._height = len(frame) // row_size
+        self._frame_size = len(frame)
+        size = self.HEADER.size + 2 * (self.SLOT_HEADER.size + self._frame_size)
+
+        self._file = open(self.path, "w+b")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._map[:self.HEADER.size] = self.HEADER.pack(self.MAGIC, self._width, self._height, 0, 0)
+        self._slot_frames = [None, None]
+        self.syscalls += 4
+
+    def _slot_offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * (self.SLOT_HEADER.size + self._frame_size)
+
+    def _write(self, frame: bytes, previous: bytes):
+        if self._map is None or len(frame) != self._frame_size:
+            self._open(frame)
+
+        self._sequence += 1
+        slot = self._sequence % 2
+        offset = self._slot_offset(slot)
+        start = offset + self.SLOT_HEADER.size
+
+        (counter,) = self.SLOT_HEADER.unpack_from(self._map, offset)
+        self.SLOT_HEADER.pack_into(self._map, offset, counter + 1)
+
+        # The slot holds the frame from two writes ago, only copy the rows that differ from it
+        stale = self._slot_frames[slot]
+        if stale is None:
+            self._map[start:start + len(frame)] = frame
+            self.bytes_written += len(frame)
+        else:
+            width = frame.index(b"\n") + 1
+            new_rows = np.frombuffer(frame, dtype=np.uint8).reshape(-1, width)
+            old_rows = np.frombuffer(stale, dtype=np.uint8).reshape(-1, width)
+            for row in np.flatnonzero((new_rows != old_rows).any(axis=1)).tolist():
+                self._map[start + row*width:start + (row + 1)*width] = frame[row*width:(row + 1)*width]
+                self.bytes_written += width
+
+        self.SLOT_HEADER.pack_into(self._map, offset, counter + 2)
+        self._slot_frames[slot] = frame
+
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self._width, self._height, self._sequence, slot)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+
+def read_mapped_frame(path: str, retries: int = 100) -> bytes:
+    """
+    Returns the latest frame of a file written by a MappedFileSink, retrying
+    if the writer reused the slot while it was being read
+    """
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            magic, width, height, _, slot = MappedFileSink.HEADER.unpack_from(view)
+            if magic != MappedFileSink.MAGIC:
+                raise ValueError(f"{path} is not a frame file")
+
+            frame_size = (2*width + 1) * height
+            offset = MappedFileSink.HEADER.size + slot * (MappedFileSink.SLOT_HEADER.size + frame_size)
+            start = offset + MappedFileSink.SLOT_HEADER.size
+
+            for _ in range(retries):
+                (before,) = MappedFileSink.SLOT_HEADER.unpack_from(view, offset)
+                frame = view[start:start + frame_size]
+                (after,) = MappedFileSink.SLOT_HEADER.unpack_from(view, offset)
+
+                if before == after and before % 2 == 0:
+                    return frame
+
+                # Follow the header to the slot that was finished most recently
+                slot = MappedFileSink.HEADER.unpack_from(view)[4]
+                offset = MappedFileSink.HEADER.size + slot * (MappedFileSink.SLOT_HEADER.size + frame_size)
+                start = offset + MappedFileSink.SLOT_HEADER.size
+
+    raise TimeoutError(f"Could not read a whole frame from {path}")
+
+
+class AnsiTerminalSink(FrameSink):
+    # Runs of changed cells closer than this are redrawn together, since moving the cursor costs about as much
+    MERGE_GAP = 8
+
+    def __init__(self, stream=None):
+        """
+        Draws frames in a terminal with ANSI escape codes. The first frame is
+        drawn in full, after that only the runs of cells that changed are redrawn,
+        in one write per frame
+
+        Arguments:
+        stream: a binary stream, by default the standard output's
+        """
+        super().__init__()
+        self.stream = stream if stream is not None else sys.stdout.buffer
+
+    def _write(self, frame: bytes, previous: bytes):
+        if previous is None or len(previous) != len(frame):
+            # Clear the screen, hide the cursor and draw everything
+            output = b"\x1b[?25l\x1b[2J\x1b[H" + frame.replace(b"\n", b"\r\n")
+        else:
+            width = frame.index(b"\n") + 1
+            changed = (np.frombuffer(frame, dtype=np.uint8) != np.frombuffer(previous, dtype=np.uint8)).reshape(-1, width)
+
+            parts = []
+            for row in np.flatnonzero(changed.any(axis=1)).tolist():
+                columns = np.flatnonzero(changed[row])
+                breaks = np.flatnonzero(np.diff(columns) > self.MERGE_GAP)
+                starts = columns[np.concatenate(([0], breaks + 1))].tolist()
+                ends = columns[np.concatenate((breaks, [len(columns) - 1]))].tolist()
+
+                for start, end in zip(starts, ends):
+                    parts.append(b"\x1b[%d;%dH" % (row + 1, start + 1))
+                    parts.append(frame[row*width + start:row*width + end + 1])
+            output = b"".join(parts)
+
+        self.stream.write(output)
+        self.stream.flush()
+        self.bytes_written += len(output)
+        self.syscalls += 1
+
+    def close(self):
+        if self._previous is not None:
+            # Show the cursor again, below the last frame
+            self.stream.write(b"\x1b[?25h\x1b[%d;1H" % (self._previous.count(b"\n") + 1))
+            self.stream.flush()
+
+
+class StreamSink(FrameSink):
+    def __init__(self, stream, separator: bytes = b"\f\n"):
+        """
+        Writes every changed frame to a pipe, binary file object or connected
+        socket, followed by a separator. Each frame is sent with a single call,
+        so concurrent writers can't interleave inside a frame on a pipe
+        """
+        super().__init__()
+        self.stream = stream
+        self.separator = separator
+
+    def _write(self, frame: bytes, previous: bytes):
+        data = frame + self.separator
+
+        if hasattr(self.stream, "sendall"):
+            self.stream.sendall(data)
+        else:
+            self.stream.write(data)
+            self.stream.flush()
+
+        self.bytes_written += len(data)
+        self.syscalls += 1
@@ -0,0 +1,261 @@
+"""
+Binary snapshots of an Environment, to start a scene without running its setup.
+
+A snapshot holds the meshes with their normals, bounding volume hierarchies
+and levels of detail, the transform and settings of every shape and camera,
+the lights, the behaviors with their state, and the timestamp to continue
+from. It is a packed.py file: the meshes and the shapes' transforms are
+arrays, which load_snapshot memory maps instead of parsing OBJ files or
+computing normals again, and the rest is in the JSON header.
+
+Lights and behaviors are pickled, so their classes must be importable when
+loading (behaviors defined in a script are found if the script defines them
+again). Shapes, cameras, meshes and the environment they refer to are
+stored as references into the snapshot. Behavior.start is not called again
+on load, as the behaviors keep the state they had.
+
+Shapes are either Shapes drawing any mesh, or subclasses drawing their
+class's MESH, like Cube, which are created with (position, rotation, scaling).
+"""
+from __future__ import annotations
+
+import importlib
+import io
+import pickle
+
+import numpy as np
+
+from asciithree import Environment, Shape
+from culling import BVH, BVH_ARRAYS
+from math_3d import Quaternion, Vector3
+from mesh import Mesh
+from packed import read_packed, write_packed
+
+FORMAT = "asciithree snapshot"
+
+# Bump when the layout changes, so older snapshots are refused rather than misread
+SNAPSHOT_VERSION = 1
+
+# The Camera arguments saved, besides the environment and the transform
+CAMERA_SETTINGS = ("width", "height", "zoom", "perspective", "depth", "backend", "culling", "workers", "incremental", "lod", "occlusion")
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _find_class(path: str) -> type:
+    module, name = path.split(":")
+    cls = importlib.import_module(module)
+    for part in name.split("."):
+        cls = getattr(cls, part)
+    return cls
+
+
+def _transform(obj) -> list[float]:
+    return list(obj.position.as_tuple() + (obj.rotation.real,) + obj.rotation.vec.as_tuple() + obj.scaling.as_tuple())
+
+
+def _from_transform(values) -> tuple[Vector3, Quaternion, Vector3]:
+    x, y, z, real, i, j, k, sx, sy, sz = values
+    return Vector3(x, y, z), Quaternion(real, Vector3(i, j, k)), Vector3(sx, sy, sz)
+
+
+class _Pickler(pickle.Pickler):
+    # Pickles behaviors and lights, storing the objects also in the snapshot as references
+    def __init__(self, file, references: dict[int, tuple]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.references = references
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, objects: dict[str, list]):
+        super().__init__(file)
+        self.objects = objects
+
+    def persistent_load(self, reference):
+        kind, index = reference
+        return self.objects[kind][index]
+
+
+class _MeshTable:
+    # The meshes of a snapshot with their levels of detail, numbered as they're found
+    def __init__(self):
+        self.indices: dict[int, int] = {}
+        self.meshes: list[Mesh] = []
+        self.entries: list[dict] = []
+        self.arrays: dict[str, np.ndarray] = {}
+
+    def add(self, mesh: Mesh, shape_type: type = Shape) -> int:
+        index = self.indices.get(id(mesh))
+        if index is not None:
+            return index
+
+        index = self.indices[id(mesh)] = len(self.meshes)
+        self.meshes.append(mesh)
+        entry = {"name": mesh.name, "source_file": mesh.source_file, "lod_error": mesh.lod_error}
+        self.entries.append(entry)
+
+        if getattr(shape_type, "MESH", None) is mesh:
+            # Shared with the class, e.g. Cube.MESH, rather than stored
+            entry["class"] = _class_path(shape_type)
+            return index
+
+        prefix = f"mesh{index}"
+        self.arrays[f"{prefix}.vertices"] = mesh.vertices
+        self.arrays[f"{prefix}.triangles"] = mesh.triangles
+        self.arrays[f"{prefix}.normals"] = mesh.normals
+
+        # Only what has been built already, e.g. after drawing a frame
+        if mesh._bvh is not None:
+            entry["bvh"] = True
+            for name in BVH_ARRAYS:
+                self.arrays[f"{prefix}.bvh.{name}"] = getattr(mesh._bvh, name)
+        if mesh._levels is not None:
+            entry["levels"] = [self.add(level) for level in mesh._levels[1:]]
+        return index
+
+
+def save_snapshot(env: Environment, path: str, timestamp: int = 0):
+    """
+    Saves env to path, with the timestamp of the next update to run. The file
+    is replaced atomically, so a crash while saving leaves the previous snapshot
+    """
+    meshes = _MeshTable()
+    references = {id(env): ("environment", 0)}
+
+    shape_types: list[str] = []
+    shape_type_indices = np.zeros(len(env.shapes), dtype=np.int32)
+    mesh_indices = np.zeros(len(env.shapes), dtype=np.int32)
+    transforms = np.zeros((len(env.shapes), 10))
+    hidden = np.zeros(len(env.shapes), dtype=bool)
+
+    for i, shape in enumerate(env.shapes):
+        shape_type = type(shape)
+        if shape_type is not Shape and getattr(shape_type, "MESH", None) is not shape.mesh:
+            raise ValueError(f"Can't snapshot a {shape_type.__name__}, only Shapes and subclasses drawing their class's MESH")
+
+        path_of_type = _class_path(shape_type)
+        if path_of_type not in shape_types:
+            shape_types.append(path_of_type)
+        shape_type_indices[i] = shape_types.index(path_of_type)
+        mesh_indices[i] = meshes.add(shape.mesh, shape_type)
+        transforms[i] = _transform(shape)
+        hidden[i] = shape.hidden
+        references[id(shape)] = ("shapes", i)
+
+    cameras = []
+    for i, camera in enumerate(env.cameras):
+        cameras.append({
+            "class": _class_path(type(camera)),
+            "settings": {name: getattr(camera, name) for name in CAMERA_SETTINGS},
+            "transform": _transform(camera),
+            "viewport": list(camera.viewport),
+        })
+        references[id(camera)] = ("cameras", i)
+
+    for i, mesh in enumerate(meshes.meshes):
+        references[id(mesh)] = ("meshes", i)
+
+    objects = io.BytesIO()
+    _Pickler(objects, references).dump({
+        "lights": env.lights,
+        "shape_behaviors": [shape.behaviors for shape in env.shapes],
+        "camera_behaviors": [camera.behaviors for camera in env.cameras],
+    })
+
+    stats = env.stats
+    metadata = {
+        "format": FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "timestamp": timestamp,
+        "ambient_light": env.ambient_light,
+        "transform_store": env.transforms is not None,
+        "stats": {"history": stats.history.maxlen, "overlay": stats.overlay} if stats is not None else None,
+        "meshes": meshes.entries,
+        "shape_types": shape_types,
+        "cameras": cameras,
+    }
+    arrays = dict(meshes.arrays)
+    arrays.update({
+        "shapes.type": shape_type_indices,
+        "shapes.mesh": mesh_indices,
+        "shapes.transform": transforms,
+        "shapes.hidden": hidden,
+        "objects": np.frombuffer(objects.getvalue(), dtype=np.uint8),
+    })
+    write_packed(path, arrays, metadata)
+
+
+def _load_meshes(entries: list[dict], arrays: dict[str, np.ndarray]) -> list[Mesh]:
+    meshes = []
+    for index, entry in enumerate(entries):
+        if "class" in entry:
+            meshes.append(_find_class(entry["class"]).MESH)
+            continue
+
+        prefix = f"mesh{index}"
+        mesh = Mesh(arrays[f"{prefix}.vertices"], arrays[f"{prefix}.triangles"], name=entry["name"], normals=arrays[f"{prefix}.normals"])
+        mesh.source_file = entry["source_file"]
+        mesh.lod_error = entry["lod_error"]
+        if entry.get("bvh"):
+            mesh._bvh = BVH.from_arrays({name: arrays[f"{prefix}.bvh.{name}"] for name in BVH_ARRAYS})
+        meshes.append(mesh)
+
+    # Levels of detail come after their meshes
+    for mesh, entry in zip(meshes, entries):
+        if "levels" in entry:
+            mesh._levels = [mesh] + [meshes[level] for level in entry["levels"]]
+    return meshes
+
+
+def load_snapshot(path: str, mmap: bool = True) -> tuple[Environment, int]:
+    """
+    Loads an environment saved by save_snapshot, returning it and the
+    timestamp to continue from. With mmap, the meshes are read-only views of a
+    memory map of the file, only read from disk as they're drawn
+    """
+    metadata, arrays = read_packed(path, mmap)
+    if metadata.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a snapshot")
+    if metadata["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is a version {metadata['version']} snapshot, expected version {SNAPSHOT_VERSION}")
+
+    env = Environment()
+    env.ambient_light = metadata["ambient_light"]
+    meshes = _load_meshes(metadata["meshes"], arrays)
+
+    shape_types = [_find_class(type_path) for type_path in metadata["shape_types"]]
+    transforms = np.asarray(arrays["shapes.transform"]).tolist()
+    for type_index, mesh_index, transform, hidden in zip(arrays["shapes.type"].tolist(), arrays["shapes.mesh"].tolist(), transforms, arrays["shapes.hidden"].tolist()):
+        shape_type = shape_types[type_index]
+        if shape_type is Shape:
+            shape = Shape.from_mesh(meshes[mesh_index], *_from_transform(transform))
+        else:
+            shape = shape_type(*_from_transform(transform))
+        shape.hidden = hidden
+        env.shapes.append(shape)
+
+    for saved in metadata["cameras"]:
+        position, rotation, scaling = _from_transform(saved["transform"])
+        camera = _find_class(saved["class"])(environment=env, position=position, rotation=rotation, scaling=scaling, **saved["settings"])
+        env.add_camera(camera, *saved["viewport"])
+
+    objects = {"environment": [env], "shapes": env.shapes, "cameras": env.cameras, "meshes": meshes}
+    restored = _Unpickler(io.BytesIO(arrays["objects"].tobytes()), objects).load()
+
+    env.lights = restored["lights"]
+    for shape, behaviors in zip(env.shapes, restored["shape_behaviors"]):
+        shape.behaviors = behaviors
+    for camera, behaviors in zip(env.cameras, restored["camera_behaviors"]):
+        camera.behaviors = behaviors
+
+    if metadata["transform_store"]:
+        env.enable_transform_store()
+    if metadata["stats"] is not None:
+        env.enable_stats(**metadata["stats"])
+
+    return env, metadata["timestamp"]
@@ -0,0 +1,325 @@
+"""
+Struct-of-arrays storage of object transforms, for scenes with many animated objects.
+
+A TransformStore keeps the position, rotation and scaling of every object
+added to it in contiguous arrays, one row per object. Behaviors that
+implement Behavior.update_many are then run once per frame for every object
+carrying them, on a TransformBatch holding the rows of those objects, rather
+than once per object. Other behaviors keep running one object at a time.
+
+The rows are the transforms: rows changed by update_many aren't copied back
+to the objects, whose position, rotation and scaling attributes read their
+rows the next time they are used. Setting one of them writes the row, and
+the vectors and quaternions they return write changes made in place (like
+shape.position.iadd) to the row too. Rotations are stored as (real, x, y, z)
+quaternions.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from math_3d import Quaternion, Vector3
+
+# Columns of TransformStore.stale
+POSITION, ROTATION, SCALING = range(3)
+
+
+class _StoredVector3(Vector3):
+    # The position or scaling of an object in a store, writing in-place changes to its row
+    __slots__ = ("_owner", "_column")
+
+    def __init__(self, owner, column: int, x: float, y: float, z: float):
+        super().__init__(x, y, z)
+        self._owner = owner
+        self._column = column
+
+    def _changed(self) -> Vector3:
+        owner = self._owner
+        store = owner._transforms
+        if store is not None and (owner._position if self._column == POSITION else owner._scaling) is self:
+            store._arrays[self._column][owner._slot] = self.as_tuple()
+        return self
+
+    def iadd(self, other: Vector3) -> Vector3:
+        super().iadd(other)
+        return self._changed()
+
+    def isub(self, other: Vector3) -> Vector3:
+        super().isub(other)
+        return self._changed()
+
+    def imul(self, number: float) -> Vector3:
+        super().imul(number)
+        return self._changed()
+
+    def ihadamard_product(self, other: Vector3) -> Vector3:
+        super().ihadamard_product(other)
+        return self._changed()
+
+    def rotate_by_quaternion_(self, quaternion: Quaternion) -> Vector3:
+        super().rotate_by_quaternion_(quaternion)
+        return self._changed()
+
+
+class _StoredQuaternion(Quaternion):
+    # The rotation of an object in a store, writing in-place changes to its row
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner, real: float, x: float, y: float, z: float):
+        super().__init__(real, Vector3(x, y, z))
+        self._owner = owner
+
+    def _changed(self) -> Quaternion:
+        owner = self._owner
+        store = owner._transforms
+        if store is not None and owner._rotation is self:
+            store.rotations[owner._slot] = (self.real,) + self.vec.as_tuple()
+        return self
+
+    def imul(self, other: Quaternion) -> Quaternion:
+        super().imul(other)
+        return self._changed()
+
+    def normalize_(self) -> Quaternion:
+        super().normalize_()
+        return self._changed()
+
+
+def _as_row(value) -> tuple:
+    if isinstance(value, Quaternion):
+        return (value.real,) + value.vec.as_tuple()
+    if isinstance(value, Vector3):
+        return value.as_tuple()
+    return value
+
+
+def multiply_quaternions(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Returns the products a*b of (N, 4) arrays of (real, x, y, z) quaternions, either of which may be a single quaternion
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    a_r, a_x, a_y, a_z = np.moveaxis(a, -1, 0)
+    b_r, b_x, b_y, b_z = np.moveaxis(b, -1, 0)
+    return np.stack([
+        a_r*b_r - a_x*b_x - a_y*b_y - a_z*b_z,
+        a_r*b_x + b_r*a_x + a_y*b_z - a_z*b_y,
+        a_r*b_y + b_r*a_y + a_z*b_x - a_x*b_z,
+        a_r*b_z + b_r*a_z + a_x*b_y - a_y*b_x,
+    ], axis=-1)
+
+
+class TransformBatch:
+    def __init__(self, behavior_type: type):
+        """
+        The objects carrying one type of batched behavior, see Behavior.update_many.
+
+        During update_many, positions, rotations and scalings hold the (K, 3),
+        (K, 4) and (K, 3) transforms of the K objects, in the order of objects
+        and behaviors. Modify them in place or assign new arrays of the same shape
+        """
+        self.behavior_type = behavior_type
+        self.objects: list = []
+        self.behaviors: list = []
+
+        self.positions: np.ndarray = None
+        self.rotations: np.ndarray = None
+        self.scalings: np.ndarray = None
+
+        self._slots: np.ndarray = None
+        self._parameters: dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.objects)
+
+    def parameter(self, name: str) -> np.ndarray:
+        """
+        Returns the named attribute of every behavior as an array, with a row per
+        behavior for Vector3 and Quaternion attributes. The array is cached
+        until objects join or leave the batch; call clear_parameters after
+        changing the attribute of a behavior
+        """
+        values = self._parameters.get(name)
+        if values is None:
+            values = self._parameters[name] = np.array([_as_row(getattr(behavior, name)) for behavior in self.behaviors], dtype=float)
+        return values
+
+    def clear_parameters(self):
+        self._parameters = {}
+
+    def _changed(self):
+        self._slots = None
+        self.clear_parameters()
+
+
+class TransformStore:
+    def __init__(self, capacity: int = 64):
+        """
+        Holds the transforms of objects in contiguous arrays, see the module's
+        docstring. Environment.enable_transform_store creates one for the
+        environment's shapes
+        """
+        self.positions = np.zeros((capacity, 3))
+        self.rotations = np.zeros((capacity, 4))
+        self.scalings = np.zeros((capacity, 3))
+        # Rows changed by update_many since the object's POSITION, ROTATION or SCALING was last read
+        self.stale = np.zeros((capacity, 3), dtype=bool)
+        self.objects: list = []
+        self._batches: dict[type, TransformBatch] = {}
+
+    def __len__(self):
+        return len(self.objects)
+
+    @property
+    def _arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.positions, self.rotations, self.scalings
+
+    def _grow(self):
+        capacity = 2 * len(self.positions)
+        for name in ("positions", "rotations", "scalings", "stale"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, array.shape[1]), dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, obj):
+        """
+        Moves an Object_3D's transform into the store, and its batched behaviors into the batches
+        """
+        if obj._transforms is self:
+            return
+        if obj._transforms is not None:
+            obj._transforms.remove(obj)
+
+        slot = len(self.objects)
+        if slot == len(self.positions):
+            self._grow()
+
+        position, rotation, scaling = obj.position, obj.rotation, obj.scaling
+        self.objects.append(obj)
+        obj._transforms, obj._slot = self, slot
+        self.stale[slot] = False
+        obj._position, obj._rotation, obj._scaling = self.set(obj, POSITION, position), self.set(obj, ROTATION, rotation), self.set(obj, SCALING, scaling)
+
+        obj._unbatched = []
+        for behavior in obj.behaviors:
+            self.add_behavior(obj, behavior)
+
+    def add_behavior(self, obj, behavior):
+        """
+        Runs a behavior of an object in the store, batched when it implements update_many
+        """
+        behavior_type = type(behavior)
+        if not behavior_type.is_batched():
+            obj._unbatched.append(behavior)
+            return
+
+        batch = self._batches.get(behavior_type)
+        if batch is None:
+            batch = self._batches[behavior_type] = TransformBatch(behavior_type)
+        batch.objects.append(obj)
+        batch.behaviors.append(behavior)
+        batch._changed()
+
+    def remove(self, obj):
+        """
+        Gives an object its own transform back. The last row of the store takes its place
+        """
+        if obj._transforms is not self:
+            return
+
+        self.fetch(obj)
+        slot = obj._slot
+        last = self.objects.pop()
+        if last is not obj:
+            self.objects[slot] = last
+            last._slot = slot
+            for array in self._arrays + (self.stale,):
+                array[slot] = array[len(self.objects)]
+
+        for batch in self._batches.values():
+            if obj in batch.objects:
+                kept = [i for i, other in enumerate(batch.objects) if other is not obj]
+                batch.objects = [batch.objects[i] for i in kept]
+                batch.behaviors = [batch.behaviors[i] for i in kept]
+            batch._changed()
+
+        obj._transforms, obj._slot, obj._unbatched = None, -1, None
+
+    def set(self, obj, column: int, value):
+        """
+        Writes the position, rotation or scaling of an object in the store to
+        its row, returning the copy of value the object keeps, which writes
+        changes made in place to the row
+        """
+        row = _as_row(value)
+        self._arrays[column][obj._slot] = row
+        self.stale[obj._slot, column] = False
+        if column == ROTATION:
+            return _StoredQuaternion(obj, *row)
+        return _StoredVector3(obj, column, *row)
+
+    def fetch(self, obj):
+        """
+        Gives an object in the store the values of its rows changed by update_many
+        """
+        slot = obj._slot
+        position, rotation, scaling = self.stale[slot].tolist()
+        if position:
+            obj._position = _StoredVector3(obj, POSITION, *self.positions[slot].tolist())
+        if rotation:
+            obj._rotation = _StoredQuaternion(obj, *self.rotations[slot].tolist())
+        if scaling:
+            obj._scaling = _StoredVector3(obj, SCALING, *self.scalings[slot].tolist())
+        self.stale[slot] = False
+
+    def sync(self, objects: list):
+        """
+        Adds the objects not in the store yet, and removes the ones no longer in the list
+        """
+        for obj in objects:
+            if obj._transforms is not self:
+                self.add(obj)
+
+        if len(self.objects) > len(objects):
+            present = set(map(id, objects))
+            for obj in [obj for obj in self.objects if id(obj) not in present]:
+                self.remove(obj)
+
+    def update(self, timestamp: int, stats=None):
+        """
+        Runs every batched behavior's update_many once, on the rows of their objects
+        """
+        for batch in self._batches.values():
+            if not batch.objects:
+                continue
+            if stats is not None:
+                start = stats.clock()
+
+            slots = batch._slots
+            if slots is None:
+                slots = batch._slots = np.array([obj._slot for obj in batch.objects], dtype=np.intp)
+
+            batch.positions = self.positions[slots]
+            batch.rotations = self.rotations[slots]
+            batch.scalings = self.scalings[slots]
+
+            batch.behavior_type.update_many(timestamp, batch)
+
+            for column, values in enumerate((batch.positions, batch.rotations, batch.scalings)):
+                self._store(batch, slots, column, values)
+            batch.positions = batch.rotations = batch.scalings = None
+
+            if stats is not None:
+                stats.add_behavior_time(batch.behavior_type.__name__, stats.clock() - start)
+
+    def _store(self, batch: TransformBatch, slots: np.ndarray, column: int, values: np.ndarray):
+        # Writes the rows update_many changed, marking them stale for their objects
+        stored = self._arrays[column]
+        if values.shape != (len(slots), stored.shape[1]):
+            raise ValueError(f"{batch.behavior_type.__name__}.update_many left a {values.shape} array, expected {(len(slots), stored.shape[1])}")
+
+        changed = (values != stored[slots]).any(axis=1)
+        if changed.any():
+            rows = slots[changed]
+            stored[rows] = values[changed]
+            self.stale[rows, column] = True